@@ -1,9 +1,11 @@
 """Agent PULSE otimizado com memoria, reasoning e visao integrados."""
 
 import asyncio
+import atexit
 import json
 import logging
 import os
+import re
 import sys
 import time
 from collections import deque
@@ -41,9 +43,9 @@ except ModuleNotFoundError as exc:
         "Ative o ambiente virtual .venv311 e execute `pip install -r requirements.txt`."
     ) from exc
 
-from memory_system import MemorySystem
+from memory_system import get_memory_system
 from prompts import AGENT_INSTRUCTION, SESSION_INSTRUCTION
-from reasoning_system import ReasoningMode, get_reasoning_system
+from reasoning_system import ReasoningMode, close_reasoning_system, get_reasoning_system
 from temporal_context import build_temporal_guardrail
 from vision import get_vision_system
 
@@ -55,6 +57,13 @@ LOG_FILE = LOG_DIR / "pulse_agent.log"
 LOGGER_NAME = "pulse_agent"
 PULSE_SIGNATURE_VOICE = "Pulcherrima"
 DEFAULT_USER_ID = "default_user"
+MEMORY_FLUSH_TIMEOUT_SECONDS = 10.0
+REASONING_HINT_MAX_CHARS = 600
+FIRST_SENTENCE_RE = re.compile(r"^(.+?[.!?])\s", re.DOTALL)
+# Modos em que o reasoning roda (HYBRID entrega o deep como follow-up)
+REASONING_MODE_VALUES = frozenset(
+    {ReasoningMode.REASONING_DEEP.value, ReasoningMode.HYBRID.value}
+)
 REQUIRED_ENV_VARS = (
     "LIVEKIT_URL",
     "LIVEKIT_API_KEY",
@@ -71,6 +80,7 @@ class RuntimeConfig:
     memory_enabled: bool
     reasoning_enabled: bool
     vision_enabled: bool
+    turn_retrieval_budget_ms: int = 250
 
 
 @dataclass
@@ -176,6 +186,15 @@ def parse_temperature(value: str | None, *, default: float) -> float:
     return parsed
 
 
+def parse_budget_ms(value: str | None, *, default: int) -> int:
+    if value is None:
+        return default
+    try:
+        return max(0, int(value))
+    except ValueError as exc:
+        raise RuntimeError("PULSE_MEMORY_TURN_RETRIEVAL_BUDGET_MS precisa ser um inteiro.") from exc
+
+
 def load_runtime_config() -> RuntimeConfig:
     missing = [name for name in REQUIRED_ENV_VARS if not os.getenv(name)]
     if missing:
@@ -188,6 +207,9 @@ def load_runtime_config() -> RuntimeConfig:
         memory_enabled=parse_bool(os.getenv("PULSE_MEMORY_ENABLED"), default=True),
         reasoning_enabled=parse_bool(os.getenv("PULSE_REASONING_ENABLED"), default=True),
         vision_enabled=parse_bool(os.getenv("PULSE_VISION_ENABLED"), default=True),
+        turn_retrieval_budget_ms=parse_budget_ms(
+            os.getenv("PULSE_MEMORY_TURN_RETRIEVAL_BUDGET_MS"), default=250
+        ),
     )
 
 
@@ -250,11 +272,12 @@ class OptimizedAssistant(Agent):
         self._background_tasks: set[asyncio.Task[Any]] = set()
         self._aux_lock = asyncio.Lock()
         self._latest_vision_hint = ""
+        self._latest_reasoning_hint = ""
         self._shutting_down = False
 
         if config.memory_enabled:
             try:
-                self.memory = MemorySystem()
+                self.memory = get_memory_system()
                 if session_id and session_id in self.memory.active_sessions:
                     self.session_id = session_id
                 else:
@@ -331,8 +354,23 @@ class OptimizedAssistant(Agent):
                 "Use esse contexto quando a pergunta atual for sobre o que esta sendo mostrado."
             )
 
+        if self._latest_reasoning_hint:
+            parts.append("\n---\n")
+            parts.append(
+                "ANALISE DO RACIOCINIO PROFUNDO (ultima pergunta): "
+                f"{self._latest_reasoning_hint}\n"
+                "Use essa analise como base ao responder sobre o mesmo assunto."
+            )
+
         return "\n".join(parts)
 
+    async def _set_reasoning_hint(self, hint: str) -> None:
+        self._latest_reasoning_hint = hint.strip()[:REASONING_HINT_MAX_CHARS]
+        try:
+            await self.update_instructions(self._build_enhanced_instruction())
+        except Exception:
+            self.logger.debug("Falha ao atualizar instrucoes com o raciocinio.")
+
     async def on_user_turn_completed(self, turn_ctx, new_message) -> None:
         """Hook mantido para compatibilidade; o fluxo principal usa eventos da sessao."""
         return
@@ -363,7 +401,7 @@ class OptimizedAssistant(Agent):
         )
         return True
 
-    def _safe_memory_add_turn(
+    async def _safe_memory_add_turn(
         self,
         *,
         role: str,
@@ -379,7 +417,7 @@ class OptimizedAssistant(Agent):
                 return
 
             try:
-                self.memory.add_turn(
+                await self.memory.add_turn_async(
                     session_id=self.session_id,  # type: ignore[arg-type]
                     role=role,
                     text=text,
@@ -415,7 +453,21 @@ class OptimizedAssistant(Agent):
             task = asyncio.create_task(self._handle_assistant_message(text))
             self.track_background_task(task)
 
+    @property
+    def _followup_key(self) -> str:
+        return self.session_id or self.user_id
+
+    async def _on_deep_followup(self, result: Any) -> None:
+        """Resultado profundo do HYBRID chegou: vira contexto da voz."""
+        if self._shutting_down or not result.text.strip():
+            return
+        self.logger.info("Follow-up profundo recebido (%sms)", result.execution_time_ms)
+        await self._set_reasoning_hint(result.text)
+
     async def _handle_user_message(self, text: str) -> None:
+        if self.reasoning:
+            # Usuario seguiu em frente: o deep da pergunta anterior nao serve mais
+            self.reasoning.cancel_followup(self._followup_key)
         try:
             async with self._aux_lock:
                 reasoning_used = False
@@ -426,7 +478,7 @@ class OptimizedAssistant(Agent):
 
                 if self.reasoning and self.reasoning_mode_deep:
                     selected_mode = self.reasoning._select_mode(text)
-                    reasoning_used = selected_mode == self.reasoning_mode_deep
+                    reasoning_used = selected_mode.value in REASONING_MODE_VALUES
                     mode_value = selected_mode.value
 
                 image_data = self.frame_buffer.get_latest(max_age_seconds=5.0)
@@ -451,7 +503,7 @@ class OptimizedAssistant(Agent):
                     mode_value = result.get("mode", mode_value)
                     reasoning_used = bool(
                         self.reasoning_mode_deep
-                        and mode_value == self.reasoning_mode_deep.value
+                        and mode_value in REASONING_MODE_VALUES
                     )
 
                     vision_result = result.get("vision_result") or {}
@@ -475,7 +527,7 @@ class OptimizedAssistant(Agent):
                         "reasoning_preview": reasoning_preview,
                     }
                 )
-                self._safe_memory_add_turn(
+                await self._safe_memory_add_turn(
                     role="user",
                     text=text,
                     metadata={"mode": mode_value, "had_vision": had_vision},
@@ -493,7 +545,7 @@ class OptimizedAssistant(Agent):
             if meta.get("reasoning_preview"):
                 metadata["reasoning_preview"] = meta["reasoning_preview"]
 
-            self._safe_memory_add_turn(
+            await self._safe_memory_add_turn(
                 role="assistant",
                 text=text,
                 metadata=metadata,
@@ -502,6 +554,24 @@ class OptimizedAssistant(Agent):
         except Exception:
             self.logger.exception("Falha ao processar mensagem do assistente.")
 
+    async def _retrieve_turn_context(self, text: str) -> str:
+        """Memoria relevante para a pergunta, dentro do orcamento de latencia."""
+        budget_ms = self.config.turn_retrieval_budget_ms
+        if not self.memory or budget_ms <= 0:
+            return ""
+        try:
+            # Estourou o orcamento: segue sem; a busca termina na thread e
+            # fica no cache da memoria para a proxima vez
+            return await asyncio.wait_for(
+                asyncio.to_thread(self.memory.get_turn_context, self.user_id, text),
+                timeout=budget_ms / 1000,
+            )
+        except asyncio.TimeoutError:
+            self.logger.debug("Memoria do turno passou de %sms; seguindo sem.", budget_ms)
+        except Exception:
+            self.logger.debug("Falha ao recuperar memoria do turno.", exc_info=True)
+        return ""
+
     async def process_with_vision(
         self,
         user_input: str,
@@ -519,6 +589,11 @@ class OptimizedAssistant(Agent):
             "confidence": 0.0,
         }
 
+        # Busca na memoria em paralelo com a visao
+        turn_context_task = None
+        if self.reasoning:
+            turn_context_task = asyncio.create_task(self._retrieve_turn_context(user_input))
+
         vision_description = None
         if self.vision and image_data and self.vision.should_analyze_frame(user_input):
             self.logger.info("Acionando visao computacional...")
@@ -542,10 +617,29 @@ class OptimizedAssistant(Agent):
             result["text"] = "Reasoning desabilitado."
             return result
 
-        reasoning_result = await self.reasoning.process(
+        turn_context = await turn_context_task
+
+        # Streaming: a primeira frase ja vai para as instrucoes da voz
+        reasoning_result = None
+        partial_text = ""
+        async for chunk in self.reasoning.process_stream(
             user_input=user_input_enhanced,
             context=self.memory_context,
-        )
+            session_key=self._followup_key,
+            on_followup=self._on_deep_followup,
+            turn_context=turn_context,
+        ):
+            if chunk.kind == "done":
+                reasoning_result = chunk.result
+            elif chunk.kind == "text" and partial_text is not None:
+                partial_text += chunk.text
+                match = FIRST_SENTENCE_RE.match(partial_text.lstrip())
+                if match:
+                    partial_text = None
+                    await self._set_reasoning_hint(match.group(1))
+
+        if reasoning_result.text.strip():
+            await self._set_reasoning_hint(reasoning_result.text)
 
         result.update(
             {
@@ -559,10 +653,10 @@ class OptimizedAssistant(Agent):
 
         if persist_memory and self.memory and not self._shutting_down:
             reasoning_used = bool(
-                self.reasoning_mode_deep and reasoning_result.mode == self.reasoning_mode_deep
+                self.reasoning_mode_deep and reasoning_result.mode.value in REASONING_MODE_VALUES
             )
 
-            self._safe_memory_add_turn(
+            await self._safe_memory_add_turn(
                 role="user",
                 text=user_input,
                 metadata={
@@ -572,7 +666,7 @@ class OptimizedAssistant(Agent):
                 reasoning_used=reasoning_used,
             )
 
-            self._safe_memory_add_turn(
+            await self._safe_memory_add_turn(
                 role="assistant",
                 text=reasoning_result.text,
                 metadata={
@@ -586,6 +680,8 @@ class OptimizedAssistant(Agent):
 
     async def finalize_session(self, rating: int | None = None) -> None:
         self._shutting_down = True
+        if self.reasoning:
+            self.reasoning.release_session(self._followup_key)
 
         if self._background_tasks:
             tasks = list(self._background_tasks)
@@ -594,11 +690,39 @@ class OptimizedAssistant(Agent):
             await asyncio.gather(*tasks, return_exceptions=True)
 
         if self.memory and self.session_id:
+            try:
+                await asyncio.wait_for(
+                    self.memory.flush_async(),
+                    timeout=MEMORY_FLUSH_TIMEOUT_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                self.logger.warning(
+                    "Flush da memoria excedeu %ss; %s turnos ainda pendentes.",
+                    MEMORY_FLUSH_TIMEOUT_SECONDS,
+                    self.memory.write_queue.pending,
+                )
             self.memory.end_session(self.session_id, rating=rating)
             self.logger.info("Sessao %s finalizada", self.session_id[:8])
             self.session_id = None
 
 
+def prewarm(proc: agents.JobProcess) -> None:
+    """
+    Roda uma vez por processo de job: carrega a memoria (modelo de
+    embeddings + ChromaDB) antes do primeiro job e agenda o fechamento do
+    pool HTTP compartilhado para quando o processo sair.
+    """
+    logger = configure_logging()
+    atexit.register(close_reasoning_system)
+    if not parse_bool(os.getenv("PULSE_MEMORY_ENABLED"), default=True):
+        return
+
+    try:
+        get_memory_system().warmup()
+    except Exception:
+        logger.exception("Falha ao pre-aquecer memoria; sera carregada no primeiro job.")
+
+
 async def entrypoint(ctx: agents.JobContext) -> None:
     ensure_supported_python_version()
     logger = configure_logging()
@@ -657,8 +781,7 @@ async def entrypoint(ctx: agents.JobContext) -> None:
         logger.exception("Falha durante execucao da sessao do agente.")
         raise
     finally:
-        if config.memory_enabled:
-            await optimized_agent.finalize_session()
+        await optimized_agent.finalize_session()
 
 
 if __name__ == "__main__":
@@ -674,4 +797,4 @@ if __name__ == "__main__":
 
     logger.info("Configuracao validada. Subindo worker LiveKit OTIMIZADO.")
     ensure_event_loop()
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
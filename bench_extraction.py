@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark da extração de tópicos/fatos/soluções por turno
+
+Compara o scan antigo (substring por keyword, 3 listas separadas) com o
+matcher compilado de text_signals em transcrições longas sintéticas.
+
+Uso:
+    python bench_extraction.py [--turns 2000] [--density 0.05] [--repeat 5]
+    python bench_extraction.py --words 1000   # só um tamanho de turno
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from text_signals import (
+    FACT_PATTERNS,
+    SOLUTION_INDICATORS,
+    TOPIC_KEYWORDS,
+    analyze_text,
+)
+
+FILLER = (
+    "entao", "a", "gente", "precisa", "ver", "isso", "melhor", "porque",
+    "o", "endpoint", "retorna", "quando", "chamo", "da", "aplicacao",
+    "mas", "depois", "ficou", "lento", "no", "servidor", "de", "producao",
+)
+
+
+def legacy_extract(text: str):
+    """Implementação anterior: um `in` por keyword em cada lista"""
+    text_lower = text.lower()
+    topics = {keyword for keyword in set(TOPIC_KEYWORDS) if keyword in text_lower}
+    categories = []
+    for category, patterns in FACT_PATTERNS.items():
+        for pattern in patterns:
+            if pattern in text_lower:
+                categories.append(category)
+                break
+    is_solution = any(indicator in text_lower for indicator in SOLUTION_INDICATORS)
+    return topics, categories, is_solution
+
+
+def build_transcript(
+    turns: int,
+    words: int,
+    density: float,
+    seed: int = 42
+) -> list[str]:
+    """Turnos sintéticos com `density` de termos relevantes entre palavras comuns"""
+    rng = random.Random(seed)
+    terms = list(TOPIC_KEYWORDS) + [
+        p for patterns in FACT_PATTERNS.values() for p in patterns
+    ] + list(SOLUTION_INDICATORS)
+    return [
+        " ".join(
+            rng.choice(terms) if rng.random() < density else rng.choice(FILLER)
+            for _ in range(words)
+        )
+        for _ in range(turns)
+    ]
+
+
+def measure(fn, transcript: list[str], repeat: int) -> list[float]:
+    """Tempo por turno (µs) de cada repetição"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in transcript:
+            fn(text)
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed / len(transcript) * 1_000_000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=None)
+    parser.add_argument("--density", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sizes = [args.words] if args.words else [20, 60, 250, 1000]
+
+    print("=" * 70)
+    print(f"  Extração por turno ({args.turns} turnos, densidade {args.density:.0%})")
+    print("=" * 70)
+    print(f"{'palavras':>9} | {'legado µs':>10} | {'compilado µs':>12} | {'speedup':>7}")
+
+    for words in sizes:
+        transcript = build_transcript(args.turns, words, args.density)
+        legacy = statistics.median(measure(legacy_extract, transcript, args.repeat))
+        # cache_clear a cada turno: mede o matcher, não o lru_cache
+        compiled = statistics.median(measure(
+            lambda text: (analyze_text.cache_clear(), analyze_text(text)),
+            transcript,
+            args.repeat,
+        ))
+        print(f"{words:>9} | {legacy:>10.1f} | {compiled:>12.1f} | {legacy / compiled:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Benchmark reprodutível do MemorySystem com corpora sintéticos
+
+Gera conversas em português para N usuários e mede:
+    - throughput de escrita (add_turn_async + flush, e add_turn síncrono)
+    - latência p50/p99 de get_context_for_session (frio e com cache)
+    - latência p50/p99 de search_similar_context
+    - tamanho em disco
+
+Roda 100% offline: embeddings vêm de um stub determinístico (hashing),
+sem baixar o SentenceTransformer. Resultado vai para JSON para comparar
+entre versões.
+
+Uso:
+    python bench_memory.py                          # 1k turnos, 10 usuários
+    python bench_memory.py --turns 100000 --users 200
+    python bench_memory.py --turns 1000000 --users 1000 --output bench.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from memory_system import MemorySystem
+
+USER_TEMPLATES = (
+    "Estou com erro no {tech}, da timeout quando chamo a API",
+    "Uso {tech} no meu projeto da faculdade",
+    "Prefiro {tech} em vez de {tech2} pra esse tipo de sistema",
+    "Estou estudando {tech} e quero aprender deploy com docker",
+    "Nao consigo configurar o {tech} com {tech2}, sempre da erro",
+    "Como faco cache no {tech} sem deadlock?",
+    "Trabalhando em uma aplicacao de {tech} com {tech2}",
+    "Qual a diferenca entre {tech} e {tech2} pra microservices?",
+)
+
+ASSISTANT_TEMPLATES = (
+    "Recomendo olhar o traceback do {tech} primeiro, normalmente e variavel de ambiente.",
+    "Para resolver isso no {tech}, basta aumentar o timeout e revisar o pool.",
+    "Voce pode usar {tech2} junto com {tech}, funciona assim: fila + worker.",
+    "Tente isolar o bug num teste pequeno de {tech} antes de mexer no {tech2}.",
+    "{tech} e {tech2} resolvem coisas diferentes, depende da latencia que voce precisa.",
+)
+
+QUERY_TEMPLATES = (
+    "problema de timeout no {tech}",
+    "como fazer deploy de {tech}",
+    "erro de configuracao com {tech2}",
+    "lembra quando falamos de {tech}?",
+)
+
+TECH = (
+    "python", "fastapi", "django", "react", "postgresql", "redis", "docker",
+    "kubernetes", "typescript", "rust", "go", "mongodb", "graphql", "flask",
+)
+
+
+class HashingEmbeddingFunction:
+    """Stub offline: bag-of-words com hashing, normalizado (sem modelo)"""
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            vector = [0.0] * self.dimensions
+            for token in text.lower().split():
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                index = int.from_bytes(digest[:4], "little") % self.dimensions
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vector[index] += sign
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+
+def render(template: str, rng: random.Random) -> str:
+    tech, tech2 = rng.sample(TECH, 2)
+    return template.format(tech=tech, tech2=tech2)
+
+
+def build_corpus(turns: int, users: int, turns_per_session: int, seed: int):
+    """Lista de (user_id, sessão lógica, role, texto) em ordem de chegada"""
+    rng = random.Random(seed)
+    corpus = []
+    session_index = 0
+    while len(corpus) < turns:
+        user_id = f"bench_user_{rng.randrange(users)}"
+        for turn in range(min(turns_per_session, turns - len(corpus))):
+            if turn % 2 == 0:
+                corpus.append((user_id, session_index, "user", render(rng.choice(USER_TEMPLATES), rng)))
+            else:
+                corpus.append((user_id, session_index, "assistant", render(rng.choice(ASSISTANT_TEMPLATES), rng)))
+        session_index += 1
+    return corpus
+
+
+def percentiles(samples_ms: list[float]) -> dict:
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {}
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(0.50), 3),
+        "p90_ms": round(pick(0.90), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
+
+
+def dir_size_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+async def ingest_async(memory: MemorySystem, corpus) -> float:
+    """Escreve o corpus via add_turn_async; retorna segundos até o flush"""
+    sessions: dict[int, str] = {}
+    open_by_user: dict[str, int] = {}
+    start = time.perf_counter()
+    for user_id, session_index, role, text in corpus:
+        if session_index not in sessions:
+            previous = open_by_user.get(user_id)
+            if previous is not None:
+                memory.end_session(sessions.pop(previous))
+            sessions[session_index] = memory.create_session(user_id)
+            open_by_user[user_id] = session_index
+        await memory.add_turn_async(sessions[session_index], role, text)
+    await memory.flush_async()
+    elapsed = time.perf_counter() - start
+    for session_id in sessions.values():
+        memory.end_session(session_id)
+    return elapsed
+
+
+def bench_sync_add_turn(memory: MemorySystem, corpus, sample: int) -> float:
+    session_id = memory.create_session("bench_sync_user")
+    start = time.perf_counter()
+    for _, _, role, text in corpus[:sample]:
+        memory.add_turn(session_id, role, text)
+    elapsed = time.perf_counter() - start
+    memory.end_session(session_id)
+    return elapsed
+
+
+def time_calls(fn, args_list) -> list[float]:
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark do MemorySystem")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--turns-per-session", type=int, default=12)
+    parser.add_argument("--queries", type=int, default=200, help="amostras de leitura")
+    parser.add_argument("--sync-sample", type=int, default=200, help="turnos no add_turn síncrono")
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--storage-dir", default=None, help="padrão: diretório temporário")
+    parser.add_argument("--keep", action="store_true", help="não apaga o storage no fim")
+    parser.add_argument("--output", default=None, help="padrão: KMS/benchmarks/memory_<data>.json")
+    args = parser.parse_args()
+
+    storage_dir = Path(args.storage_dir or tempfile.mkdtemp(prefix="pulse_bench_memory_"))
+    output = Path(
+        args.output
+        or f"KMS/benchmarks/memory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+
+    rng = random.Random(args.seed)
+    corpus = build_corpus(args.turns, args.users, args.turns_per_session, args.seed)
+    user_ids = sorted({user_id for user_id, *_ in corpus})
+
+    memory = MemorySystem(
+        storage_dir=str(storage_dir),
+        embedding_fn=HashingEmbeddingFunction(args.dimensions),
+    )
+
+    try:
+        print(f"Ingerindo {len(corpus)} turnos de {len(user_ids)} usuários em {storage_dir}...")
+        async_seconds = asyncio.run(ingest_async(memory, corpus))
+        sync_seconds = bench_sync_add_turn(memory, corpus, args.sync_sample)
+
+        context_args = [(rng.choice(user_ids),) for _ in range(args.queries)]
+
+        def cold_context(user_id: str) -> str:
+            memory.context_cache.invalidate_user(user_id)
+            return memory.get_context_for_session(user_id)
+
+        cold = time_calls(cold_context, context_args)
+        warm = time_calls(memory.get_context_for_session, context_args)
+
+        search_args = [
+            (render(rng.choice(QUERY_TEMPLATES), rng), rng.choice(user_ids))
+            for _ in range(args.queries)
+        ]
+        search = time_calls(memory.search_similar_context, search_args)
+
+        memory.close()
+
+        results = {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "turns": len(corpus),
+                "users": len(user_ids),
+                "turns_per_session": args.turns_per_session,
+                "queries": args.queries,
+                "dimensions": args.dimensions,
+                "seed": args.seed,
+                "embedding": "hashing-stub",
+            },
+            "add_turn_async": {
+                "seconds": round(async_seconds, 3),
+                "turns_per_second": round(len(corpus) / async_seconds, 1),
+            },
+            "add_turn_sync": {
+                "turns": min(args.sync_sample, len(corpus)),
+                "seconds": round(sync_seconds, 3),
+                "turns_per_second": round(min(args.sync_sample, len(corpus)) / sync_seconds, 1),
+            },
+            "get_context_for_session": {
+                "cold": percentiles(cold),
+                "cached": percentiles(warm),
+            },
+            "context_cache": memory.context_cache.stats(),
+            "embedding_memo": memory.embeddings.stats(),
+            "search_similar_context": percentiles(search),
+            "disk_bytes": dir_size_bytes(storage_dir),
+            "collection_counts": {
+                "conversations": memory.conversations.count(),
+                "user_facts": memory.user_facts.count(),
+                "solutions": memory.solutions.count(),
+            },
+        }
+    finally:
+        if not args.keep and not args.storage_dir:
+            shutil.rmtree(storage_dir, ignore_errors=True)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"\nResultado salvo em {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark da montagem de prompts do reasoning
+
+Compara a montagem antiga (import + guardrail + f-string por chamada) com
+o PromptBuilder (segmentos precompilados, guardrail cacheado por minuto)
+e mostra o tamanho de cada prompt por modo, separando o prefixo estático.
+
+Uso:
+    python bench_prompts.py [--iterations 20000] [--repeat 5]
+"""
+
+import argparse
+import statistics
+import time
+
+from prompt_builder import get_prompt_builder
+
+CONTEXT_LINE = "- Usuario trabalha com fastapi e postgresql, prefere respostas diretas\n"
+REALTIME_TEXT = (
+    "CONTEXTO EXTERNO ATUALIZADO (use somente como referencia factual):\n"
+    "- Python 3.14 lancado (2025-10-07) | https://example.com/python-314\n"
+    "Coletado em: 2025-10-08T10:00:00"
+)
+USER_INPUT = "como resolvo um deadlock intermitente no postgresql com fastapi?"
+
+
+def legacy_build(user_input: str, context: str, realtime_text: str, deep: bool) -> str:
+    """Implementação anterior: import, guardrail e f-string a cada chamada"""
+    from prompts import AGENT_INSTRUCTION
+    from temporal_context import build_temporal_guardrail
+
+    realtime_block = ""
+    if realtime_text:
+        note = (
+            "Use o contexto atualizado para fatos temporais e deixe isso claro na resposta.\n"
+            if deep
+            else "Se houver conflito com memoria antiga, priorize o contexto atualizado.\n"
+        )
+        realtime_block = (
+            "\n\n---\n"
+            f"{realtime_text}\n"
+            f"{note}"
+            "FORMATO OBRIGATORIO PARA RESPOSTA TEMPORAL:\n"
+            "- Status: verificado ou nao verificado\n"
+            "- Data da verificacao: YYYY-MM-DD HH:MM:SS +TZ\n"
+            "- Fontes: lista numerada com titulo, data e link\n"
+        )
+
+    tail = (
+        "# RACIOCINIO PROFUNDO\n\n<thinking>...</thinking>\n\n<answer>...</answer>"
+        if deep
+        else "Responda de forma DIRETA, NATURAL e CASUAL. Sem formalidades."
+    )
+    return f"""
+{AGENT_INSTRUCTION}
+{build_temporal_guardrail()}
+
+{context}
+{realtime_block}
+
+---
+
+{tail}
+
+Usuario: {user_input}
+""".strip()
+
+
+def measure(fn, iterations: int, repeat: int) -> float:
+    """Mediana do tempo por chamada (µs)"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - start) / iterations * 1_000_000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    builder = get_prompt_builder()
+    static_chars = len(builder.static_prefix)
+
+    print("=" * 86)
+    print(f"  Montagem de prompt ({args.iterations} chamadas x {args.repeat})")
+    print(f"  Prefixo estático: {static_chars} chars, ~{static_chars // 4} tokens "
+          f"(versão {builder.instruction_version})")
+    print("=" * 86)
+    print(f"{'modo':>5} | {'contexto':>8} | {'tempo':>5} | {'legado µs':>9} | "
+          f"{'builder µs':>10} | {'speedup':>7} | {'chars':>6} | {'estático':>8}")
+
+    for deep in (False, True):
+        for context_lines in (0, 30, 120):
+            context = CONTEXT_LINE * context_lines
+            for realtime_text in ("", REALTIME_TEXT):
+                legacy = measure(
+                    lambda: legacy_build(USER_INPUT, context, realtime_text, deep),
+                    args.iterations,
+                    args.repeat,
+                )
+                compiled = measure(
+                    lambda: builder.build(USER_INPUT, context, realtime_text, deep=deep),
+                    args.iterations,
+                    args.repeat,
+                )
+                prompt = builder.build(USER_INPUT, context, realtime_text, deep=deep)
+                print(
+                    f"{'deep' if deep else 'fast':>5} | {len(context):>8} | "
+                    f"{'sim' if realtime_text else 'não':>5} | {legacy:>9.2f} | "
+                    f"{compiled:>10.2f} | {legacy / compiled:>6.1f}x | {len(prompt):>6} | "
+                    f"{static_chars / len(prompt):>7.0%}"
+                )
+
+
+if __name__ == "__main__":
+    main()
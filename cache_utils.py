@@ -0,0 +1,144 @@
+"""Cache LRU com TTL e limite de memoria compartilhado pelos modulos."""
+
+from collections import OrderedDict
+import dataclasses
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def approximate_size(value: Any) -> int:
+    """
+    Estimativa barata de bytes ocupados por um valor.
+
+    Percorre dataclasses, dicts, listas e tuplas somando sys.getsizeof;
+    suficiente para limitar cache de respostas (texto + tools_used).
+    """
+    seen = set()
+
+    def walk(obj: Any) -> int:
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        size = sys.getsizeof(obj)
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+            return size
+        if isinstance(obj, dict):
+            return size + sum(walk(k) + walk(v) for k, v in obj.items())
+        if isinstance(obj, (list, tuple, set, frozenset)):
+            return size + sum(walk(item) for item in obj)
+        if dataclasses.is_dataclass(obj):
+            return size + sum(walk(getattr(obj, f.name)) for f in dataclasses.fields(obj))
+        return size
+
+    return walk(value)
+
+
+class LRUCache:
+    """
+    Cache LRU thread-safe com TTL, limite de entradas e de bytes.
+
+    - get() move a entrada para o fim (mais recente); expirada conta como miss
+    - set() remove as menos usadas ate caber em max_entries e max_bytes
+    - hits/misses/evictions/expirations ficam expostos em stats()
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        size_fn: Callable[[Any], int] = approximate_size,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._size_fn = size_fn
+        # chave -> (expira_em, bytes, valor)
+        self._entries: "OrderedDict[Hashable, tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def current_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        size = self._size_fn(value) if self.max_bytes is not None else 0
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                self.evictions += 1
+                return  # Maior que o cache inteiro: nao guarda
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove as chaves que satisfazem predicate; retorna quantas."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
@@ -0,0 +1,135 @@
+"""
+Empacotamento do contexto de memoria dentro de um orcamento de tokens.
+
+Turnos, fatos e solucoes viram candidatos com score (recencia,
+similaridade com a pergunta e mention_count). O packer preenche o
+orcamento gulosamente do maior score para o menor e devolve os
+escolhidos na ordem de exibicao; a formatacao fica com quem chama.
+"""
+
+from dataclasses import dataclass
+import math
+import time
+from typing import Iterable, List, Optional
+
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARK = "..."
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata (~4 chars por token), sem tokenizer."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass
+class ContextItem:
+    """Candidato a entrar no contexto."""
+    section: str  # conversations | facts | solutions
+    group: str  # Agrupamento dentro da secao (sessao, categoria)
+    text: str
+    timestamp: float  # epoch do ultimo uso/mencao
+    mention_count: int = 1
+    confidence: float = 1.0
+    similarity: float = 0.0  # Cosseno com a pergunta (0 sem pergunta)
+    order: float = 0.0  # Ordem de exibicao dentro do grupo
+    header: str = ""  # Titulo do grupo na hora de formatar
+    score: float = 0.0
+
+
+@dataclass(frozen=True)
+class PackerWeights:
+    recency: float = 0.4
+    similarity: float = 0.4
+    mentions: float = 0.2
+
+
+class ContextPacker:
+    """
+    Seleciona itens de memoria por valor ate estourar o orcamento.
+
+    - Item grande demais e cortado em max_item_tokens (nunca descartado
+      so por ser longo)
+    - O cabecalho do grupo so custa tokens quando o primeiro item dele entra
+    - Item que nao cabe e pulado; os menores seguintes ainda podem caber
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 1200,
+        *,
+        weights: PackerWeights = PackerWeights(),
+        half_life_days: float = 7.0,
+        max_item_tokens: int = 120,
+        mention_saturation: int = 10,
+    ):
+        self.token_budget = max(1, token_budget)
+        self.weights = weights
+        self.half_life_seconds = max(1.0, half_life_days * 86400)
+        self.max_item_tokens = max(8, max_item_tokens)
+        self._mention_norm = math.log1p(max(1, mention_saturation))
+
+    def score(self, item: ContextItem, now: float) -> float:
+        age = max(0.0, now - item.timestamp)
+        recency = 0.5 ** (age / self.half_life_seconds)
+        mentions = min(1.0, math.log1p(max(0, item.mention_count)) / self._mention_norm)
+        value = (
+            self.weights.recency * recency
+            + self.weights.similarity * max(0.0, item.similarity)
+            + self.weights.mentions * mentions
+        )
+        return value * item.confidence
+
+    def truncate(self, text: str) -> str:
+        max_chars = self.max_item_tokens * CHARS_PER_TOKEN
+        if len(text) <= max_chars:
+            return text
+        cut = text[:max_chars - len(TRUNCATION_MARK)]
+        # Corta na ultima palavra inteira quando da
+        space = cut.rfind(" ")
+        if space > max_chars // 2:
+            cut = cut[:space]
+        return cut.rstrip() + TRUNCATION_MARK
+
+    def select(
+        self,
+        items: Iterable[ContextItem],
+        *,
+        header_tokens: int = 8,
+        now: Optional[float] = None,
+    ) -> List[ContextItem]:
+        """Itens escolhidos (texto ja cortado), ordenados por secao/grupo/ordem."""
+        now = time.time() if now is None else now
+        candidates = list(items)
+        for item in candidates:
+            item.score = self.score(item, now)
+        candidates.sort(key=lambda item: item.score, reverse=True)
+
+        remaining = self.token_budget
+        groups = set()
+        selected: List[ContextItem] = []
+        for item in candidates:
+            text = self.truncate(item.text)
+            cost = estimate_tokens(text)
+            group_key = (item.section, item.group)
+            if group_key not in groups:
+                cost += header_tokens
+            if cost > remaining:
+                continue
+            remaining -= cost
+            groups.add(group_key)
+            item.text = text
+            selected.append(item)
+
+        # Primeira aparicao de cada secao/grupo segue o melhor score dele
+        first_seen = {}
+        for rank, item in enumerate(selected):
+            first_seen.setdefault(item.section, rank)
+            first_seen.setdefault((item.section, item.group), rank)
+        selected.sort(
+            key=lambda item: (
+                first_seen[item.section],
+                first_seen[(item.section, item.group)],
+                item.order,
+            )
+        )
+        return selected
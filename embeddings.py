@@ -0,0 +1,108 @@
+"""Modelo de embeddings compartilhado pelo processo (um por worker)."""
+
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, List, Sequence
+
+from cache_utils import LRUCache
+
+logger = logging.getLogger("pulse_agent.embeddings")
+
+EMBEDDING_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+
+_embedding_fn = None
+_embedding_lock = threading.Lock()
+
+
+def get_embedding_function():
+    """
+    Factory do embedding function (singleton).
+
+    Carregar o SentenceTransformer custa segundos e centenas de MB,
+    entao todas as sessoes do worker usam a mesma instancia.
+    """
+    global _embedding_fn
+    if _embedding_fn is None:
+        with _embedding_lock:
+            if _embedding_fn is None:
+                from chromadb.utils import embedding_functions
+
+                logger.info("Carregando modelo de embeddings %s", EMBEDDING_MODEL_NAME)
+                _embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
+                    model_name=EMBEDDING_MODEL_NAME
+                )
+    return _embedding_fn
+
+
+class EmbeddingMemo:
+    """
+    Memo LRU texto -> vetor na frente do embedding function.
+
+    No mesmo turno a pergunta passa pela busca da memoria, pelo cache
+    semantico do reasoning e pelo insert no ChromaDB; so a primeira
+    chamada paga o forward do modelo. Os misses de um lote saem num
+    forward so.
+    """
+
+    def __init__(self, embedding_fn, max_entries: int = 512):
+        self.embedding_fn = embedding_fn
+        self._vectors = LRUCache(max_entries=max_entries)
+        self.computed = 0
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def embed(self, texts: Sequence[str]) -> List:
+        """Vetores na ordem de texts (mesma interface do embedding function)."""
+        vectors = [self._vectors.get(self._key(text)) for text in texts]
+        missing = list(dict.fromkeys(
+            text for text, vector in zip(texts, vectors) if vector is None
+        ))
+        if not missing:
+            return vectors
+
+        fresh = dict(zip(missing, self.embedding_fn(missing)))
+        self.computed += len(missing)
+        for text, vector in fresh.items():
+            self._vectors.set(self._key(text), vector)
+        return [
+            fresh[text] if vector is None else vector
+            for text, vector in zip(texts, vectors)
+        ]
+
+    def embed_one(self, text: str):
+        return self.embed([text])[0]
+
+    def stats(self) -> Dict:
+        return {**self._vectors.stats(), "computed": self.computed}
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        logger.warning("%s invalido (%r); usando %s", name, raw, default)
+        return default
+
+
+_embedding_memo = None
+
+
+def get_embedding_memo() -> EmbeddingMemo:
+    """Memo compartilhado (memoria + cache semantico usam o mesmo)."""
+    global _embedding_memo
+    if _embedding_memo is None:
+        embedding_fn = get_embedding_function()
+        with _embedding_lock:
+            if _embedding_memo is None:
+                _embedding_memo = EmbeddingMemo(
+                    embedding_fn,
+                    max_entries=_env_int("PULSE_EMBEDDING_MEMO_SIZE", 512),
+                )
+    return _embedding_memo
@@ -0,0 +1,256 @@
+"""
+Context caching do Gemini para o prefixo estavel dos prompts.
+
+A instrucao do agente (~2k tokens) + contexto de memoria do usuario sao
+iguais em todas as chamadas da sessao; em vez de reenviar tudo, criamos
+um CachedContent e as chamadas so referenciam o handle.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.genai import types
+
+logger = logging.getLogger("pulse_agent.gemini_cache")
+
+CacheKey = Tuple[str, str, str]  # (modelo, tag do modo/instrucao, hash do prefixo)
+
+
+def _error_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_cache_error(exc: BaseException) -> bool:
+    """Erro por causa do handle (expirado/apagado/invalido), nao da chamada."""
+    code = _error_code(exc)
+    message = str(exc).lower()
+    if code == 404:
+        return True
+    return code in (400, 403) and ("cached" in message or "cachedcontent" in message)
+
+
+def _is_prefix_too_small(exc: BaseException) -> bool:
+    message = str(exc).lower()
+    return "token" in message and ("minimum" in message or "min_total_token" in message)
+
+
+@dataclass
+class _Handle:
+    name: str
+    expires_at: float
+
+
+class ContextCacheManager:
+    """
+    Handles de CachedContent por (modelo, modo + versao da instrucao, hash do prefixo).
+
+    - A criacao roda em background: enquanto o handle nao fica pronto, quem
+      chama recebe None e manda o prompt completo (sessao nova nao espera
+      round trip extra)
+    - Renova antes do TTL acabar, ainda servindo o handle atual
+    - Quando o contexto de um dono (sessao) muda, apaga o handle antigo
+    - Modelo sem suporte a context caching (erro 4xx na criacao) fica
+      marcado por modelo; outras falhas esperam um cooldown por prefixo
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        ttl_seconds: int = 3600,
+        refresh_margin_seconds: int = 120,
+        min_tokens: int = 1024,
+        max_handles: int = 64,
+        failure_cooldown_seconds: float = 600.0,
+        unsupported_cooldown_seconds: float = 6 * 3600.0,
+    ):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = min(refresh_margin_seconds, ttl_seconds // 2)
+        self.min_tokens = min_tokens
+        self.max_handles = max(1, max_handles)
+        self.failure_cooldown_seconds = failure_cooldown_seconds
+        self.unsupported_cooldown_seconds = unsupported_cooldown_seconds
+        self._handles: "OrderedDict[CacheKey, _Handle]" = OrderedDict()
+        self._failures: Dict[CacheKey, float] = {}
+        self._unsupported_models: Dict[str, float] = {}
+        self._creating: Dict[CacheKey, asyncio.Task] = {}
+        self._owners: Dict[str, CacheKey] = {}
+        self.hits = 0
+        self.creations = 0
+        self.failures = 0
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return len(text) // 4
+
+    def supports(self, model: str) -> bool:
+        return self._unsupported_models.get(model, 0.0) <= time.monotonic()
+
+    async def get_handle(
+        self,
+        *,
+        model: str,
+        tag: str,
+        system_instruction: str,
+        tools: Optional[List[types.Tool]] = None,
+        owner: Optional[str] = None,
+    ) -> Optional[str]:
+        """Nome do CachedContent pronto para esse prefixo, ou None (usar prompt completo)."""
+        if not self.supports(model):
+            return None
+        if self.estimate_tokens(system_instruction) < self.min_tokens:
+            return None
+
+        digest = hashlib.sha1(system_instruction.encode("utf-8")).hexdigest()[:16]
+        key: CacheKey = (model, tag, digest)
+        self._track_owner(owner, key)
+
+        now = time.monotonic()
+        handle = self._handles.get(key)
+        if handle is not None and handle.expires_at <= now:
+            self._handles.pop(key, None)
+            handle = None
+        if handle is not None:
+            self._handles.move_to_end(key)
+            self.hits += 1
+            if handle.expires_at - self.refresh_margin_seconds <= now:
+                self._start_create(key, model, system_instruction, tools)
+            return handle.name
+
+        if self._failures.get(key, 0.0) <= now:
+            self._start_create(key, model, system_instruction, tools)
+        return None
+
+    def _start_create(
+        self,
+        key: CacheKey,
+        model: str,
+        system_instruction: str,
+        tools: Optional[List[types.Tool]],
+    ):
+        if key in self._creating:
+            return
+        task = asyncio.get_running_loop().create_task(
+            self._create(key, model, system_instruction, tools)
+        )
+        self._creating[key] = task
+        task.add_done_callback(lambda _: self._creating.pop(key, None))
+
+    async def wait_pending(self):
+        """Espera as criacoes em andamento (testes e shutdown)."""
+        if self._creating:
+            await asyncio.gather(*list(self._creating.values()), return_exceptions=True)
+
+    async def _create(
+        self,
+        key: CacheKey,
+        model: str,
+        system_instruction: str,
+        tools: Optional[List[types.Tool]],
+    ):
+        try:
+            cached = await self.client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"pulse-{key[1]}-{key[2]}",
+                    system_instruction=system_instruction,
+                    tools=tools,
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+        except Exception as exc:
+            self.failures += 1
+            code = _error_code(exc)
+            if code is not None and 400 <= code < 500 and not _is_prefix_too_small(exc):
+                # Vale para qualquer prefixo desse modelo (o proximo usuario tambem)
+                self._unsupported_models[model] = time.monotonic() + self.unsupported_cooldown_seconds
+                logger.warning(
+                    "Context cache indisponivel para o modelo %s; usando prompt completo: %s",
+                    model, exc,
+                )
+            else:
+                self._failures[key] = time.monotonic() + self.failure_cooldown_seconds
+                logger.warning(
+                    "Falha ao criar context cache (%s, %s); usando prompt completo: %s",
+                    model, key[1], exc,
+                )
+            return
+
+        self.creations += 1
+        self._failures.pop(key, None)
+        previous = self._handles.pop(key, None)
+        self._handles[key] = _Handle(
+            name=cached.name,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        if previous is not None:
+            self._schedule_delete(previous.name)
+        while len(self._handles) > self.max_handles:
+            _, evicted = self._handles.popitem(last=False)
+            self._schedule_delete(evicted.name)
+        logger.debug("Context cache criado: %s (%s)", cached.name, key[1])
+
+    def _track_owner(self, owner: Optional[str], key: CacheKey):
+        """Contexto do dono mudou (memoria nova): o handle antigo expira ja."""
+        if not owner:
+            return
+        previous = self._owners.get(owner)
+        self._owners[owner] = key
+        if previous is None or previous == key:
+            return
+        if previous in self._owners.values():
+            return  # Outro dono ainda usa
+        handle = self._handles.pop(previous, None)
+        if handle is not None:
+            self._schedule_delete(handle.name)
+
+    def release_owner(self, owner: str):
+        """Sessao encerrada: apaga o handle dela se ninguem mais usa."""
+        key = self._owners.pop(owner, None)
+        if key is None or key in self._owners.values():
+            return
+        handle = self._handles.pop(key, None)
+        if handle is not None:
+            self._schedule_delete(handle.name)
+
+    def discard(self, name: str):
+        """
+        Handle rejeitado pela API (ver is_cache_error): esquece, apaga no
+        servidor e so recria depois do cooldown.
+        """
+        for key, handle in list(self._handles.items()):
+            if handle.name == name:
+                del self._handles[key]
+                self._failures[key] = time.monotonic() + self.failure_cooldown_seconds
+        self._schedule_delete(name)
+
+    def _schedule_delete(self, name: str):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Sem loop: o TTL do servidor cuida
+        loop.create_task(self._delete(name))
+
+    async def _delete(self, name: str):
+        try:
+            await self.client.aio.caches.delete(name=name)
+        except Exception as exc:
+            logger.debug("Falha ao apagar context cache %s: %s", name, exc)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "handles": len(self._handles),
+            "hits": self.hits,
+            "creations": self.creations,
+            "failures": self.failures,
+            "unsupported_models": sum(
+                1 for until in self._unsupported_models.values() if until > time.monotonic()
+            ),
+        }
@@ -0,0 +1,65 @@
+"""Cliente Gemini compartilhado pelo processo e limite de chamadas simultaneas."""
+
+import asyncio
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import weakref
+
+from google import genai
+
+logger = logging.getLogger("pulse_agent.gemini")
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+_client = None
+_client_lock = threading.Lock()
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_gemini_client() -> genai.Client:
+    """
+    Factory do genai.Client (singleton).
+
+    Um cliente so para reasoning e visao: as chamadas async (client.aio)
+    reaproveitam o mesmo pool de conexoes HTTP em vez de abrir um por modulo.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+                if not api_key:
+                    raise RuntimeError("GOOGLE_API_KEY nao encontrada")
+                _client = genai.Client(api_key=api_key)
+    return _client
+
+
+def max_concurrency() -> int:
+    try:
+        return max(1, int(os.getenv("PULSE_GEMINI_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)))
+    except ValueError:
+        return DEFAULT_MAX_CONCURRENCY
+
+
+@asynccontextmanager
+async def gemini_slot() -> AsyncIterator[None]:
+    """
+    Reserva uma vaga para chamada ao Gemini.
+
+    Semaforo por event loop (asyncio.Semaphore nao pode ser dividido
+    entre loops); chamadas acima do limite esperam a vez em vez de
+    estourar rate limit ou abrir conexoes sem fim.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores.setdefault(loop, asyncio.Semaphore(max_concurrency()))
+    if semaphore.locked():
+        logger.debug("Limite de chamadas Gemini atingido; aguardando vaga")
+    async with semaphore:
+        yield
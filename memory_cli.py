@@ -8,6 +8,8 @@ Uso:
     python memory_cli.py clear <user_id>           # Limpa dados
     python memory_cli.py export <user_id> <file>   # Exporta conversas
     python memory_cli.py list                      # Lista usuários
+    python memory_cli.py context <user_id> [query] # Contexto empacotado
+    python memory_cli.py prune                     # Remove fatos esquecidos
 """
 
 import sys
@@ -15,7 +17,7 @@ import json
 from pathlib import Path
 from datetime import datetime
 
-from memory_system import MemorySystem
+from memory_system import get_memory_system
 
 
 def print_header(text: str):
@@ -29,7 +31,7 @@ def cmd_stats(user_id: str):
     """Mostra estatísticas do usuário"""
     print_header(f"Estatísticas - {user_id}")
     
-    memory = MemorySystem()
+    memory = get_memory_system()
     stats = memory.get_user_stats(user_id)
     
     if not stats:
@@ -59,7 +61,7 @@ def cmd_search(user_id: str, query: str):
     """Busca semântica nas conversas"""
     print_header(f"Busca: '{query}'")
     
-    memory = MemorySystem()
+    memory = get_memory_system()
     results = memory.search_similar_context(query, user_id, limit=5)
     
     if not results:
@@ -94,7 +96,7 @@ def cmd_clear(user_id: str):
         print("❌ Operação cancelada")
         return
     
-    memory = MemorySystem()
+    memory = get_memory_system()
     
     # Mostra stats antes
     stats = memory.get_user_stats(user_id)
@@ -113,26 +115,25 @@ def cmd_export(user_id: str, output_file: str):
     """Exporta conversas para JSON"""
     print_header(f"Exportando conversas - {user_id}")
     
-    memory = MemorySystem()
+    memory = get_memory_system()
     
     # Busca todas as conversas
     try:
-        results = memory.conversations.query(
-            query_texts=[""],
-            n_results=10000,  # Todas
+        results = memory.fetch_by_metadata(
+            memory.conversations,
             where={"user_id": user_id}
         )
     except Exception as e:
         print(f"❌ Erro ao buscar conversas: {e}")
         return
     
-    if not results['documents'][0]:
+    if not results['documents']:
         print("❌ Nenhuma conversa encontrada")
         return
     
     # Organiza por sessão
     sessions = {}
-    for doc, meta in zip(results['documents'][0], results['metadatas'][0]):
+    for doc, meta in zip(results['documents'], results['metadatas']):
         session_id = meta['session_id']
         
         if session_id not in sessions:
@@ -157,7 +158,7 @@ def cmd_export(user_id: str, output_file: str):
         "user_id": user_id,
         "export_date": datetime.now().isoformat(),
         "total_sessions": len(sessions),
-        "total_messages": len(results['documents'][0]),
+        "total_messages": len(results['documents']),
         "sessions": list(sessions.values())
     }
     
@@ -168,27 +169,26 @@ def cmd_export(user_id: str, output_file: str):
     print(f"✅ Exportado com sucesso!")
     print(f"   📁 Arquivo: {output_path.absolute()}")
     print(f"   📊 Sessões: {len(sessions)}")
-    print(f"   💬 Mensagens: {len(results['documents'][0])}")
+    print(f"   💬 Mensagens: {len(results['documents'])}")
 
 
 def cmd_list():
     """Lista todos os usuários com dados"""
     print_header("Usuários com Dados")
     
-    memory = MemorySystem()
+    memory = get_memory_system()
     
     # Busca todos os user_ids únicos
     try:
         # Conversations
-        conv_results = memory.conversations.query(
-            query_texts=[""],
-            n_results=10000
+        conv_results = memory.fetch_by_metadata(
+            memory.conversations,
+            include=["metadatas"]
         )
         
         user_ids = set()
-        if conv_results['metadatas'][0]:
-            for meta in conv_results['metadatas'][0]:
-                user_ids.add(meta['user_id'])
+        for meta in conv_results['metadatas']:
+            user_ids.add(meta['user_id'])
         
         if not user_ids:
             print("❌ Nenhum usuário encontrado")
@@ -208,16 +208,17 @@ def cmd_list():
         print(f"❌ Erro: {e}")
 
 
-def cmd_context(user_id: str):
-    """Mostra contexto que seria carregado"""
+def cmd_context(user_id: str, query: str | None = None):
+    """Mostra contexto que seria carregado (priorizando a pergunta, se houver)"""
     print_header(f"Contexto Atual - {user_id}")
     
-    memory = MemorySystem()
+    memory = get_memory_system()
     context = memory.get_context_for_session(
         user_id,
         include_days=7,
         max_conversations=3,
-        max_facts=10
+        max_facts=10,
+        query=query
     )
     
     if not context or context == "# Primeira conversa com este usuário.\n":
@@ -228,6 +229,16 @@ def cmd_context(user_id: str):
     print(f"\n📏 Tamanho: {len(context)} caracteres")
 
 
+def cmd_prune():
+    """Remove fatos cuja confiança decaiu abaixo do mínimo"""
+    print_header("Poda de Fatos Esquecidos")
+    
+    memory = get_memory_system()
+    removed = memory.prune_facts()
+    
+    print(f"✅ {removed} fatos removidos")
+
+
 def show_usage():
     """Mostra ajuda de uso"""
     print(__doc__)
@@ -271,9 +282,13 @@ def main():
         
         elif command == "context":
             if len(sys.argv) < 3:
-                print("❌ Uso: memory_cli.py context <user_id>")
+                print("❌ Uso: memory_cli.py context <user_id> [pergunta]")
                 sys.exit(1)
-            cmd_context(sys.argv[2])
+            query = " ".join(sys.argv[3:]) or None
+            cmd_context(sys.argv[2], query)
+        
+        elif command == "prune":
+            cmd_prune()
         
         else:
             print(f"❌ Comando desconhecido: {command}")
@@ -5,12 +5,18 @@ Usa ChromaDB para busca vetorial semântica
 
 from datetime import datetime, timedelta
 from pathlib import Path
+import asyncio
 import json
+import math
+import os
+import queue
+import threading
+import time
 import uuid
 import sys
-from typing import List, Dict, Optional, Set
+from typing import Callable, List, Dict, Optional, Set
 import logging
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from enum import Enum
 
 if sys.version_info >= (3, 14):
@@ -21,10 +27,35 @@ if sys.version_info >= (3, 14):
 
 import chromadb
 from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+
+from cache_utils import LRUCache
+from context_packer import ContextItem, ContextPacker, PackerWeights
+from embeddings import EmbeddingMemo, get_embedding_memo
+from text_signals import analyze_text
 
 logger = logging.getLogger("pulse_agent.memory")
 
+# Um PersistentClient por diretório, compartilhado pelo processo
+_chroma_clients: Dict[str, "chromadb.PersistentClient"] = {}
+_chroma_clients_lock = threading.Lock()
+
+
+def _get_chroma_client(path: str):
+    """Reaproveita o client do ChromaDB para o mesmo diretório"""
+    resolved = str(Path(path).resolve())
+    with _chroma_clients_lock:
+        client = _chroma_clients.get(resolved)
+        if client is None:
+            client = chromadb.PersistentClient(
+                path=path,
+                settings=Settings(
+                    anonymized_telemetry=False,
+                    allow_reset=True
+                )
+            )
+            _chroma_clients[resolved] = client
+        return client
+
 
 class FactCategory(Enum):
     """Categorias de fatos sobre o usuário"""
@@ -63,6 +94,336 @@ class UserFact:
     mention_count: int
 
 
+@dataclass
+class PendingDocument:
+    """Documento aguardando embedding + insert em lote"""
+    collection: str  # conversations | user_facts | solutions
+    id: str
+    text: str
+    metadata: Dict
+
+
+FACT_INITIAL_CONFIDENCE = 0.8
+FACT_CONFIDENCE_BOOST = 0.05
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _mentioned_at(metadata: Dict) -> Optional[float]:
+    """Epoch da última menção (fatos antigos só têm as datas ISO)"""
+    if metadata.get("ts"):
+        return metadata["ts"]
+    iso = metadata.get("last_mentioned") or metadata.get("timestamp")
+    try:
+        return datetime.fromisoformat(iso).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _decayed_confidence(metadata: Dict, half_life_days: float, now: float) -> float:
+    """
+    Confiança do fato agora: a gravada vale na última menção (ts) e cai
+    pela metade a cada half_life_days sem o fato ser mencionado de novo
+    """
+    confidence = metadata.get("confidence", FACT_INITIAL_CONFIDENCE)
+    mentioned_at = _mentioned_at(metadata)
+    elapsed = now - mentioned_at if mentioned_at is not None else 0.0
+    if elapsed <= 0 or half_life_days <= 0:
+        return confidence
+    return confidence * 0.5 ** (elapsed / (half_life_days * 86400))
+
+
+def _reinforce_fact(metadata: Dict, half_life_days: float) -> Dict:
+    """Campos atualizados quando um fato é mencionado de novo"""
+    now = datetime.now()
+    confidence = _decayed_confidence(metadata, half_life_days, now.timestamp())
+    return {
+        "mention_count": metadata.get("mention_count", 1) + 1,
+        "last_mentioned": now.isoformat(),
+        "timestamp": now.isoformat(),
+        "ts": now.timestamp(),
+        "confidence": min(1.0, confidence + FACT_CONFIDENCE_BOOST),
+    }
+
+
+def _fact_score(metadata: Dict, confidence: float) -> float:
+    """Valor do fato para o contexto: confiança x log das menções"""
+    mentions = max(1, metadata.get("mention_count", 1))
+    return confidence * (1 + math.log(mentions))
+
+
+def _fact_from_record(
+    fact_id: str,
+    document: str,
+    metadata: Dict,
+    confidence: float
+) -> UserFact:
+    first = metadata.get("first_mentioned", metadata.get("timestamp", ""))
+    return UserFact(
+        id=fact_id,
+        user_id=metadata["user_id"],
+        category=FactCategory(metadata["category"]),
+        content=document,
+        confidence=confidence,
+        first_mentioned=first,
+        last_mentioned=metadata.get("last_mentioned", first),
+        mention_count=metadata.get("mention_count", 1),
+    )
+
+
+class WorkingTurn:
+    """Turno compacto da working memory (sem metadata/tópicos)"""
+    
+    __slots__ = ("id", "role", "text", "timestamp", "reasoning_used")
+    
+    def __init__(
+        self,
+        id: str,
+        role: str,
+        text: str,
+        timestamp: str,
+        reasoning_used: bool = False
+    ):
+        self.id = id
+        self.role = role
+        self.text = text
+        self.timestamp = timestamp
+        self.reasoning_used = reasoning_used
+    
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "WorkingTurn":
+        return cls(
+            id=data["id"],
+            role=data["role"],
+            text=data["text"],
+            timestamp=data["timestamp"],
+            reasoning_used=bool(data.get("reasoning_used", False))
+        )
+
+
+class RecentTurns:
+    """
+    Ring buffer dos últimos N turnos da sessão
+    
+    Lista pré-alocada de tamanho fixo: append O(1) e memória constante
+    por sessão. Turnos mais antigos só existem no ChromaDB.
+    """
+    
+    __slots__ = ("_slots", "_start", "_size")
+    
+    def __init__(self, capacity: int):
+        self._slots: List[Optional[WorkingTurn]] = [None] * max(1, capacity)
+        self._start = 0
+        self._size = 0
+    
+    @property
+    def capacity(self) -> int:
+        return len(self._slots)
+    
+    def append(self, turn: WorkingTurn):
+        capacity = len(self._slots)
+        if self._size < capacity:
+            self._slots[(self._start + self._size) % capacity] = turn
+            self._size += 1
+        else:
+            # Cheio: sobrescreve o mais antigo
+            self._slots[self._start] = turn
+            self._start = (self._start + 1) % capacity
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __iter__(self):
+        capacity = len(self._slots)
+        for offset in range(self._size):
+            yield self._slots[(self._start + offset) % capacity]
+    
+    def to_list(self) -> List[Dict]:
+        """Do mais antigo para o mais recente, pronto para JSON"""
+        return [turn.to_dict() for turn in self]
+    
+    @classmethod
+    def from_list(cls, items: List[Dict], capacity: int) -> "RecentTurns":
+        buffer = cls(capacity)
+        for item in items[-capacity:]:
+            buffer.append(WorkingTurn.from_dict(item))
+        return buffer
+
+
+class ContextCache:
+    """
+    Cache LRU + TTL do contexto montado por usuário
+    
+    Chaves (sempre começam pelo user_id):
+    - contexto da sessão: (user_id, include_days, max_conversations, max_facts, query)
+    - memória por turno: (user_id, "turn", query, limit)
+    Cada escrita de um usuário incrementa a geração dele e derruba
+    as entradas; um contexto calculado antes da escrita não é gravado.
+    """
+    
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries = LRUCache(max_entries=self.max_entries, ttl_seconds=ttl_seconds)
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def hits(self) -> int:
+        return self._entries.hits
+    
+    @property
+    def misses(self) -> int:
+        return self._entries.misses
+    
+    def stats(self) -> Dict:
+        return self._entries.stats()
+    
+    def generation(self, user_id: str) -> int:
+        with self._lock:
+            return self._generations.get(user_id, 0)
+    
+    def get(self, key: tuple) -> Optional[str]:
+        return self._entries.get(key)
+    
+    def set(self, key: tuple, value: str, generation: int):
+        user_id = key[0]
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                return  # Houve escrita durante o cálculo
+            self._entries.set(key, value)
+    
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._entries.delete_where(lambda key: key[0] == user_id)
+
+
+class MemoryWriteQueue:
+    """
+    Fila limitada de escrita com worker dedicado
+
+    Os turnos entram na fila e uma thread própria persiste tudo em lote,
+    então o event loop nunca espera embedding nem disco.
+    Fila cheia = backpressure: quem enfileira espera até abrir vaga.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        persist_batch: Callable[[List[ConversationTurn]], None],
+        max_size: int = 256,
+        batch_size: int = 32,
+        max_delay: float = 0.05
+    ):
+        self._persist_batch = persist_batch
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max(0.0, max_delay)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Turnos enfileirados ou em gravação"""
+        return self._queue.unfinished_tasks
+
+    def is_full(self) -> bool:
+        return self._queue.full()
+
+    def put(self, turn: ConversationTurn, timeout: Optional[float] = None):
+        """Enfileira bloqueando se a fila estiver cheia"""
+        self._ensure_worker()
+        self._queue.put(turn, timeout=timeout)
+
+    async def put_async(self, turn: ConversationTurn):
+        """Enfileira sem bloquear o event loop (espera em thread se cheia)"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(turn)
+        except queue.Full:
+            logger.warning(
+                f"Fila de escrita cheia ({self._queue.maxsize}), aplicando backpressure"
+            )
+            await asyncio.to_thread(self._queue.put, turn)
+
+    def flush(self):
+        """Bloqueia até todos os turnos enfileirados serem persistidos"""
+        if self._worker is None:
+            return
+        self._queue.join()
+
+    async def flush_async(self):
+        await asyncio.to_thread(self.flush)
+
+    def close(self):
+        """Drena a fila e encerra o worker"""
+        with self._worker_lock:
+            worker = self._worker
+            self._worker = None
+        if worker is None:
+            return
+        self._queue.put(self._STOP)
+        worker.join()
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name="pulse-memory-writer",
+                    daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is self._STOP:
+                self._queue.task_done()
+                return
+
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.max_delay
+
+            # Junta o que chegar até batch_size ou max_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                self._persist_batch(batch)
+            except Exception:
+                logger.exception(f"Falha ao persistir lote de {len(batch)} turnos")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if stop:
+                return
+
+
 class MemorySystem:
     """
     Sistema de memória com 3 níveis:
@@ -71,25 +432,41 @@ class MemorySystem:
     3. Long-term Memory - fatos consolidados (ChromaDB + alta relevância)
     """
     
-    def __init__(self, storage_dir: str = "KMS/memory"):
+    def __init__(
+        self,
+        storage_dir: str = "KMS/memory",
+        embedding_fn=None,
+        write_queue_size: int = 256,
+        write_batch_size: int = 32,
+        write_max_delay: float = 0.05,
+        journal_compact_every: int = 500,
+        context_cache_size: int = 256,
+        context_cache_ttl: float = 300.0,
+        fact_similarity_threshold: float = 0.9,
+        fact_prune_interval: float = 6 * 3600,
+        fact_half_life_days: float = 30.0,
+        fact_min_confidence: float = 0.2,
+        working_memory_turns: int = 20,
+        context_token_budget: int = 1200,
+        context_max_item_tokens: int = 120,
+        turn_context_token_budget: int = 300
+    ):
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(parents=True, exist_ok=True)
         
         logger.info(f"Inicializando sistema de memória em {self.storage_dir}")
         
         # ChromaDB com embeddings do sentence-transformers
-        # Modelo multilingual (suporta português)
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="paraphrase-multilingual-MiniLM-L12-v2"
-        )
+        # Modelo multilingual (suporta português), compartilhado pelo processo.
+        # Todo embedding passa pelo memo: cada texto distinto é embeddado uma
+        # vez e o vetor vai explícito para o ChromaDB
+        if embedding_fn is None:
+            self.embeddings = get_embedding_memo()
+        else:
+            self.embeddings = EmbeddingMemo(embedding_fn)
+        self.embedding_fn = self.embeddings.embedding_fn
         
-        self.chroma_client = chromadb.PersistentClient(
-            path=str(self.storage_dir / "chroma"),
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
+        self.chroma_client = _get_chroma_client(str(self.storage_dir / "chroma"))
         
         # Coleções
         self.conversations = self._get_or_create_collection(
@@ -108,10 +485,63 @@ class MemorySystem:
         )
         
         # Working memory (sessão ativa)
+        # RLock: a thread de escrita e o event loop mexem nas sessões
+        self._lock = threading.RLock()
         self.active_sessions: Dict[str, Dict] = {}
+        self.working_memory_turns = max(1, working_memory_turns)
+        
+        # Snapshot + journal append-only (um registro por evento)
         self.sessions_file = self.storage_dir / "active_sessions.json"
+        self.journal_file = self.storage_dir / "active_sessions.journal"
+        self.journal_compact_every = max(1, journal_compact_every)
+        self._journal_handle = None
+        self._journal_seq = 0
+        self._journal_records = 0
         self._load_active_sessions()
         
+        # Contexto por usuário (reconexões do LiveKit batem aqui)
+        self.context_cache = ContextCache(
+            max_entries=context_cache_size,
+            ttl_seconds=context_cache_ttl
+        )
+        
+        # Orçamento de tokens do contexto (turnos, fatos e soluções por score)
+        self.context_packer = ContextPacker(
+            token_budget=context_token_budget,
+            max_item_tokens=context_max_item_tokens
+        )
+        # Memória por turno: similaridade com a pergunta manda
+        self.turn_context_packer = ContextPacker(
+            token_budget=turn_context_token_budget,
+            weights=PackerWeights(recency=0.2, similarity=0.7, mentions=0.1),
+            max_item_tokens=context_max_item_tokens
+        )
+        
+        # Consolidação de fatos (dedupe + decaimento)
+        self.fact_similarity_threshold = fact_similarity_threshold
+        self.fact_prune_interval = fact_prune_interval
+        self.fact_half_life_days = fact_half_life_days
+        self.fact_min_confidence = fact_min_confidence
+        
+        # Pipeline de escrita assíncrona (add_turn_async)
+        self.write_queue = MemoryWriteQueue(
+            self._persist_turns,
+            max_size=write_queue_size,
+            batch_size=write_batch_size,
+            max_delay=write_max_delay
+        )
+        
+        # Poda dos fatos esquecidos fora do caminho de escrita
+        self._stop_fact_pruning = threading.Event()
+        self._fact_pruner = None
+        if self.fact_prune_interval > 0:
+            self._fact_pruner = threading.Thread(
+                target=self._prune_facts_loop,
+                name="pulse-memory-fact-pruner",
+                daemon=True
+            )
+            self._fact_pruner.start()
+        
     def _get_or_create_collection(self, name: str, description: str):
         """Cria ou recupera coleção do ChromaDB"""
         try:
@@ -126,6 +556,14 @@ class MemorySystem:
                 metadata={"description": description}
             )
     
+    def warmup(self):
+        """Força carga do modelo (primeiro forward é o mais lento)"""
+        start = time.perf_counter()
+        self.embedding_fn(["aquecimento do modelo de embeddings"])
+        logger.info(
+            f"Memória aquecida em {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+    
     # ==================== SESSoES ====================
     
     def create_session(self, user_id: str) -> str:
@@ -136,14 +574,18 @@ class MemorySystem:
             "id": session_id,
             "user_id": user_id,
             "start_time": datetime.now().isoformat(),
-            "messages": [],
+            "messages": RecentTurns(self.working_memory_turns),
             "topics": set(),
             "reasoning_count": 0,
             "total_turns": 0,
         }
         
-        self.active_sessions[session_id] = session
-        self._save_active_sessions()
+        with self._lock:
+            self.active_sessions[session_id] = session
+            self._append_journal({
+                "op": "create",
+                "session": self._serialize_session(session),
+            })
         
         logger.info(f"Sessão {session_id[:8]} criada para usuário {user_id}")
         return session_id
@@ -158,69 +600,198 @@ class MemorySystem:
     ) -> str:
         """
         Adiciona turno à conversa
-        Salva em working memory E ChromaDB
+        Salva em working memory E ChromaDB (síncrono)
         """
-        if session_id not in self.active_sessions:
-            raise ValueError(f"Sessão {session_id} não encontrada")
+        turn = self._register_turn(session_id, role, text, metadata, reasoning_used)
+        self._persist_turns([turn])
         
-        session = self.active_sessions[session_id]
-        turn_id = str(uuid.uuid4())
+        logger.debug(f"Turno {turn.id[:8]} adicionado à sessão {session_id[:8]}")
+        return turn.id
+    
+    async def add_turn_async(
+        self,
+        session_id: str,
+        role: str,
+        text: str,
+        metadata: Optional[Dict] = None,
+        reasoning_used: bool = False
+    ) -> str:
+        """
+        Versão não bloqueante do add_turn
         
-        # Extrai tópicos técnicos do texto
-        topics = self._extract_topics(text)
+        Atualiza a working memory na hora e devolve o id do turno;
+        embedding, extração de fatos e disco ficam com o worker de escrita.
+        Se a fila estiver cheia, espera vaga (backpressure).
+        """
+        turn = self._register_turn(session_id, role, text, metadata, reasoning_used)
+        await self.write_queue.put_async(turn)
         
-        turn = ConversationTurn(
-            id=turn_id,
-            session_id=session_id,
-            user_id=session["user_id"],
-            role=role,
-            text=text,
-            timestamp=datetime.now().isoformat(),
-            metadata=metadata or {},
-            topics=topics,
-            reasoning_used=reasoning_used
-        )
+        logger.debug(f"Turno {turn.id[:8]} enfileirado na sessão {session_id[:8]}")
+        return turn.id
+    
+    def flush(self):
+        """Espera a fila de escrita esvaziar"""
+        self.write_queue.flush()
+    
+    async def flush_async(self):
+        """Espera a fila de escrita esvaziar sem bloquear o event loop"""
+        await self.write_queue.flush_async()
+    
+    def close(self):
+        """Persiste o que estiver pendente e encerra o worker de escrita"""
+        self._stop_fact_pruning.set()
+        self.write_queue.close()
+        with self._lock:
+            self._save_active_sessions()
+            if self._journal_handle is not None:
+                self._journal_handle.close()
+                self._journal_handle = None
+    
+    def _register_turn(
+        self,
+        session_id: str,
+        role: str,
+        text: str,
+        metadata: Optional[Dict],
+        reasoning_used: bool
+    ) -> ConversationTurn:
+        """Cria o turno e atualiza a working memory (só um append no journal)"""
+        with self._lock:
+            if session_id not in self.active_sessions:
+                raise ValueError(f"Sessão {session_id} não encontrada")
+            
+            session = self.active_sessions[session_id]
+            
+            # Extrai tópicos técnicos do texto
+            topics = self._extract_topics(text)
+            
+            turn = ConversationTurn(
+                id=str(uuid.uuid4()),
+                session_id=session_id,
+                user_id=session["user_id"],
+                role=role,
+                text=text,
+                timestamp=datetime.now().isoformat(),
+                metadata=metadata or {},
+                topics=topics,
+                reasoning_used=reasoning_used
+            )
+            
+            # Registro compacto: working memory e journal não levam metadata
+            message = WorkingTurn(
+                id=turn.id,
+                role=role,
+                text=text,
+                timestamp=turn.timestamp,
+                reasoning_used=reasoning_used
+            ).to_dict()
+            message["topics"] = sorted(topics)
+            self._apply_turn(session, message)
+            self._append_journal({
+                "op": "turn",
+                "sid": session_id,
+                "turn": message,
+            })
         
-        # Adiciona à working memory
-        session["messages"].append(asdict(turn))
-        session["topics"].update(topics)
+        return turn
+    
+    def _apply_turn(self, session: Dict, message: Dict):
+        """Aplica um turno na sessão (usado no registro e no replay)"""
+        session["messages"].append(WorkingTurn.from_dict(message))
+        session["topics"].update(message.get("topics", []))
         session["total_turns"] += 1
-        if reasoning_used:
+        if message.get("reasoning_used"):
             session["reasoning_count"] += 1
+    
+    def _persist_turns(self, turns: List[ConversationTurn]):
+        """Grava um lote de turnos no ChromaDB e no disco"""
+        if not turns:
+            return
         
-        # Salva no ChromaDB para persistência
-        self.conversations.add(
-            documents=[text],
-            metadatas=[{
-                "session_id": session_id,
-                "user_id": session["user_id"],
-                "role": role,
-                "timestamp": turn.timestamp,
-                "topics": ",".join(topics),
-                "reasoning_used": reasoning_used,
-            }],
-            ids=[turn_id]
-        )
+        pending: List[PendingDocument] = []
+        for turn in turns:
+            pending.append(PendingDocument(
+                collection="conversations",
+                id=turn.id,
+                text=turn.text,
+                metadata={
+                    "session_id": turn.session_id,
+                    "user_id": turn.user_id,
+                    "role": turn.role,
+                    "timestamp": turn.timestamp,
+                    "ts": datetime.fromisoformat(turn.timestamp).timestamp(),
+                    "topics": ",".join(turn.topics),
+                    "reasoning_used": turn.reasoning_used,
+                }
+            ))
+            
+            # Se for mensagem do usuário, extrai fatos
+            if turn.role == "user":
+                pending.extend(self._extract_facts(turn.user_id, turn.text, turn.topics))
+            
+            # Se for solução bem-sucedida, salva
+            if turn.role == "assistant" and self._is_solution(turn.text):
+                pending.append(self._build_solution(turn.user_id, turn.text, turn.topics))
         
-        # Se for mensagem do usuário, extrai fatos
-        if role == "user":
-            self._extract_and_save_facts(session["user_id"], text, topics)
+        self._bulk_insert(pending)
+        self._maybe_compact_journal()
+    
+    def _bulk_insert(self, pending: List[PendingDocument]):
+        """
+        Insere documentos das 3 coleções com UM forward do modelo
+        
+        Textos repetidos (ex: turno do usuário que também virou fato)
+        são embeddados uma vez só, e pergunta já embeddada na busca do
+        turno sai do memo; os vetores vão prontos via embeddings=.
+        """
+        if not pending:
+            return
+        
+        unique_texts = list(dict.fromkeys(doc.text for doc in pending))
+        vectors = self.embeddings.embed(unique_texts)
+        vector_by_text = dict(zip(unique_texts, vectors))
         
-        # Se for solução bem-sucedida, salva
-        if role == "assistant" and self._is_solution(text):
-            self._save_solution(session["user_id"], text, topics)
+        by_collection: Dict[str, List[PendingDocument]] = {}
+        for doc in pending:
+            by_collection.setdefault(doc.collection, []).append(doc)
         
-        self._save_active_sessions()
+        # Fatos repetidos viram update do fato existente
+        if "user_facts" in by_collection:
+            by_collection["user_facts"] = self._consolidate_facts(
+                by_collection["user_facts"], vector_by_text
+            )
         
-        logger.debug(f"Turno {turn_id[:8]} adicionado à sessão {session_id[:8]}")
-        return turn_id
+        collections = {
+            "conversations": self.conversations,
+            "user_facts": self.user_facts,
+            "solutions": self.solutions,
+        }
+        for name, docs in by_collection.items():
+            if not docs:
+                continue
+            collections[name].add(
+                ids=[doc.id for doc in docs],
+                documents=[doc.text for doc in docs],
+                metadatas=[doc.metadata for doc in docs],
+                embeddings=[vector_by_text[doc.text] for doc in docs]
+            )
+        
+        for user_id in {doc.metadata["user_id"] for doc in pending}:
+            self.context_cache.invalidate_user(user_id)
+        
+        logger.debug(
+            f"Lote persistido: {len(pending)} documentos, "
+            f"{len(unique_texts)} embeddings"
+        )
     
     def end_session(self, session_id: str, rating: Optional[int] = None):
         """Finaliza sessão e consolida memória"""
-        if session_id not in self.active_sessions:
-            return
+        with self._lock:
+            session = self.active_sessions.pop(session_id, None)
+            if session is None:
+                return
+            self._append_journal({"op": "end", "sid": session_id})
         
-        session = self.active_sessions[session_id]
         session["end_time"] = datetime.now().isoformat()
         session["rating"] = rating
         
@@ -237,10 +808,6 @@ class MemorySystem:
             f"Reasoning: {session['reasoning_count']}, "
             f"Rating: {rating or 'N/A'}"
         )
-        
-        # Remove da working memory
-        del self.active_sessions[session_id]
-        self._save_active_sessions()
     
     # ==================== RECUPERAÇÃO DE CONTEXTO ====================
     
@@ -249,7 +816,8 @@ class MemorySystem:
         user_id: str,
         include_days: int = 7,
         max_conversations: int = 3,
-        max_facts: int = 10
+        max_facts: int = 10,
+        query: Optional[str] = None
     ) -> str:
         """
         Monta contexto completo para injetar no prompt
@@ -258,127 +826,200 @@ class MemorySystem:
         - Conversas recentes relevantes
         - Fatos consolidados sobre o usuário
         - Soluções que funcionaram antes
+        
+        Os candidatos disputam o orçamento de tokens do context_packer
+        (recência, similaridade com `query` e menções). Sem query o
+        contexto é estável durante a sessão.
+        
+        Resultado fica no context_cache até o usuário ter nova escrita
+        ou o TTL vencer.
         """
+        cache_key = (user_id, include_days, max_conversations, max_facts, query)
+        cached = self.context_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        generation = self.context_cache.generation(user_id)
+        context = self._build_context(
+            user_id, include_days, max_conversations, max_facts, query
+        )
+        self.context_cache.set(cache_key, context, generation)
+        return context
+    
+    def _build_context(
+        self,
+        user_id: str,
+        include_days: int,
+        max_conversations: int,
+        max_facts: int,
+        query: Optional[str] = None
+    ) -> str:
+        """Monta o contexto direto do ChromaDB (sem cache)"""
+        query_embedding = self._query_embedding(query) if query else None
+        
+        candidates = (
+            self._conversation_candidates(
+                user_id, include_days, max_conversations, query_embedding
+            )
+            + self._fact_candidates(user_id, max_facts, query_embedding)
+            + self._solution_candidates(user_id, 10, query_embedding)
+        )
+        if not candidates:
+            return "# Primeira conversa com este usuário.\n"
+        
+        by_section: Dict[str, List[ContextItem]] = {}
+        for item in self.context_packer.select(candidates):
+            by_section.setdefault(item.section, []).append(item)
+        
         context_parts = []
         
         # 1. Conversas recentes
-        recent_context = self._get_recent_conversations(
-            user_id, include_days, max_conversations
-        )
-        if recent_context:
+        if "conversations" in by_section:
             context_parts.append("# CONVERSAS RECENTES")
-            context_parts.append(recent_context)
+            context_parts.append(self._format_grouped(
+                by_section["conversations"], "\n## {header}"
+            ))
         
         # 2. Fatos sobre o usuário
-        facts_context = self._get_user_facts_context(user_id, max_facts)
-        if facts_context:
+        if "facts" in by_section:
             context_parts.append("\n# INFORMAÇÕES SOBRE O USUÁRIO")
-            context_parts.append(facts_context)
+            context_parts.append(self._format_grouped(
+                by_section["facts"], "\n**{header}:**"
+            ))
         
         # 3. Soluções anteriores
-        solutions_context = self._get_solutions_context(user_id, limit=5)
-        if solutions_context:
+        if "solutions" in by_section:
             context_parts.append("\n# SOLUÇÕES QUE FUNCIONARAM ANTES")
-            context_parts.append(solutions_context)
+            context_parts.append("\n".join(
+                f"\n{i}. {item.text}"
+                for i, item in enumerate(by_section["solutions"], 1)
+            ))
         
         if not context_parts:
             return "# Primeira conversa com este usuário.\n"
         
         return "\n".join(context_parts)
     
-    def _get_recent_conversations(
+    @staticmethod
+    def _format_grouped(items: List[ContextItem], header_format: str) -> str:
+        formatted = []
+        current_group = None
+        for item in items:
+            if item.group != current_group:
+                current_group = item.group
+                formatted.append(header_format.format(header=item.header))
+            formatted.append(item.text)
+        return "\n".join(formatted)
+    
+    def _fetch_for_context(self, collection, where: Dict, with_embeddings: bool) -> Dict:
+        include = ["documents", "metadatas"]
+        if with_embeddings:
+            include.append("embeddings")
+        results = self.fetch_by_metadata(collection, where=where, include=include)
+        if not with_embeddings:
+            results["embeddings"] = [None] * len(results["ids"])
+        return results
+    
+    @staticmethod
+    def _similarity(query_embedding, embedding) -> float:
+        if query_embedding is None or embedding is None:
+            return 0.0
+        return _cosine(query_embedding, embedding)
+    
+    def _conversation_candidates(
         self,
         user_id: str,
         days: int,
-        max_sessions: int
-    ) -> str:
-        """Busca conversas recentes do usuário"""
-        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        max_sessions: int,
+        query_embedding=None
+    ) -> List[ContextItem]:
+        """Turnos das sessões recentes do usuário (sem corte fixo)"""
+        cutoff = (datetime.now() - timedelta(days=days)).timestamp()
         
         try:
-            results = self.conversations.query(
-                query_texts=[""],  # Empty = get by metadata only
-                n_results=50,
-                where={
+            results = self._fetch_for_context(
+                self.conversations,
+                {
                     "$and": [
                         {"user_id": user_id},
-                        {"timestamp": {"$gte": cutoff}}
+                        {"ts": {"$gte": cutoff}}
                     ]
-                }
+                },
+                query_embedding is not None
             )
         except Exception as e:
             logger.warning(f"Erro ao buscar conversas recentes: {e}")
-            return ""
+            return []
         
-        if not results['documents'][0]:
-            return ""
-        
-        # Agrupa por sessão
-        sessions_data = {}
-        for doc, meta in zip(results['documents'][0], results['metadatas'][0]):
-            sid = meta['session_id']
-            if sid not in sessions_data:
-                sessions_data[sid] = {
-                    "messages": [],
-                    "timestamp": meta['timestamp']
-                }
-            sessions_data[sid]["messages"].append({
-                "role": meta['role'],
-                "text": doc,
-                "timestamp": meta['timestamp']
-            })
+        # Agrupa por sessão, em ordem cronológica
+        rows = sorted(
+            zip(results['documents'], results['metadatas'], results['embeddings']),
+            key=lambda row: row[1]['timestamp']
+        )
+        sessions_data: Dict[str, List] = {}
+        for row in rows:
+            sessions_data.setdefault(row[1]['session_id'], []).append(row)
         
-        # Ordena por data (mais recentes primeiro) e pega N últimas
-        sorted_sessions = sorted(
+        # Só as N sessões com atividade mais recente
+        recent_sessions = sorted(
             sessions_data.items(),
-            key=lambda x: x[1]["timestamp"],
+            key=lambda item: item[1][-1][1]['timestamp'],
             reverse=True
         )[:max_sessions]
         
-        # Formata para o contexto
-        formatted = []
-        for sid, data in sorted_sessions:
+        candidates = []
+        for sid, session_rows in recent_sessions:
             session_date = datetime.fromisoformat(
-                data["timestamp"]
+                session_rows[0][1]['timestamp']
             ).strftime("%d/%m/%Y às %H:%M")
-            
-            formatted.append(f"\n## Sessão de {session_date}")
-            
-            # Pega últimas 6 mensagens da sessão
-            for msg in data["messages"][-6:]:
-                role = "Usuário" if msg["role"] == "user" else "Você"
-                text = msg["text"][:250]  # Trunca para economizar tokens
-                if len(msg["text"]) > 250:
-                    text += "..."
-                formatted.append(f"**{role}:** {text}")
-        
-        return "\n".join(formatted)
+            for doc, meta, embedding in session_rows:
+                role = "Usuário" if meta['role'] == "user" else "Você"
+                ts = meta.get('ts') or datetime.fromisoformat(meta['timestamp']).timestamp()
+                candidates.append(ContextItem(
+                    section="conversations",
+                    group=sid,
+                    header=f"Sessão de {session_date}",
+                    text=f"**{role}:** {doc}",
+                    timestamp=ts,
+                    similarity=self._similarity(query_embedding, embedding),
+                    order=ts,
+                ))
+        return candidates
     
-    def _get_user_facts_context(self, user_id: str, limit: int) -> str:
-        """Busca fatos consolidados sobre o usuário"""
+    def _fact_candidates(
+        self,
+        user_id: str,
+        limit: int,
+        query_embedding=None
+    ) -> List[ContextItem]:
+        """Fatos consolidados sobre o usuário (os `limit` mais valiosos)"""
         try:
-            results = self.user_facts.query(
-                query_texts=[""],
-                n_results=limit,
-                where={"user_id": user_id}
+            results = self._fetch_for_context(
+                self.user_facts,
+                {"user_id": user_id},
+                query_embedding is not None
             )
         except Exception as e:
             logger.warning(f"Erro ao buscar fatos do usuário: {e}")
-            return ""
+            return []
         
-        if not results['documents'][0]:
-            return ""
+        # Confiança já decaída; fato esquecido não entra mesmo antes da poda
+        now = time.time()
+        rows = []
+        for doc, meta, embedding in zip(
+            results['documents'], results['metadatas'], results['embeddings']
+        ):
+            confidence = self._fact_confidence(meta, now)
+            if confidence >= self.fact_min_confidence:
+                rows.append((doc, meta, embedding, confidence))
         
-        # Agrupa por categoria
-        facts_by_category = {}
-        for doc, meta in zip(results['documents'][0], results['metadatas'][0]):
-            category = meta['category']
-            if category not in facts_by_category:
-                facts_by_category[category] = []
-            facts_by_category[category].append(doc)
+        # Maior valor primeiro (confiança x menções), recência desempata
+        rows.sort(
+            key=lambda row: (_fact_score(row[1], row[3]), row[1].get('timestamp', '')),
+            reverse=True
+        )
+        rows = rows[:limit]
         
-        # Formata
-        formatted = []
         category_labels = {
             "tech_stack": "🛠️ Stack Técnica",
             "project": "📂 Projetos",
@@ -388,65 +1029,91 @@ class MemorySystem:
             "solution": "✅ Soluções Favoritas"
         }
         
-        for category, facts in facts_by_category.items():
-            label = category_labels.get(category, category)
-            formatted.append(f"\n**{label}:**")
-            for fact in facts[:3]:  # Max 3 por categoria
-                formatted.append(f"  - {fact}")
-        
-        return "\n".join(formatted)
+        candidates = []
+        for rank, (doc, meta, embedding, confidence) in enumerate(rows):
+            category = meta['category']
+            ts = _mentioned_at(meta) or now
+            candidates.append(ContextItem(
+                section="facts",
+                group=category,
+                header=category_labels.get(category, category),
+                text=f"  - {doc}",
+                timestamp=ts,
+                mention_count=meta.get('mention_count', 1),
+                confidence=confidence,
+                similarity=self._similarity(query_embedding, embedding),
+                order=rank,
+            ))
+        return candidates
     
-    def _get_solutions_context(self, user_id: str, limit: int) -> str:
-        """Busca soluções que funcionaram antes"""
+    def _solution_candidates(
+        self,
+        user_id: str,
+        limit: int,
+        query_embedding=None
+    ) -> List[ContextItem]:
+        """Soluções que funcionaram antes (as `limit` mais recentes)"""
         try:
-            results = self.solutions.query(
-                query_texts=[""],
-                n_results=limit,
-                where={"user_id": user_id}
+            results = self._fetch_for_context(
+                self.solutions,
+                {"user_id": user_id},
+                query_embedding is not None
             )
         except Exception as e:
             logger.warning(f"Erro ao buscar soluções: {e}")
-            return ""
+            return []
         
-        if not results['documents'][0]:
-            return ""
+        # Mais recentes primeiro
+        rows = sorted(
+            zip(results['documents'], results['metadatas'], results['embeddings']),
+            key=lambda row: row[1].get('timestamp', ''),
+            reverse=True
+        )[:limit]
         
-        formatted = []
-        for i, (doc, meta) in enumerate(
-            zip(results['documents'][0], results['metadatas'][0]),
-            1
-        ):
-            topics = meta.get('topics', '').split(',')
+        candidates = []
+        for rank, (doc, meta, embedding) in enumerate(rows):
+            topics = [t for t in meta.get('topics', '').split(',') if t]
             topics_str = ', '.join(topics[:3]) if topics else 'geral'
-            formatted.append(f"\n{i}. **[{topics_str}]** {doc[:200]}")
-        
-        return "\n".join(formatted)
+            ts = meta.get('ts') or datetime.fromisoformat(meta['timestamp']).timestamp()
+            candidates.append(ContextItem(
+                section="solutions",
+                group="solutions",
+                text=f"**[{topics_str}]** {doc}",
+                timestamp=ts,
+                similarity=self._similarity(query_embedding, embedding),
+                order=rank,
+            ))
+        return candidates
     
     def search_similar_context(
         self,
         query: str,
         user_id: str,
-        limit: int = 5
+        limit: int = 5,
+        min_similarity: float = 0.5
     ) -> List[Dict]:
         """
         Busca semântica: encontra conversas/soluções similares à query
         Útil para "lembra quando falamos sobre X?"
         """
+        query_embedding = self.embeddings.embed_one(query)
         results = self.conversations.query(
-            query_texts=[query],
+            query_embeddings=[query_embedding],
             n_results=limit,
-            where={"user_id": user_id}
+            where={"user_id": user_id},
+            include=["documents", "metadatas", "embeddings"]
         )
         
         similar = []
         if results['documents'][0]:
-            for doc, meta, distance in zip(
+            # Mesmo score de get_turn_context: cosseno, não 1 - distância l2
+            for doc, meta, embedding in zip(
                 results['documents'][0],
                 results['metadatas'][0],
-                results['distances'][0]
+                results['embeddings'][0]
             ):
-                similarity = 1 - distance
-                if similarity > 0.5:  # Threshold de relevância
+                similarity = _cosine(query_embedding, embedding)
+                if similarity >= min_similarity:
                     similar.append({
                         "text": doc,
                         "role": meta['role'],
@@ -457,208 +1124,497 @@ class MemorySystem:
         
         return similar
     
+    def get_turn_context(
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 6,
+        min_similarity: float = 0.5
+    ) -> str:
+        """
+        Memória relevante para a pergunta do turno (busca vetorial)
+        
+        Complementa o contexto estável da sessão: entra na parte dinâmica
+        do prompt, então não invalida o context cache do Gemini.
+        Fica no context_cache até a próxima escrita do usuário.
+        """
+        query = query.strip()
+        if not query:
+            return ""
+        
+        cache_key = (user_id, "turn", query, limit)
+        cached = self.context_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        generation = self.context_cache.generation(user_id)
+        query_embedding = self._query_embedding(query)
+        if query_embedding is None:
+            return ""
+        
+        candidates = []
+        for section, collection in (
+            ("conversations", self.conversations),
+            ("solutions", self.solutions),
+        ):
+            try:
+                results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=limit,
+                    where={"user_id": user_id},
+                    include=["documents", "metadatas", "embeddings"]
+                )
+            except Exception as e:
+                logger.warning(f"Erro na busca de memória do turno ({section}): {e}")
+                continue
+            
+            # Distância do ChromaDB é l2 sobre vetores não normalizados:
+            # o score sai do cosseno, como em _find_similar_fact
+            for doc, meta, embedding in zip(
+                results['documents'][0],
+                results['metadatas'][0],
+                results['embeddings'][0]
+            ):
+                similarity = _cosine(query_embedding, embedding)
+                if similarity < min_similarity or doc.strip() == query:
+                    continue  # Irrelevante ou a própria pergunta já salva
+                date = datetime.fromisoformat(meta['timestamp']).strftime("%d/%m/%Y")
+                if section == "conversations":
+                    role = "Usuário" if meta['role'] == "user" else "Você"
+                    text = f"- [{date}] **{role}:** {doc}"
+                else:
+                    topics = [t for t in meta.get('topics', '').split(',') if t]
+                    text = f"- [{date}, solução: {', '.join(topics[:3]) or 'geral'}] {doc}"
+                candidates.append(ContextItem(
+                    section=section,
+                    group=section,
+                    text=text,
+                    timestamp=meta.get('ts') or datetime.fromisoformat(meta['timestamp']).timestamp(),
+                    similarity=similarity,
+                    order=-similarity,
+                ))
+        
+        selected = self.turn_context_packer.select(candidates, header_tokens=0)
+        context = ""
+        if selected:
+            context = "\n".join(
+                ["# MEMÓRIA RELEVANTE PARA ESTA PERGUNTA"]
+                + [item.text for item in selected]
+            )
+        self.context_cache.set(cache_key, context, generation)
+        return context
+    
+    def _query_embedding(self, query: str):
+        """Embedding da pergunta via memo (o insert do turno reaproveita)"""
+        try:
+            return self.embeddings.embed_one(query)
+        except Exception as e:
+            logger.warning(f"Erro ao gerar embedding da pergunta: {e}")
+            return None
+    
     # ==================== EXTRAÇÃO DE INFORMAÇÕES ====================
     
     def _extract_topics(self, text: str) -> Set[str]:
         """
         Extrai tópicos técnicos do texto
-        Lista expandida de termos relevantes
+        Matcher compilado com fronteira de palavra ("go" não casa "google")
         """
-        tech_keywords = {
-            # Linguagens
-            "python", "javascript", "typescript", "java", "c#", "go", "rust",
-            "php", "ruby", "swift", "kotlin", "sql",
-            
-            # Frameworks/Libs Backend
-            "fastapi", "django", "flask", "express", "nestjs", "spring",
-            "rails", ".net", "laravel",
-            
-            # Frontend
-            "react", "vue", "angular", "nextjs", "svelte", "solid",
-            
-            # Banco de dados
-            "postgresql", "mysql", "mongodb", "redis", "sqlite",
-            "dynamodb", "cassandra",
-            
-            # DevOps/Infra
-            "docker", "kubernetes", "aws", "azure", "gcp", "terraform",
-            "ansible", "jenkins", "github actions", "ci/cd",
-            
-            # Conceitos
-            "api", "rest", "graphql", "websocket", "microservices",
-            "monolith", "serverless", "async", "sync", "orm",
-            "cache", "queue", "pub/sub", "event-driven",
-            
-            # Problemas comuns
-            "bug", "erro", "exception", "crash", "timeout", "deadlock",
-            "memory leak", "performance", "latency", "bottleneck",
-            
-            # Atividades
-            "deploy", "deployment", "migration", "refactor", "debug",
-            "test", "testing", "ci", "cd", "monitoring", "logging",
-        }
-        
-        text_lower = text.lower()
-        found = set()
-        
-        for keyword in tech_keywords:
-            if keyword in text_lower:
-                found.add(keyword)
-        
-        return found
+        return set(analyze_text(text).topics)
     
-    def _extract_and_save_facts(
+    def _extract_facts(
         self,
         user_id: str,
         text: str,
         topics: Set[str]
-    ):
+    ) -> List[PendingDocument]:
         """
-        Extrai e salva fatos sobre o usuário
-        Usa patterns para identificar informações relevantes
+        Extrai fatos sobre o usuário (o insert fica para o lote)
+        Um fato por categoria cujos patterns aparecem no texto
         """
-        fact_patterns = {
-            FactCategory.TECH_STACK: [
-                "uso", "trabalho com", "programo em", "desenvolvo em",
-                "meu stack", "tecnologias que uso"
-            ],
-            FactCategory.PROJECT: [
-                "estou fazendo", "trabalhando em", "projeto", "aplicação",
-                "sistema que", "desenvolvendo"
-            ],
-            FactCategory.PREFERENCE: [
-                "prefiro", "gosto de", "não gosto", "melhor usar",
-                "costumo usar", "sempre uso"
-            ],
-            FactCategory.LEARNING: [
-                "estudando", "aprendendo", "curso de", "tutorial",
-                "quero aprender", "vou estudar"
-            ],
-            FactCategory.PROBLEM: [
-                "sempre dá erro", "problema recorrente", "todo vez",
-                "não consigo", "dificuldade com"
-            ],
-        }
+        facts: List[PendingDocument] = []
+        now = datetime.now()
         
-        text_lower = text.lower()
-        
-        for category, patterns in fact_patterns.items():
-            for pattern in patterns:
-                if pattern in text_lower:
-                    # Salva o fato
-                    fact_id = f"{user_id}_{category.value}_{uuid.uuid4()}"
-                    
-                    self.user_facts.add(
-                        documents=[text],
-                        metadatas=[{
-                            "user_id": user_id,
-                            "category": category.value,
-                            "timestamp": datetime.now().isoformat(),
-                            "topics": ",".join(topics) if topics else "",
-                            "confidence": 0.8,  # Pode ser ajustado
-                        }],
-                        ids=[fact_id]
-                    )
-                    
-                    logger.debug(f"Fato extraído: {category.value} - {text[:50]}...")
-                    break  # Evita duplicatas do mesmo texto
+        for category in analyze_text(text).fact_categories:
+            facts.append(PendingDocument(
+                collection="user_facts",
+                id=f"{user_id}_{category}_{uuid.uuid4()}",
+                text=text,
+                metadata={
+                    "user_id": user_id,
+                    "category": category,
+                    "timestamp": now.isoformat(),
+                    "ts": now.timestamp(),
+                    "topics": ",".join(topics) if topics else "",
+                    "confidence": FACT_INITIAL_CONFIDENCE,
+                    "mention_count": 1,
+                    "first_mentioned": now.isoformat(),
+                    "last_mentioned": now.isoformat(),
+                }
+            ))
+            
+            logger.debug(f"Fato extraído: {category} - {text[:50]}...")
+        
+        return facts
     
     def _is_solution(self, text: str) -> bool:
         """Detecta se o texto contém uma solução"""
-        solution_indicators = [
-            "funciona assim", "solução", "correção", "fix",
-            "para resolver", "basta", "você pode",
-            "recomendo", "sugestão", "tente",
-        ]
-        
-        text_lower = text.lower()
-        return any(indicator in text_lower for indicator in solution_indicators)
-    
-    def _save_solution(self, user_id: str, text: str, topics: Set[str]):
-        """Salva solução que funcionou"""
-        solution_id = f"{user_id}_sol_{uuid.uuid4()}"
-        
-        self.solutions.add(
-            documents=[text],
-            metadatas=[{
+        return analyze_text(text).is_solution
+    
+    def _build_solution(
+        self,
+        user_id: str,
+        text: str,
+        topics: Set[str]
+    ) -> PendingDocument:
+        """Monta solução que funcionou (o insert fica para o lote)"""
+        logger.debug(f"Solução detectada: {text[:50]}...")
+        
+        return PendingDocument(
+            collection="solutions",
+            id=f"{user_id}_sol_{uuid.uuid4()}",
+            text=text,
+            metadata={
                 "user_id": user_id,
                 "timestamp": datetime.now().isoformat(),
+                "ts": time.time(),
                 "topics": ",".join(topics) if topics else "",
-            }],
-            ids=[solution_id]
+            }
+        )
+    
+    # ==================== CONSOLIDAÇÃO DE FATOS ====================
+    
+    def _consolidate_facts(
+        self,
+        facts: List[PendingDocument],
+        vector_by_text: Dict[str, List[float]]
+    ) -> List[PendingDocument]:
+        """
+        Deduplica fatos por similaridade de embedding
+        
+        Fato parecido (mesmo usuário e categoria) com um já salvo ou com
+        outro do mesmo lote vira reforço: mention_count++, last_mentioned
+        e confiança sobem. Retorna só os fatos realmente novos.
+        """
+        new_facts: List[PendingDocument] = []
+        accepted: Dict[tuple, List[tuple]] = {}
+        
+        for fact in facts:
+            vector = vector_by_text[fact.text]
+            key = (fact.metadata["user_id"], fact.metadata["category"])
+            
+            # 1. Duplicata dentro do próprio lote
+            duplicate = next(
+                (
+                    doc for doc, doc_vector in accepted.get(key, [])
+                    if _cosine(vector, doc_vector) >= self.fact_similarity_threshold
+                ),
+                None
+            )
+            if duplicate is not None:
+                duplicate.metadata.update(_reinforce_fact(duplicate.metadata, self.fact_half_life_days))
+                continue
+            
+            # 2. Fato já persistido
+            existing = self._find_similar_fact(key[0], key[1], vector)
+            if existing is not None:
+                fact_id, metadata = existing
+                self.user_facts.update(
+                    ids=[fact_id],
+                    metadatas=[{**metadata, **_reinforce_fact(metadata, self.fact_half_life_days)}]
+                )
+                logger.debug(f"Fato reforçado: {fact_id}")
+                continue
+            
+            new_facts.append(fact)
+            accepted.setdefault(key, []).append((fact, vector))
+        
+        return new_facts
+    
+    def _find_similar_fact(
+        self,
+        user_id: str,
+        category: str,
+        vector: List[float]
+    ) -> Optional[tuple]:
+        """Vizinho mais próximo na mesma categoria, se acima do threshold"""
+        try:
+            results = self.user_facts.query(
+                query_embeddings=[vector],
+                n_results=1,
+                where={"$and": [{"user_id": user_id}, {"category": category}]},
+                include=["metadatas", "embeddings"]
+            )
+        except Exception as e:
+            # Coleção vazia ou sem fatos na categoria
+            logger.debug(f"Sem vizinho para fato: {e}")
+            return None
+        
+        if not results['ids'] or not results['ids'][0]:
+            return None
+        
+        candidate = results['embeddings'][0][0]
+        if _cosine(vector, candidate) < self.fact_similarity_threshold:
+            return None
+        return results['ids'][0][0], results['metadatas'][0][0]
+    
+    def _fact_confidence(self, metadata: Dict, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        return _decayed_confidence(metadata, self.fact_half_life_days, now)
+    
+    def get_user_facts(self, user_id: str) -> List[UserFact]:
+        """Fatos do usuário já consolidados, maior valor primeiro"""
+        results = self.fetch_by_metadata(self.user_facts, where={"user_id": user_id})
+        now = time.time()
+        facts = []
+        for fact_id, doc, meta in zip(
+            results['ids'], results['documents'], results['metadatas']
+        ):
+            confidence = self._fact_confidence(meta, now)
+            if confidence >= self.fact_min_confidence:
+                facts.append(_fact_from_record(fact_id, doc, meta, confidence))
+        facts.sort(
+            key=lambda fact: fact.confidence * (1 + math.log(fact.mention_count)),
+            reverse=True
         )
+        return facts
+    
+    def prune_facts(self) -> int:
+        """
+        Remove fatos cuja confiança decaída ficou abaixo de fact_min_confidence
+        
+        O decaimento em si é calculado na leitura (_fact_confidence); aqui só
+        saem os esquecidos, sem regravar metadados. Só o cache de contexto
+        dos usuários afetados é invalidado.
+        """
+        now = time.time()
+        results = self.fetch_by_metadata(self.user_facts, include=["metadatas"])
         
-        logger.debug(f"Solução salva: {text[:50]}...")
+        delete_ids = []
+        touched_users = set()
+        for fact_id, meta in zip(results['ids'], results['metadatas']):
+            if self._fact_confidence(meta, now) < self.fact_min_confidence:
+                delete_ids.append(fact_id)
+                touched_users.add(meta.get("user_id"))
+        
+        if delete_ids:
+            self.user_facts.delete(ids=delete_ids)
+        for user_id in touched_users:
+            self.context_cache.invalidate_user(user_id)
+        
+        logger.info(f"Poda de fatos: {len(delete_ids)} removidos")
+        return len(delete_ids)
+    
+    def _prune_facts_loop(self):
+        """Thread própria: poda no startup e a cada fact_prune_interval"""
+        while True:
+            try:
+                self.prune_facts()
+            except Exception as e:
+                logger.error(f"Erro na poda de fatos: {e}")
+            if self._stop_fact_pruning.wait(self.fact_prune_interval):
+                return
     
     # ==================== PERSISTÊNCIA ====================
     
+    def _serialize_session(self, session: Dict) -> Dict:
+        """Cópia da sessão pronta para JSON (sets viram listas)"""
+        data = session.copy()
+        data['topics'] = sorted(session.get('topics', set()))
+        data['messages'] = session['messages'].to_list()
+        return data
+    
+    def _deserialize_session(self, data: Dict) -> Dict:
+        """Reconstrói set de tópicos e ring buffer a partir do JSON"""
+        data['topics'] = set(data.get('topics', []))
+        data['messages'] = RecentTurns.from_list(
+            data.get('messages', []),
+            self.working_memory_turns
+        )
+        return data
+    
     def _load_active_sessions(self):
-        """Carrega sessões ativas do disco"""
-        if not self.sessions_file.exists():
-            return
+        """
+        Carrega sessões ativas do disco
         
-        try:
-            with open(self.sessions_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+        Lê o snapshot e reaplica o journal por cima. Registros com seq
+        já coberta pelo snapshot são ignorados; linha truncada no fim
+        (crash no meio do append) é descartada.
+        """
+        sessions: Dict[str, Dict] = {}
+        snapshot_seq = 0
+        
+        if self.sessions_file.exists():
+            try:
+                with open(self.sessions_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                
+                # Formato atual: {"seq": N, "sessions": {...}}
+                # (o antigo era o dict de sessões direto)
+                if "sessions" in data and "seq" in data:
+                    snapshot_seq = data["seq"]
+                    data = data["sessions"]
                 
-            # Reconstrói sets (JSON não suporta)
-            for session in data.values():
-                session['topics'] = set(session.get('topics', []))
+                sessions = {
+                    sid: self._deserialize_session(session)
+                    for sid, session in data.items()
+                }
+            except Exception as e:
+                logger.error(f"Erro ao carregar sessões: {e}")
+                sessions = {}
+        
+        last_seq = snapshot_seq
+        replayed = 0
+        if self.journal_file.exists():
+            try:
+                with open(self.journal_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            logger.warning("Registro truncado no journal de sessões, ignorando")
+                            break
+                        
+                        seq = record.get("seq", 0)
+                        if seq <= snapshot_seq:
+                            continue
+                        last_seq = max(last_seq, seq)
+                        replayed += 1
+                        self._replay_record(sessions, record)
+            except Exception as e:
+                logger.error(f"Erro ao reaplicar journal de sessões: {e}")
+        
+        with self._lock:
+            self.active_sessions = sessions
+            self._journal_seq = last_seq
+            # Compacta na carga: journal recomeça vazio
+            self._save_active_sessions()
+        
+        logger.info(
+            f"{len(self.active_sessions)} sessões ativas carregadas "
+            f"({replayed} eventos do journal)"
+        )
+    
+    def _replay_record(self, sessions: Dict[str, Dict], record: Dict):
+        """Aplica um evento do journal no dict de sessões"""
+        op = record.get("op")
+        if op == "create":
+            session = self._deserialize_session(record["session"])
+            sessions[session["id"]] = session
+        elif op == "turn":
+            session = sessions.get(record["sid"])
+            if session is not None:
+                self._apply_turn(session, record["turn"])
+        elif op == "end":
+            sessions.pop(record["sid"], None)
+    
+    def _append_journal(self, record: Dict):
+        """Append O(1) de um evento no journal (chamar com _lock)"""
+        try:
+            if self._journal_handle is None:
+                self._journal_handle = open(self.journal_file, 'a', encoding='utf-8')
             
-            self.active_sessions = data
-            logger.info(f"{len(self.active_sessions)} sessões ativas carregadas")
+            self._journal_seq += 1
+            record["seq"] = self._journal_seq
+            self._journal_handle.write(
+                json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str)
+                + "\n"
+            )
+            self._journal_handle.flush()
+            self._journal_records += 1
         except Exception as e:
-            logger.error(f"Erro ao carregar sessões: {e}")
-            self.active_sessions = {}
+            logger.error(f"Erro ao gravar journal de sessões: {e}")
+    
+    def _maybe_compact_journal(self):
+        """Gera snapshot quando o journal passa do limite (roda no worker)"""
+        if self._journal_records < self.journal_compact_every:
+            return
+        with self._lock:
+            if self._journal_records >= self.journal_compact_every:
+                self._save_active_sessions()
     
     def _save_active_sessions(self):
-        """Salva sessões ativas no disco"""
+        """
+        Compactação: grava snapshot de todas as sessões e zera o journal
+        
+        O(total de mensagens), por isso só roda na carga, no close e
+        a cada journal_compact_every eventos.
+        """
         try:
-            # Converte sets para listas
-            data = {}
-            for sid, session in self.active_sessions.items():
-                session_copy = session.copy()
-                session_copy['topics'] = list(session_copy.get('topics', set()))
-                data[sid] = session_copy
-            
-            with open(self.sessions_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with self._lock:
+                data = {
+                    "seq": self._journal_seq,
+                    "sessions": {
+                        sid: self._serialize_session(session)
+                        for sid, session in self.active_sessions.items()
+                    },
+                }
+                
+                # Escreve em arquivo temporário e troca (atômico)
+                tmp_file = self.sessions_file.with_suffix(".json.tmp")
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(',', ':'), default=str)
+                os.replace(tmp_file, self.sessions_file)
+                
+                # Snapshot cobre tudo até seq; o journal pode recomeçar
+                if self._journal_handle is not None:
+                    self._journal_handle.close()
+                self._journal_handle = open(self.journal_file, 'w', encoding='utf-8')
+                self._journal_records = 0
         except Exception as e:
             logger.error(f"Erro ao salvar sessões: {e}")
     
     # ==================== UTILIDADES ====================
     
+    def fetch_by_metadata(
+        self,
+        collection,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None,
+        page_size: int = 500
+    ) -> Dict[str, List]:
+        """
+        Busca só por metadata com get() paginado (limit/offset)
+        
+        Sem embedding nem busca ANN. A ordem do ChromaDB não é garantida,
+        quem precisa de ordem ordena por timestamp.
+        """
+        include = ["documents", "metadatas"] if include is None else include
+        merged: Dict[str, List] = {"ids": []}
+        for key in include:
+            merged[key] = []
+        
+        offset = 0
+        while True:
+            page = collection.get(
+                where=where,
+                limit=page_size,
+                offset=offset,
+                include=include
+            )
+            ids = page.get('ids') or []
+            merged['ids'].extend(ids)
+            for key in include:
+                # embeddings vem como ndarray: sem `or []` (truthiness ambígua)
+                values = page.get(key)
+                if values is not None:
+                    merged[key].extend(values)
+            
+            if len(ids) < page_size:
+                return merged
+            offset += page_size
+    
+    def count_by_metadata(self, collection, where: Optional[Dict] = None) -> int:
+        """Conta documentos por metadata (só ids, sem documentos)"""
+        return len(self.fetch_by_metadata(collection, where=where, include=[])['ids'])
+    
     def get_user_stats(self, user_id: str) -> Dict:
         """Estatísticas sobre o usuário"""
+        where = {"user_id": user_id}
         try:
-            # Total de conversas
-            conv_results = self.conversations.query(
-                query_texts=[""],
-                n_results=10000,  # Alto para pegar tudo
-                where={"user_id": user_id}
-            )
-            total_messages = len(conv_results['documents'][0])
-            
-            # Fatos
-            facts_results = self.user_facts.query(
-                query_texts=[""],
-                n_results=1000,
-                where={"user_id": user_id}
-            )
-            total_facts = len(facts_results['documents'][0])
-            
-            # Soluções
-            sol_results = self.solutions.query(
-                query_texts=[""],
-                n_results=1000,
-                where={"user_id": user_id}
-            )
-            total_solutions = len(sol_results['documents'][0])
-            
             return {
-                "total_messages": total_messages,
-                "total_facts": total_facts,
-                "total_solutions": total_solutions,
+                "total_messages": self.count_by_metadata(self.conversations, where),
+                "total_facts": self.count_by_metadata(self.user_facts, where),
+                "total_solutions": self.count_by_metadata(self.solutions, where),
             }
         except Exception as e:
             logger.error(f"Erro ao obter stats: {e}")
@@ -670,19 +1626,53 @@ class MemorySystem:
         Útil para testes ou reset
         """
         logger.warning(f"Limpando todos os dados do usuário {user_id}")
+        self.context_cache.invalidate_user(user_id)
         
-        # Remove das coleções
+        # Remove das coleções (delete direto por metadata)
         for collection in [self.conversations, self.user_facts, self.solutions]:
             try:
-                # ChromaDB não tem delete direto por metadata
-                # Precisamos buscar IDs primeiro
-                results = collection.query(
-                    query_texts=[""],
-                    n_results=10000,
-                    where={"user_id": user_id}
-                )
-                
-                if results['ids'][0]:
-                    collection.delete(ids=results['ids'][0])
+                collection.delete(where={"user_id": user_id})
             except Exception as e:
                 logger.error(f"Erro ao limpar coleção: {e}")
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        return default
+
+
+_memory_system: Optional[MemorySystem] = None
+_memory_system_lock = threading.Lock()
+
+
+def get_memory_system() -> MemorySystem:
+    """
+    Factory para sistema de memória (singleton por processo)
+    
+    Todas as sessões do worker compartilham o mesmo modelo de embeddings,
+    client do ChromaDB e worker de escrita.
+    """
+    global _memory_system
+    if _memory_system is None:
+        with _memory_system_lock:
+            if _memory_system is None:
+                _memory_system = MemorySystem(
+                    storage_dir=os.getenv("PULSE_MEMORY_DIR", "KMS/memory"),
+                    write_queue_size=_env_int("PULSE_MEMORY_WRITE_QUEUE_SIZE", 256),
+                    write_batch_size=_env_int("PULSE_MEMORY_WRITE_BATCH_SIZE", 32),
+                    write_max_delay=_env_int("PULSE_MEMORY_WRITE_MAX_DELAY_MS", 50) / 1000,
+                    journal_compact_every=_env_int("PULSE_MEMORY_JOURNAL_COMPACT_EVERY", 500),
+                    context_cache_size=_env_int("PULSE_MEMORY_CONTEXT_CACHE_SIZE", 256),
+                    context_cache_ttl=_env_int("PULSE_MEMORY_CONTEXT_CACHE_TTL_SECONDS", 300),
+                    fact_half_life_days=_env_int("PULSE_MEMORY_FACT_HALF_LIFE_DAYS", 30),
+                    working_memory_turns=_env_int("PULSE_MEMORY_WORKING_TURNS", 20),
+                    context_token_budget=_env_int("PULSE_MEMORY_CONTEXT_TOKEN_BUDGET", 1200),
+                    context_max_item_tokens=_env_int("PULSE_MEMORY_CONTEXT_MAX_ITEM_TOKENS", 120),
+                    turn_context_token_budget=_env_int("PULSE_MEMORY_TURN_CONTEXT_TOKEN_BUDGET", 300)
+                )
+    return _memory_system
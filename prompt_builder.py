@@ -0,0 +1,163 @@
+"""
+Montagem dos prompts de reasoning com segmentos precompilados.
+
+O prefixo estatico (AGENT_INSTRUCTION) e os rodapes de cada modo sao
+montados uma vez; por requisicao so entram guardrail temporal (cacheado
+por minuto), contexto de memoria, memoria do turno, contexto externo e
+a pergunta.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+import hashlib
+from typing import Optional, Tuple
+
+from prompts import AGENT_INSTRUCTION
+from temporal_context import build_temporal_guardrail
+
+REALTIME_FORMAT_RULES = (
+    "FORMATO OBRIGATORIO PARA RESPOSTA TEMPORAL:\n"
+    "- Status: verificado ou nao verificado\n"
+    "- Data da verificacao: YYYY-MM-DD HH:MM:SS +TZ\n"
+    "- Fontes: lista numerada com titulo, data e link\n"
+)
+
+FAST_REALTIME_NOTE = "Se houver conflito com memoria antiga, priorize o contexto atualizado.\n"
+DEEP_REALTIME_NOTE = "Use o contexto atualizado para fatos temporais e deixe isso claro na resposta.\n"
+
+FAST_TAIL = """
+
+---
+
+Responda de forma DIRETA, NATURAL e CASUAL. Sem formalidades.
+
+Usuario: """
+
+DEEP_TAIL = """
+
+---
+
+# RACIOCINIO PROFUNDO
+
+Problema tecnico complexo detectado. Pense estruturadamente:
+
+<thinking>
+1. ENTENDIMENTO: Qual e o problema exato?
+2. ANALISE: Causas possiveis
+3. SOLUCAO: Melhor abordagem
+4. VALIDACAO: Como testar
+</thinking>
+
+<answer>
+[Resposta clara e acionavel]
+
+**Proximos passos:**
+1. [Acao especifica]
+2. [Como validar]
+</answer>
+
+Usuario: """
+
+
+@dataclass(frozen=True)
+class PromptParts:
+    """
+    Prompt em pedacos.
+
+    text: prompt completo (instrucao, guardrail, memoria, pergunta).
+    cacheable_prefix/request: mesma informacao separada entre o que e
+    estavel na sessao (instrucao + memoria, vai para o context cache do
+    Gemini) e o que muda a cada requisicao.
+    """
+    static_prefix: str
+    guardrail: str
+    context: str
+    suffix: str
+
+    @property
+    def text(self) -> str:
+        return "".join((
+            self.static_prefix, "\n", self.guardrail, "\n\n", self.context, "\n", self.suffix,
+        )).strip()
+
+    @property
+    def cacheable_prefix(self) -> str:
+        return "\n\n".join((self.static_prefix, self.context)).strip()
+
+    @property
+    def request(self) -> str:
+        return "\n".join((self.guardrail, self.suffix)).strip()
+
+
+class PromptBuilder:
+    """Monta prompts fast/deep reaproveitando os segmentos estaticos."""
+
+    def __init__(self, instruction: str = AGENT_INSTRUCTION):
+        self.static_prefix = instruction.strip()
+        # Muda quando AGENT_INSTRUCTION muda (chave do context cache)
+        self.instruction_version = hashlib.sha1(
+            self.static_prefix.encode("utf-8")
+        ).hexdigest()[:12]
+        self._realtime_suffix = {
+            False: "\n" + FAST_REALTIME_NOTE + REALTIME_FORMAT_RULES,
+            True: "\n" + DEEP_REALTIME_NOTE + REALTIME_FORMAT_RULES,
+        }
+        self._tail = {False: FAST_TAIL, True: DEEP_TAIL}
+        self._guardrail: Optional[Tuple[datetime, str]] = None
+
+    def guardrail(self, now: Optional[datetime] = None) -> str:
+        """Guardrail temporal, recalculado no maximo uma vez por minuto."""
+        current = now or datetime.now().astimezone()
+        minute = current.replace(second=0, microsecond=0)
+        cached = self._guardrail
+        if cached is None or cached[0] != minute:
+            cached = (minute, build_temporal_guardrail(minute))
+            self._guardrail = cached
+        return cached[1]
+
+    def build_parts(
+        self,
+        user_input: str,
+        context: str,
+        realtime_text: str = "",
+        *,
+        deep: bool = False,
+        turn_context: str = "",
+    ) -> PromptParts:
+        # Memoria do turno fica no sufixo: muda a cada pergunta e nao pode
+        # invalidar o prefixo cacheado
+        turn_block = "\n\n---\n" + turn_context if turn_context else ""
+        realtime_block = ""
+        if realtime_text:
+            realtime_block = "\n\n---\n" + realtime_text + self._realtime_suffix[deep]
+
+        return PromptParts(
+            static_prefix=self.static_prefix,
+            guardrail=self.guardrail(),
+            context=context,
+            suffix=turn_block + realtime_block + self._tail[deep] + user_input,
+        )
+
+    def build(
+        self,
+        user_input: str,
+        context: str,
+        realtime_text: str = "",
+        *,
+        deep: bool = False,
+        turn_context: str = "",
+    ) -> str:
+        return self.build_parts(
+            user_input, context, realtime_text, deep=deep, turn_context=turn_context,
+        ).text
+
+
+_prompt_builder: Optional[PromptBuilder] = None
+
+
+def get_prompt_builder() -> PromptBuilder:
+    """Factory do PromptBuilder (singleton)."""
+    global _prompt_builder
+    if _prompt_builder is None:
+        _prompt_builder = PromptBuilder()
+    return _prompt_builder
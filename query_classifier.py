@@ -0,0 +1,143 @@
+"""
+Classificacao da pergunta em uma passada so.
+
+Sensibilidade temporal (decide a busca em tempo real) e score de
+complexidade (decide fast/hybrid/deep) saem da mesma regex compilada.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+import re
+from typing import Dict, FrozenSet, Tuple
+import unicodedata
+
+from text_signals import _trie_pattern
+
+# Todo padrao comeca e termina com \b (fatorado na regex combinada)
+TIME_SENSITIVE_PATTERNS = (
+    r"\bhoje\b",
+    r"\bagora\b",
+    r"\batual\b",
+    r"\batualizado\b",
+    r"\brecente\b",
+    r"\bultim[oa]s?\b",
+    r"\bessa semana\b",
+    r"\beste mes\b",
+    r"\bultimos?\s+\d+\s+(?:dias|semanas|meses)\b",
+    r"\blatest\b",
+    r"\bnews?\b",
+    r"\brelease\b",
+    r"\blancamento\b",
+    r"\bchangelog\b",
+    r"\bbreaking changes?\b",
+    r"\bpreco\b",
+    r"\bcotacao\b",
+    r"\bversao\b",
+    r"\bpresidente\b",
+    r"\bceo\b",
+    r"\blei\b",
+    r"\bdecreto\b",
+    r"\bregulacao\b",
+    r"\broadmap\b",
+    r"\b202[5-9]\b",
+    r"\b20[3-9][0-9]\b",
+)
+
+# Casam como substring (sem fronteira de palavra), como sempre foi:
+# "debugar" conta "debug" e "debugar"
+COMPLEXITY_KEYWORDS = (
+    "debug", "debugar",
+    "erro critico", "exception", "traceback",
+    "crash", "nao funciona de jeito nenhum",
+    "comparar tecnologias", "qual biblioteca usar",
+    "arquitetura do sistema", "design pattern",
+    "otimizacao de performance", "bottleneck",
+    "refatoracao complexa", "algoritmo eficiente",
+)
+
+KEYWORD_WEIGHT = 3
+CODE_BLOCK_WEIGHT = 4
+LONG_INPUT_WEIGHT = 3
+LONG_INPUT_WORDS = 60
+MULTIPLE_QUESTIONS_WEIGHT = 3
+MULTIPLE_QUESTIONS_MIN = 3
+
+
+def normalize_query(value: str) -> str:
+    """Minusculas e sem acentos (NFKD sem marcas combinantes)."""
+    if value.isascii():
+        return value.lower()  # Caso comum: NFKD custaria ~20x mais
+    normalized = unicodedata.normalize("NFKD", value)
+    ascii_only = "".join(ch for ch in normalized if not unicodedata.combining(ch))
+    return ascii_only.lower()
+
+
+@dataclass(frozen=True)
+class QueryFeatures:
+    """Vetor de features de uma pergunta."""
+    time_sensitive: bool
+    time_signals: Tuple[str, ...]
+    complexity_keywords: FrozenSet[str]
+    has_code_block: bool
+    word_count: int
+    question_count: int
+    complexity_score: int
+
+
+def _contained_keywords() -> Dict[str, FrozenSet[str]]:
+    # Keyword longa carrega as curtas contidas nela, ja que a regex
+    # consome o trecho e nao casaria "debug" dentro de "debugar"
+    return {
+        keyword: frozenset(other for other in COMPLEXITY_KEYWORDS if other in keyword)
+        for keyword in COMPLEXITY_KEYWORDS
+    }
+
+
+_CONTAINED = _contained_keywords()
+
+_QUERY_RE = re.compile(
+    # \b em volta do grupo inteiro, nao de cada alternativa
+    r"(?P<time>\b(?:"
+    + "|".join(pattern[2:-2] for pattern in TIME_SENSITIVE_PATTERNS)
+    + r")\b)"
+    + "|(?P<complex>" + _trie_pattern(COMPLEXITY_KEYWORDS) + ")"
+)
+
+
+@lru_cache(maxsize=1024)
+def classify_query(user_input: str) -> QueryFeatures:
+    """
+    Features da pergunta, memoizadas por texto.
+
+    O mesmo turno e classificado no agent (_select_mode) e de novo no
+    process; a segunda vez sai do cache.
+    """
+    time_signals = []
+    keywords = set()
+    for match in _QUERY_RE.finditer(normalize_query(user_input)):
+        if match.lastgroup == "time":
+            time_signals.append(match.group())
+        else:
+            keywords |= _CONTAINED[match.group()]
+
+    has_code_block = "```" in user_input
+    word_count = len(user_input.split())
+    question_count = user_input.count("?")
+
+    score = KEYWORD_WEIGHT * len(keywords)
+    if has_code_block:
+        score += CODE_BLOCK_WEIGHT
+    if word_count > LONG_INPUT_WORDS:
+        score += LONG_INPUT_WEIGHT
+    if question_count >= MULTIPLE_QUESTIONS_MIN:
+        score += MULTIPLE_QUESTIONS_WEIGHT
+
+    return QueryFeatures(
+        time_sensitive=bool(time_signals),
+        time_signals=tuple(time_signals),
+        complexity_keywords=frozenset(keywords),
+        has_code_block=has_code_block,
+        word_count=word_count,
+        question_count=question_count,
+        complexity_score=score,
+    )
@@ -1,22 +1,18 @@
 """Sistema de raciocinio profundo para PULSE - OTIMIZADO."""
 
 import asyncio
+import copy
 from datetime import datetime
 import os
 import logging
 import json
 import sys
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 import hashlib
-import re
+import threading
 import time
-import unicodedata
-from urllib.error import URLError
-from urllib.parse import quote_plus
-from urllib.request import Request, urlopen
-import xml.etree.ElementTree as ET
 
 if sys.version_info >= (3, 14):
     raise RuntimeError(
@@ -24,9 +20,24 @@ if sys.version_info >= (3, 14):
         "Use Python 3.11, 3.12 ou 3.13."
     )
 
-from google import genai
+import httpx
+import numpy as np
 from google.genai import types
 
+from cache_utils import LRUCache
+from gemini_cache import ContextCacheManager, is_cache_error
+from gemini_client import gemini_slot, get_gemini_client
+from prompt_builder import PromptParts, get_prompt_builder
+from query_classifier import classify_query
+from search_backends import (
+    DuckDuckGoBackend,
+    GoogleNewsRSSBackend,
+    SearchBackend,
+    SearchCache,
+    create_http_client,
+    hedged_search,
+)
+
 logger = logging.getLogger("pulse_agent.reasoning")
 
 
@@ -48,6 +59,59 @@ class ReasoningResult:
     execution_time_ms: int = 0
 
 
+@dataclass(frozen=True, slots=True)
+class CachedReasoning:
+    """
+    Resposta congelada guardada nos caches.
+
+    Compartilhada por todas as sessoes do worker sem lock: nunca e mutada.
+    Cada hit gera um ReasoningResult novo com o tempo da propria requisicao.
+    """
+    mode: ReasoningMode
+    text: str
+    thinking: Optional[str] = None
+    tools_used: Optional[Tuple[Dict, ...]] = None
+    confidence: float = 1.0
+
+    @classmethod
+    def from_result(cls, result: ReasoningResult) -> "CachedReasoning":
+        return cls(
+            mode=result.mode,
+            text=result.text,
+            thinking=result.thinking,
+            tools_used=copy.deepcopy(tuple(result.tools_used)) if result.tools_used else None,
+            confidence=result.confidence,
+        )
+
+    def to_result(self, execution_time_ms: int = 0) -> ReasoningResult:
+        return ReasoningResult(
+            mode=self.mode,
+            text=self.text,
+            thinking=self.thinking,
+            tools_used=copy.deepcopy(list(self.tools_used)) if self.tools_used else None,
+            confidence=self.confidence,
+            execution_time_ms=execution_time_ms,
+        )
+
+
+DEEP_MIN_SCORE = 8
+
+FollowupCallback = Callable[[ReasoningResult], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class ReasoningChunk:
+    """
+    Pedaco emitido por process_stream.
+
+    kind: "text", "thought", "code", "code_result" ou "done".
+    O chunk "done" e sempre o ultimo e carrega o ReasoningResult completo.
+    """
+    kind: str
+    text: str = ""
+    result: Optional[ReasoningResult] = None
+
+
 @dataclass
 class RealtimeContext:
     """Contexto de busca atualizado para perguntas sensiveis a data."""
@@ -55,39 +119,26 @@ class RealtimeContext:
     sources: List[Dict[str, str]] = field(default_factory=list)
 
 
+def _env_bool(name: str, *, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_float(name: str, *, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
 class RealtimeSearchService:
     """Busca leve em fontes publicas para reduzir respostas desatualizadas."""
 
-    TIME_SENSITIVE_PATTERNS = [
-        r"\bhoje\b",
-        r"\bagora\b",
-        r"\batual\b",
-        r"\batualizado\b",
-        r"\brecente\b",
-        r"\bultim[oa]s?\b",
-        r"\bessa semana\b",
-        r"\beste mes\b",
-        r"\bultimos?\s+\d+\s+(dias|semanas|meses)\b",
-        r"\blatest\b",
-        r"\bnews?\b",
-        r"\brelease\b",
-        r"\blancamento\b",
-        r"\bchangelog\b",
-        r"\bbreaking changes?\b",
-        r"\bpreco\b",
-        r"\bcotacao\b",
-        r"\bversao\b",
-        r"\bpresidente\b",
-        r"\bceo\b",
-        r"\blei\b",
-        r"\bdecreto\b",
-        r"\bregulacao\b",
-        r"\broadmap\b",
-        r"\b202[5-9]\b",
-        r"\b20[3-9][0-9]\b",
-    ]
-    YEAR_PATTERN = re.compile(r"\b(20\d{2})\b")
-
     def __init__(self):
         enabled_raw = os.getenv("PULSE_REALTIME_SEARCH_ENABLED", "true").strip().lower()
         self.enabled = enabled_raw in {"1", "true", "yes", "on"}
@@ -98,8 +149,33 @@ class RealtimeSearchService:
             min_value=60,
             max_value=3600,
         )
-        self._cache: Dict[str, tuple[float, RealtimeContext]] = {}
-        self._headers = {"User-Agent": "PULSE-Agent/1.0 (realtime-search)"}
+        self.hedge_delay = self._parse_int(
+            "PULSE_REALTIME_SEARCH_HEDGE_DELAY_MS",
+            default=0,
+            min_value=0,
+            max_value=5000,
+        ) / 1000
+        self._cache = SearchCache(
+            max_entries=self._parse_int(
+                "PULSE_REALTIME_SEARCH_CACHE_SIZE",
+                default=256,
+                min_value=16,
+                max_value=10000,
+            ),
+            ttl_seconds=self.cache_ttl_seconds,
+            negative_ttl_seconds=self._parse_int(
+                "PULSE_REALTIME_SEARCH_NEGATIVE_TTL_SECONDS",
+                default=60,
+                min_value=0,
+                max_value=3600,
+            ),
+            db_path=os.getenv("PULSE_REALTIME_SEARCH_CACHE_DB") or None,
+        )
+        # Ordem = prioridade no hedge (RSS de noticias primeiro)
+        self.backends: List[SearchBackend] = [GoogleNewsRSSBackend(), DuckDuckGoBackend()]
+        # Pool HTTP do processo inteiro (todas as sessoes); fecha so no exit
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._http_client_loop: Optional[asyncio.AbstractEventLoop] = None
 
     @staticmethod
     def _parse_int(name: str, *, default: int, min_value: int, max_value: int) -> int:
@@ -112,44 +188,61 @@ class RealtimeSearchService:
             return default
         return max(min_value, min(max_value, value))
 
-    @staticmethod
-    def _normalize_for_match(value: str) -> str:
-        normalized = unicodedata.normalize("NFKD", value)
-        ascii_only = "".join(ch for ch in normalized if not unicodedata.combining(ch))
-        return ascii_only.lower()
-
     def should_search(self, user_input: str) -> bool:
         if not self.enabled:
             return False
-        text = self._normalize_for_match(user_input)
-
-        if any(re.search(pattern, text) for pattern in self.TIME_SENSITIVE_PATTERNS):
-            return True
-
-        for year in self.YEAR_PATTERN.findall(text):
-            if int(year) >= 2025:
-                return True
-
-        return False
+        return classify_query(user_input).time_sensitive
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = create_http_client()
+            self._http_client_loop = asyncio.get_running_loop()
+        return self._http_client
+
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+            self._http_client_loop = None
+
+    def close(self):
+        """
+        Fecha o pool no fim do processo (atexit), no loop que o criou.
+
+        Loop ainda rodando ou ja fechado: so solta a referencia, o
+        processo esta saindo e o SO libera os sockets.
+        """
+        client, loop = self._http_client, self._http_client_loop
+        self._http_client = None
+        self._http_client_loop = None
+        if client is None or client.is_closed:
+            return
+        if loop is None or loop.is_closed() or loop.is_running():
+            return
+        try:
+            loop.run_until_complete(client.aclose())
+        except Exception as exc:
+            logger.debug("Falha ao fechar cliente HTTP da busca: %s", exc)
 
-    def get_context(self, user_input: str) -> RealtimeContext:
+    async def get_context(self, user_input: str) -> RealtimeContext:
         if not self.should_search(user_input):
             return RealtimeContext()
 
-        key = user_input.strip().lower()
-        now = time.time()
-        cached = self._cache.get(key)
-        if cached and cached[0] > now:
-            return cached[1]
-
-        snippets = self._search_news_rss(user_input)
-        if not snippets:
-            snippets = self._search_duckduckgo(user_input)
+        # Miss na memoria le o SQLite: fora do event loop
+        cached = await asyncio.to_thread(self._cache.get, user_input)
+        if cached is not None:
+            return RealtimeContext(
+                text=cached["text"],
+                sources=[dict(source) for source in cached["sources"]],
+            )
 
-        if not snippets:
-            context = RealtimeContext()
-            self._cache[key] = (now + self.cache_ttl_seconds, context)
-            return context
+        snippets = await hedged_search(
+            self.backends,
+            self._get_http_client(),
+            user_input,
+            self.max_results,
+            hedge_delay=self.hedge_delay,
+        )
 
         lines = []
         sources: List[Dict[str, str]] = []
@@ -173,9 +266,11 @@ class RealtimeSearchService:
             )
 
         if not lines:
-            context = RealtimeContext()
-            self._cache[key] = (now + self.cache_ttl_seconds, context)
-            return context
+            # Resultado negativo: TTL curto para tentar de novo logo
+            await asyncio.to_thread(
+                self._cache.set, user_input, {"text": "", "sources": []}, negative=True,
+            )
+            return RealtimeContext()
 
         built = RealtimeContext(
             text=(
@@ -185,125 +280,221 @@ class RealtimeSearchService:
             ),
             sources=sources,
         )
-        self._cache[key] = (now + self.cache_ttl_seconds, built)
+        await asyncio.to_thread(
+            self._cache.set, user_input, {"text": built.text, "sources": built.sources},
+        )
         return built
 
-    def _search_news_rss(self, query: str) -> List[Dict[str, str]]:
-        url = f"https://news.google.com/rss/search?q={quote_plus(query)}"
-        req = Request(url, headers=self._headers)
-        try:
-            with urlopen(req, timeout=5) as resp:
-                content = resp.read()
-        except (TimeoutError, URLError, OSError):
-            return []
 
-        try:
-            root = ET.fromstring(content)
-        except ET.ParseError:
-            return []
-
-        items = []
-        for item in root.findall(".//item"):
-            title = (item.findtext("title") or "").strip()
-            link = (item.findtext("link") or "").strip()
-            pub_date = (item.findtext("pubDate") or "").strip()
-            if not title or not link:
-                continue
-            items.append(
-                {
-                    "title": title,
-                    "url": link,
-                    "published_at": pub_date,
-                }
-            )
-            if len(items) >= self.max_results:
-                break
-        return items
+def context_fingerprint(context: str) -> str:
+    """Identifica o contexto de memoria usado na resposta."""
+    return hashlib.md5((context or "").encode("utf-8")).hexdigest()[:12]
 
-    def _search_duckduckgo(self, query: str) -> List[Dict[str, str]]:
-        url = f"https://api.duckduckgo.com/?q={quote_plus(query)}&format=json&no_redirect=1&no_html=1"
-        req = Request(url, headers=self._headers)
-        try:
-            with urlopen(req, timeout=5) as resp:
-                data = json.loads(resp.read().decode("utf-8", errors="ignore"))
-        except (TimeoutError, URLError, OSError, json.JSONDecodeError):
-            return []
 
-        items: List[Dict[str, str]] = []
+class ResponseCache:
+    """
+    Cache LRU de respostas por pergunta exata (com TTL e limite de bytes).
 
-        abstract_text = str(data.get("AbstractText", "")).strip()
-        abstract_url = str(data.get("AbstractURL", "")).strip()
-        if abstract_text and abstract_url:
-            items.append(
-                {
-                    "title": abstract_text[:160],
-                    "url": abstract_url,
-                    "published_at": "",
-                }
-            )
+    A chave inclui o fingerprint do contexto de memoria: a mesma pergunta
+    com o contexto de outro usuario nao reaproveita a resposta.
+    """
 
-        related_topics = data.get("RelatedTopics", []) or []
-        for topic in related_topics:
-            if "Topics" in topic:
-                nested_topics = topic.get("Topics", []) or []
-            else:
-                nested_topics = [topic]
-            for entry in nested_topics:
-                text = str(entry.get("Text", "")).strip()
-                first_url = str(entry.get("FirstURL", "")).strip()
-                if not text or not first_url:
-                    continue
-                items.append(
-                    {
-                        "title": text[:160],
-                        "url": first_url,
-                        "published_at": "",
-                    }
-                )
-                if len(items) >= self.max_results:
-                    return items
-        return items
+    def __init__(
+        self,
+        max_size: int = 50,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.cache = LRUCache(
+            max_entries=max_size,
+            ttl_seconds=ttl_seconds,
+            max_bytes=max_bytes,
+        )
+        self.max_size = max_size
 
+    def _hash_key(self, text: str, context: str) -> Tuple[str, str]:
+        """Gera hash da pergunta + fingerprint do contexto."""
+        question = hashlib.md5(text.lower().strip().encode()).hexdigest()[:12]
+        return question, context_fingerprint(context)
 
-class ResponseCache:
-    """Cache simples para respostas similares."""
-    
-    def __init__(self, max_size: int = 50):
-        self.cache = {}
-        self.max_size = max_size
-    
-    def _hash_key(self, text: str) -> str:
-        """Gera hash da pergunta."""
-        return hashlib.md5(text.lower().strip().encode()).hexdigest()[:12]
-    
-    def get(self, user_input: str) -> Optional[ReasoningResult]:
-        """Busca resposta similar no cache."""
-        key = self._hash_key(user_input)
+    def get(self, user_input: str, context: str) -> Optional[CachedReasoning]:
+        """Busca a resposta da mesma pergunta com o mesmo contexto."""
+        key = self._hash_key(user_input, context)
         return self.cache.get(key)
-    
-    def set(self, user_input: str, result: ReasoningResult):
+
+    def set(self, user_input: str, context: str, result: CachedReasoning):
         """Salva resposta no cache."""
-        if len(self.cache) >= self.max_size:
-            # Remove entrada mais antiga
-            oldest = next(iter(self.cache))
-            del self.cache[oldest]
-        
-        key = self._hash_key(user_input)
-        self.cache[key] = result
+        key = self._hash_key(user_input, context)
+        self.cache.set(key, result)
         logger.debug(f"Cache: salvou resposta para {key}")
 
+    def stats(self) -> Dict:
+        return self.cache.stats()
+
+
+class SemanticResponseCache:
+    """
+    Cache semantico: perguntas parecidas reaproveitam a resposta.
+
+    Cada entrada guarda o embedding normalizado da pergunta e o fingerprint
+    do contexto de memoria. Hit = mesmo fingerprint e cosseno >= threshold.
+    Os vetores ficam numa matriz numpy circular, entao a busca e um unico
+    produto matriz-vetor (barato para centenas de entradas). Cada slot
+    expira em ttl_seconds, como no cache exato; stats() segue o LRUCache.
+    """
+
+    def __init__(
+        self,
+        embed_fn=None,
+        *,
+        threshold: float = 0.92,
+        max_size: int = 200,
+        ttl_seconds: Optional[float] = None,
+    ):
+        self._embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._vectors: Optional[np.ndarray] = None
+        self._fingerprints: List[Optional[str]] = [None] * self.max_size
+        self._results: List[Optional[CachedReasoning]] = [None] * self.max_size
+        self._expires_at: List[float] = [0.0] * self.max_size
+        self._next_slot = 0
+        self._lock = threading.Lock()
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def fingerprint(context: str) -> str:
+        return context_fingerprint(context)
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+        try:
+            if self._embed_fn is None:
+                from embeddings import get_embedding_memo
+
+                # Mesmo memo da memoria: a pergunta do turno e embeddada uma vez
+                self._embed_fn = get_embedding_memo().embed
+            vector = np.asarray(self._embed_fn([text.strip()])[0], dtype=np.float32)
+        except Exception as exc:
+            logger.warning("Cache semantico desativado (embedding indisponivel): %s", exc)
+            self.enabled = False
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def get(self, user_input: str, context: str) -> Optional[CachedReasoning]:
+        """Busca resposta de pergunta parecida com contexto compativel."""
+        if self._vectors is None:
+            self.misses += 1
+            return None
+        vector = self._embed(user_input)
+        if vector is None:
+            return None
+
+        fingerprint = self.fingerprint(context)
+        now = time.monotonic()
+        with self._lock:
+            scores = self._vectors @ vector
+            for index in np.argsort(scores)[::-1]:
+                if scores[index] < self.threshold:
+                    break
+                if self._results[index] is None:
+                    continue
+                if self._expires_at[index] <= now:
+                    self._clear_slot(index)
+                    self.expirations += 1
+                    continue
+                if self._fingerprints[index] == fingerprint:
+                    logger.debug("Cache semantico: hit com similaridade %.3f", scores[index])
+                    self.hits += 1
+                    return self._results[index]
+            self.misses += 1
+        return None
+
+    def set(self, user_input: str, context: str, result: CachedReasoning):
+        """Salva resposta indexada pelo embedding da pergunta."""
+        vector = self._embed(user_input)
+        if vector is None:
+            return
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+            # Slot circular: sobrescreve a entrada mais antiga
+            now = time.monotonic()
+            slot = self._next_slot
+            if self._results[slot] is not None and self._expires_at[slot] > now:
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._fingerprints[slot] = self.fingerprint(context)
+            self._results[slot] = result
+            self._expires_at[slot] = (
+                now + self.ttl_seconds if self.ttl_seconds is not None else float("inf")
+            )
+            self._next_slot = (slot + 1) % self.max_size
+
+    def _clear_slot(self, index: int):
+        self._vectors[index] = 0.0
+        self._fingerprints[index] = None
+        self._results[index] = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(
+                    1
+                    for result, expires_at in zip(self._results, self._expires_at)
+                    if result is not None and expires_at > now
+                ),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
 
 class GeminiReasoningSystem:
     """Raciocinio adaptativo usando o SDK google-genai - OTIMIZADO."""
 
     def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise RuntimeError("GOOGLE_API_KEY nao encontrada")
-
-        self.client = genai.Client(api_key=api_key)
-        self.cache = ResponseCache(max_size=50)
+        self.client = get_gemini_client()
+        self.prompt_builder = get_prompt_builder()
+        response_ttl = _env_float("PULSE_RESPONSE_CACHE_TTL_SECONDS", default=3600)
+        self.cache = ResponseCache(
+            max_size=50,
+            ttl_seconds=response_ttl,
+            max_bytes=int(_env_float("PULSE_RESPONSE_CACHE_MAX_BYTES", default=2_000_000)),
+        )
+        self.semantic_cache: Optional[SemanticResponseCache] = None
+        if _env_bool("PULSE_SEMANTIC_CACHE_ENABLED", default=True):
+            self.semantic_cache = SemanticResponseCache(
+                threshold=_env_float("PULSE_SEMANTIC_CACHE_THRESHOLD", default=0.92),
+                max_size=int(_env_float("PULSE_SEMANTIC_CACHE_MAX_ENTRIES", default=200)),
+                ttl_seconds=response_ttl,
+            )
         self.realtime_search = RealtimeSearchService()
+        self.hybrid_min_score: Optional[int] = None
+        if _env_bool("PULSE_HYBRID_ENABLED", default=True):
+            self.hybrid_min_score = int(_env_float("PULSE_HYBRID_MIN_SCORE", default=6))
+        self._followups: Dict[str, asyncio.Task] = {}
+        # Instrucao + memoria ficam no context cache do Gemini; cada chamada
+        # manda so guardrail, contexto externo e pergunta
+        self.context_cache: Optional[ContextCacheManager] = None
+        if _env_bool("PULSE_CONTEXT_CACHE_ENABLED", default=True):
+            self.context_cache = ContextCacheManager(
+                self.client,
+                ttl_seconds=int(_env_float("PULSE_CONTEXT_CACHE_TTL_SECONDS", default=3600)),
+                min_tokens=int(_env_float("PULSE_CONTEXT_CACHE_MIN_TOKENS", default=1024)),
+            )
 
         # OTIMIZAÃƒâ€¡ÃƒÆ’O: Usar mesmo modelo para ambos (mais rÃƒÂ¡pido)
         self.fast_model = "gemini-2.0-flash-exp"
@@ -336,8 +527,19 @@ class GeminiReasoningSystem:
         user_input: str,
         context: str,
         force_mode: Optional[ReasoningMode] = None,
+        *,
+        session_key: Optional[str] = None,
+        on_followup: Optional[FollowupCallback] = None,
+        turn_context: str = "",
     ) -> ReasoningResult:
-        """Processa input com modo rapido ou profundo."""
+        """
+        Processa input com modo rapido, profundo ou hibrido.
+
+        No HYBRID a resposta rapida volta na hora e o resultado profundo
+        chega depois via on_followup (cancelavel por session_key).
+        turn_context e a memoria recuperada para esta pergunta; entra na
+        parte dinamica do prompt (context tem que ser estavel na sessao).
+        """
         import time
 
         start_time = time.time()
@@ -345,23 +547,21 @@ class GeminiReasoningSystem:
 
         # OTIMIZAÃƒâ€¡ÃƒÆ’O: Verifica cache primeiro
         if not force_mode and not time_sensitive:
-            cached = self.cache.get(user_input)
+            cached = await self._lookup_cache(user_input, context, turn_context, start_time)
             if cached:
-                logger.info("Cache HIT! Retornando resposta cacheada")
-                cached.execution_time_ms = 5  # InstantÃƒÂ¢neo
                 return cached
 
         complexity_score = self._compute_complexity_score(user_input)
         mode = force_mode if force_mode else self._select_mode(user_input)
+        if mode == ReasoningMode.HYBRID and time_sensitive:
+            # Resposta temporal depende das fontes, nao de raciocinio longo
+            mode = ReasoningMode.VOICE_FAST
         logger.info("Processando com modo: %s", mode.value)
 
         realtime_context = RealtimeContext()
         if time_sensitive:
             try:
-                realtime_context = await asyncio.to_thread(
-                    self.realtime_search.get_context,
-                    user_input,
-                )
+                realtime_context = await self.realtime_search.get_context(user_input)
                 if realtime_context.text:
                     logger.info(
                         "Contexto atualizado obtido (%s fontes).",
@@ -377,21 +577,29 @@ class GeminiReasoningSystem:
             logger.info(
                 "Sem contexto externo recente para consulta temporal. Retornando resposta nao verificada.",
             )
-            try:
-                get_analytics().log_decision(
-                    user_input=user_input,
-                    selected_mode=mode,
-                    complexity_score=complexity_score,
-                    result=result,
-                )
-            except Exception as exc:
-                logger.debug("Falha ao registrar analytics: %s", exc)
+            self._log_decision(user_input, mode, complexity_score, result)
             return result
 
-        if mode == ReasoningMode.VOICE_FAST:
-            result = await self._fast_response(user_input, context, realtime_context)
+        if mode == ReasoningMode.HYBRID:
+            self._start_followup(
+                user_input, context, complexity_score, session_key, on_followup,
+                turn_context,
+            )
+            result = await self._fast_response(
+                user_input, context, realtime_context,
+                session_key=session_key, turn_context=turn_context,
+            )
+            result.mode = ReasoningMode.HYBRID
+        elif mode == ReasoningMode.VOICE_FAST:
+            result = await self._fast_response(
+                user_input, context, realtime_context,
+                session_key=session_key, turn_context=turn_context,
+            )
         else:
-            result = await self._deep_reasoning(user_input, context, realtime_context)
+            result = await self._deep_reasoning(
+                user_input, context, realtime_context,
+                session_key=session_key, turn_context=turn_context,
+            )
 
         if time_sensitive:
             result.text = self._enforce_temporal_output_contract(
@@ -401,9 +609,9 @@ class GeminiReasoningSystem:
 
         result.execution_time_ms = int((time.time() - start_time) * 1000)
         
-        # OTIMIZAÃƒâ€¡ÃƒÆ’O: Salva no cache
-        if not force_mode and not time_sensitive and result.confidence > 0.7:
-            self.cache.set(user_input, result)
+        # OTIMIZAÃƒâ€¡ÃƒÆ’O: Salva no cache (no HYBRID quem vai pro cache e o profundo)
+        if not force_mode and not time_sensitive and mode != ReasoningMode.HYBRID:
+            await self._remember(user_input, context, turn_context, result)
 
         if realtime_context.sources:
             if not result.tools_used:
@@ -421,6 +629,198 @@ class GeminiReasoningSystem:
             result.execution_time_ms,
             result.mode.value,
         )
+        self._log_decision(user_input, mode, complexity_score, result)
+        return result
+
+    async def process_stream(
+        self,
+        user_input: str,
+        context: str,
+        force_mode: Optional[ReasoningMode] = None,
+        *,
+        session_key: Optional[str] = None,
+        on_followup: Optional[FollowupCallback] = None,
+        turn_context: str = "",
+    ) -> AsyncIterator[ReasoningChunk]:
+        """
+        Versao em streaming do process.
+
+        Entrega o texto conforme o modelo gera (e, no modo profundo, os
+        pensamentos e a execucao de codigo), para a voz comecar na primeira
+        frase. O ultimo chunk tem kind="done" com o ReasoningResult completo.
+        """
+        start_time = time.time()
+        time_sensitive = self.realtime_search.should_search(user_input)
+
+        if not force_mode and not time_sensitive:
+            cached = await self._lookup_cache(user_input, context, turn_context, start_time)
+            if cached:
+                yield ReasoningChunk("text", cached.text)
+                yield ReasoningChunk("done", result=cached)
+                return
+
+        if time_sensitive:
+            # O contrato temporal reescreve a resposta inteira: sem streaming
+            result = await self.process(
+                user_input,
+                context,
+                force_mode=force_mode,
+                session_key=session_key,
+                on_followup=on_followup,
+                turn_context=turn_context,
+            )
+            yield ReasoningChunk("text", result.text)
+            yield ReasoningChunk("done", result=result)
+            return
+
+        complexity_score = self._compute_complexity_score(user_input)
+        mode = force_mode if force_mode else self._select_mode(user_input)
+        logger.info("Processando (streaming) com modo: %s", mode.value)
+
+        stream_mode = mode
+        if mode == ReasoningMode.HYBRID:
+            self._start_followup(
+                user_input, context, complexity_score, session_key, on_followup,
+                turn_context,
+            )
+            stream_mode = ReasoningMode.VOICE_FAST
+
+        result: Optional[ReasoningResult] = None
+        async for chunk in self._stream_generation(
+            stream_mode, user_input, context, RealtimeContext(),
+            session_key=session_key, turn_context=turn_context,
+        ):
+            if chunk.kind == "done":
+                result = chunk.result
+            else:
+                yield chunk
+
+        result.execution_time_ms = int((time.time() - start_time) * 1000)
+        if mode == ReasoningMode.HYBRID:
+            result.mode = ReasoningMode.HYBRID
+        elif not force_mode:
+            await self._remember(user_input, context, turn_context, result)
+
+        logger.info(
+            "Streaming concluido em %sms (modo: %s)",
+            result.execution_time_ms,
+            result.mode.value,
+        )
+        self._log_decision(user_input, mode, complexity_score, result)
+        yield ReasoningChunk("done", result=result)
+
+    def _start_followup(
+        self,
+        user_input: str,
+        context: str,
+        complexity_score: int,
+        session_key: Optional[str],
+        on_followup: Optional[FollowupCallback],
+        turn_context: str = "",
+    ):
+        """Dispara o raciocinio profundo em paralelo com a resposta rapida."""
+        key = session_key or "default"
+        self.cancel_followup(key)
+        task = asyncio.create_task(
+            self._run_followup(
+                user_input, context, complexity_score, session_key, on_followup, turn_context,
+            )
+        )
+        self._followups[key] = task
+
+        def _cleanup(done: asyncio.Task):
+            if self._followups.get(key) is done:
+                del self._followups[key]
+
+        task.add_done_callback(_cleanup)
+
+    async def _run_followup(
+        self,
+        user_input: str,
+        context: str,
+        complexity_score: int,
+        session_key: Optional[str],
+        on_followup: Optional[FollowupCallback],
+        turn_context: str = "",
+    ):
+        start_time = time.time()
+        result = await self._deep_reasoning(
+            user_input, context, RealtimeContext(),
+            session_key=session_key, turn_context=turn_context,
+        )
+        result.execution_time_ms = int((time.time() - start_time) * 1000)
+        if result.mode != ReasoningMode.REASONING_DEEP:
+            return  # Deep falhou e caiu no fast: nada melhor para entregar
+
+        await self._remember(user_input, context, turn_context, result)
+        self._log_decision(user_input, ReasoningMode.HYBRID, complexity_score, result)
+        logger.info("Follow-up profundo pronto em %sms", result.execution_time_ms)
+        if on_followup:
+            try:
+                await on_followup(result)
+            except Exception as exc:
+                logger.warning("Falha ao entregar follow-up profundo: %s", exc)
+
+    def cancel_followup(self, session_key: Optional[str] = None) -> bool:
+        """Cancela o raciocinio profundo pendente (usuario mudou de assunto)."""
+        task = self._followups.pop(session_key or "default", None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        logger.debug("Follow-up profundo cancelado (%s)", session_key)
+        return True
+
+    @staticmethod
+    def _cache_context(context: str, turn_context: str) -> str:
+        """Tudo que muda a resposta alem da pergunta: memoria da sessao e do turno."""
+        if not turn_context:
+            return context
+        return f"{context}\x1e{turn_context}"
+
+    async def _lookup_cache(
+        self,
+        user_input: str,
+        context: str,
+        turn_context: str,
+        start_time: float,
+    ) -> Optional[ReasoningResult]:
+        """Cache exato e depois semantico; cada hit vira um resultado novo."""
+        context = self._cache_context(context, turn_context)
+        cached = self.cache.get(user_input, context)
+        if cached:
+            logger.info("Cache HIT! Retornando resposta cacheada")
+            return cached.to_result(int((time.time() - start_time) * 1000))
+
+        if self.semantic_cache:
+            cached = await asyncio.to_thread(self.semantic_cache.get, user_input, context)
+            if cached:
+                logger.info("Cache semantico HIT! Retornando resposta de pergunta similar")
+                return cached.to_result(int((time.time() - start_time) * 1000))
+        return None
+
+    async def _remember(
+        self,
+        user_input: str,
+        context: str,
+        turn_context: str,
+        result: ReasoningResult,
+    ):
+        """Guarda respostas confiaveis nos caches (snapshot imutavel)."""
+        if result.confidence <= 0.7:
+            return
+        context = self._cache_context(context, turn_context)
+        frozen = CachedReasoning.from_result(result)
+        self.cache.set(user_input, context, frozen)
+        if self.semantic_cache:
+            await asyncio.to_thread(self.semantic_cache.set, user_input, context, frozen)
+
+    def _log_decision(
+        self,
+        user_input: str,
+        mode: ReasoningMode,
+        complexity_score: int,
+        result: ReasoningResult,
+    ):
         try:
             get_analytics().log_decision(
                 user_input=user_input,
@@ -430,7 +830,105 @@ class GeminiReasoningSystem:
             )
         except Exception as exc:
             logger.debug("Falha ao registrar analytics: %s", exc)
-        return result
+
+    async def _stream_generation(
+        self,
+        mode: ReasoningMode,
+        user_input: str,
+        context: str,
+        realtime_context: RealtimeContext,
+        *,
+        session_key: Optional[str] = None,
+        turn_context: str = "",
+    ) -> AsyncIterator[ReasoningChunk]:
+        """Gera em streaming via client.aio; termina com chunk "done"."""
+        deep = mode != ReasoningMode.VOICE_FAST
+        if deep:
+            parts = self._build_reasoning_prompt(user_input, context, realtime_context, turn_context)
+        else:
+            parts = self._build_fast_prompt(user_input, context, realtime_context, turn_context)
+        model, contents, config, handle = await self._request_args(
+            parts, deep=deep, session_key=session_key,
+        )
+
+        text_parts: List[str] = []
+        thinking_parts: List[str] = []
+        tools_used: List[Dict] = []
+        emitted = False
+        failed = False
+
+        try:
+            async with gemini_slot():
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=model,
+                    contents=contents,
+                    config=config,
+                )
+                async for response in stream:
+                    for part in response.parts or []:
+                        if part.thought and part.text:
+                            thinking_parts.append(part.text.strip())
+                            emitted = True
+                            yield ReasoningChunk("thought", part.text)
+                        elif part.text:
+                            text_parts.append(part.text)
+                            emitted = True
+                            yield ReasoningChunk("text", part.text)
+
+                        if part.executable_code is not None:
+                            tools_used.append(
+                                {
+                                    "type": "code_execution",
+                                    "code": part.executable_code.code,
+                                    "language": part.executable_code.language,
+                                }
+                            )
+                            emitted = True
+                            yield ReasoningChunk("code", part.executable_code.code or "")
+
+                        if part.code_execution_result is not None and tools_used:
+                            tools_used[-1]["result"] = part.code_execution_result.output
+                            yield ReasoningChunk("code_result", part.code_execution_result.output or "")
+        except Exception as e:
+            logger.error("Erro no streaming (%s): %s", mode.value, e)
+            failed = True
+            if not emitted:
+                cache_rejected = bool(handle) and is_cache_error(e)
+                if cache_rejected or deep:
+                    if cache_rejected:
+                        # Handle rejeitado: repete o mesmo modo com prompt completo
+                        self.context_cache.discard(handle)
+                    retry_mode = mode if cache_rejected else ReasoningMode.VOICE_FAST
+                    async for chunk in self._stream_generation(
+                        retry_mode, user_input, context, realtime_context,
+                        session_key=session_key, turn_context=turn_context,
+                    ):
+                        yield chunk
+                    return
+                fallback = "Porra, deu ruim aqui. Tenta de novo?"
+                yield ReasoningChunk("text", fallback)
+                yield ReasoningChunk(
+                    "done",
+                    result=ReasoningResult(
+                        mode=ReasoningMode.VOICE_FAST,
+                        text=fallback,
+                        confidence=0.0,
+                    ),
+                )
+                return
+
+        thinking = "\n\n".join(p for p in thinking_parts if p).strip() or None
+        yield ReasoningChunk(
+            "done",
+            result=ReasoningResult(
+                mode=ReasoningMode.REASONING_DEEP if deep else ReasoningMode.VOICE_FAST,
+                text="".join(text_parts),
+                thinking=thinking,
+                tools_used=tools_used,
+                # Stream interrompido no meio: resposta parcial, nao vai pro cache
+                confidence=0.5 if failed else (0.95 if deep else 0.9),
+            ),
+        )
 
     def _build_unverified_realtime_result(self, user_input: str) -> ReasoningResult:
         """Fallback quando pergunta temporal nao pode ser validada online."""
@@ -502,47 +1000,22 @@ class GeminiReasoningSystem:
 
     def _compute_complexity_score(self, user_input: str) -> int:
         """Calcula score de complexidade para decidir o modo."""
-        text_lower = user_input.lower()
-        word_count = len(user_input.split())
-
-        # OTIMIZACAO: Keywords mais especificas
-        critical_keywords = [
-            "debug", "debugar",
-            "erro critico", "erro crítico", "exception", "traceback",
-            "crash", "nao funciona de jeito nenhum", "não funciona de jeito nenhum",
-            "comparar tecnologias", "qual biblioteca usar",
-            "arquitetura do sistema", "design pattern",
-            "otimizacao de performance", "otimização de performance", "bottleneck",
-            "refatoracao complexa", "refatoração complexa", "algoritmo eficiente",
-        ]
-
-        has_code_block = "```" in user_input
-        is_very_long = word_count > 60
-        has_multiple_questions = user_input.count("?") > 2
-
-        complexity_score = 0
-        for keyword in critical_keywords:
-            if keyword in text_lower:
-                complexity_score += 3
-
-        if has_code_block:
-            complexity_score += 4
-        if is_very_long:
-            complexity_score += 3
-        if has_multiple_questions:
-            complexity_score += 3
-
-        return complexity_score
+        return classify_query(user_input).complexity_score
 
     def _select_mode(self, user_input: str) -> ReasoningMode:
         """Heuristica OTIMIZADA - usa reasoning apenas quando REALMENTE necessario."""
         complexity_score = self._compute_complexity_score(user_input)
 
         # OTIMIZACAO: Threshold MUITO mais alto (8 ao inves de 5)
-        if complexity_score >= 8:
+        if complexity_score >= DEEP_MIN_SCORE:
             logger.debug("Complexity score: %s -> REASONING_DEEP", complexity_score)
             return ReasoningMode.REASONING_DEEP
 
+        # Zona cinzenta: fala com o fast e entrega o deep depois
+        if self.hybrid_min_score is not None and complexity_score >= self.hybrid_min_score:
+            logger.debug("Complexity score: %s -> HYBRID", complexity_score)
+            return ReasoningMode.HYBRID
+
         logger.debug("Complexity score: %s -> VOICE_FAST", complexity_score)
         return ReasoningMode.VOICE_FAST
     async def _fast_response(
@@ -550,17 +1023,15 @@ class GeminiReasoningSystem:
         user_input: str,
         context: str,
         realtime_context: RealtimeContext,
+        *,
+        session_key: Optional[str] = None,
+        turn_context: str = "",
     ) -> ReasoningResult:
         """Resposta rapida sem reasoning profundo."""
-        prompt = self._build_fast_prompt(user_input, context, realtime_context)
+        parts = self._build_fast_prompt(user_input, context, realtime_context, turn_context)
 
         try:
-            response = await asyncio.to_thread(
-                self.client.models.generate_content,
-                model=self.fast_model,
-                contents=prompt,
-                config=self.fast_config,
-            )
+            response = await self._generate(parts, deep=False, session_key=session_key)
             return ReasoningResult(
                 mode=ReasoningMode.VOICE_FAST,
                 text=response.text or "",
@@ -581,17 +1052,15 @@ class GeminiReasoningSystem:
         user_input: str,
         context: str,
         realtime_context: RealtimeContext,
+        *,
+        session_key: Optional[str] = None,
+        turn_context: str = "",
     ) -> ReasoningResult:
         """Raciocinio profundo com thinking e code execution."""
-        prompt = self._build_reasoning_prompt(user_input, context, realtime_context)
+        parts = self._build_reasoning_prompt(user_input, context, realtime_context, turn_context)
 
         try:
-            response = await asyncio.to_thread(
-                self.client.models.generate_content,
-                model=self.reasoning_model,
-                contents=prompt,
-                config=self.reasoning_config,
-            )
+            response = await self._generate(parts, deep=True, session_key=session_key)
 
             final_text = response.text or ""
             thinking_parts: List[str] = []
@@ -625,96 +1094,106 @@ class GeminiReasoningSystem:
             )
         except Exception as e:
             logger.error("Erro no deep reasoning: %s", e)
-            return await self._fast_response(user_input, context, realtime_context)
+            return await self._fast_response(
+                user_input, context, realtime_context,
+                session_key=session_key, turn_context=turn_context,
+            )
+
+    async def _request_args(
+        self,
+        parts: PromptParts,
+        *,
+        deep: bool,
+        session_key: Optional[str],
+    ) -> Tuple[str, str, types.GenerateContentConfig, Optional[str]]:
+        """
+        (modelo, contents, config, handle) da chamada.
+
+        Com handle, instrucao + memoria (e as tools do modo) ja estao no
+        context cache e so a parte dinamica vai em contents. Sem handle
+        (cache desligado, prefixo pequeno, ainda sendo criado, falha) vai
+        o prompt completo.
+        """
+        mode_name = "deep" if deep else "fast"
+        model = self.reasoning_model if deep else self.fast_model
+        config = self.reasoning_config if deep else self.fast_config
+        if self.context_cache is None:
+            return model, parts.text, config, None
+
+        handle = await self.context_cache.get_handle(
+            model=model,
+            tag=f"{mode_name}-{self.prompt_builder.instruction_version}",
+            system_instruction=parts.cacheable_prefix,
+            tools=config.tools,
+            owner=f"{session_key or 'default'}:{mode_name}",
+        )
+        if handle is None:
+            return model, parts.text, config, None
+        # cached_content nao aceita tools/system_instruction junto
+        cached_config = config.model_copy(update={"cached_content": handle, "tools": None})
+        return model, parts.request, cached_config, handle
+
+    async def _generate(
+        self,
+        parts: PromptParts,
+        *,
+        deep: bool,
+        session_key: Optional[str],
+    ) -> types.GenerateContentResponse:
+        """generate_content com context cache e fallback para o prompt completo."""
+        model, contents, config, handle = await self._request_args(
+            parts, deep=deep, session_key=session_key,
+        )
+        try:
+            async with gemini_slot():
+                return await self.client.aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=config,
+                )
+        except Exception as exc:
+            if handle is None or not is_cache_error(exc):
+                raise  # Erro transitorio (503 etc.) nao derruba o handle
+            logger.warning("Context cache rejeitado (%s); reenviando prompt completo", exc)
+            self.context_cache.discard(handle)
+            async with gemini_slot():
+                return await self.client.aio.models.generate_content(
+                    model=model,
+                    contents=parts.text,
+                    config=self.reasoning_config if deep else self.fast_config,
+                )
+
+    def release_session(self, session_key: Optional[str] = None):
+        """Fim de sessao: cancela follow-up e libera os context caches dela."""
+        self.cancel_followup(session_key)
+        if self.context_cache:
+            key = session_key or "default"
+            for mode_name in ("fast", "deep"):
+                self.context_cache.release_owner(f"{key}:{mode_name}")
 
     def _build_fast_prompt(
         self,
         user_input: str,
         context: str,
         realtime_context: RealtimeContext,
-    ) -> str:
+        turn_context: str = "",
+    ) -> PromptParts:
         """Monta prompt para resposta rapida."""
-        from prompts import AGENT_INSTRUCTION
-        from temporal_context import build_temporal_guardrail
-
-        realtime_block = ""
-        if realtime_context.text:
-            realtime_block = (
-                "\n\n---\n"
-                f"{realtime_context.text}\n"
-                "Se houver conflito com memoria antiga, priorize o contexto atualizado.\n"
-                "FORMATO OBRIGATORIO PARA RESPOSTA TEMPORAL:\n"
-                "- Status: verificado ou nao verificado\n"
-                "- Data da verificacao: YYYY-MM-DD HH:MM:SS +TZ\n"
-                "- Fontes: lista numerada com titulo, data e link\n"
-            )
-
-        return f"""
-{AGENT_INSTRUCTION}
-{build_temporal_guardrail()}
-
-{context}
-{realtime_block}
-
----
-
-Responda de forma DIRETA, NATURAL e CASUAL. Sem formalidades.
-
-Usuario: {user_input}
-""".strip()
+        return self.prompt_builder.build_parts(
+            user_input, context, realtime_context.text, turn_context=turn_context,
+        )
 
     def _build_reasoning_prompt(
         self,
         user_input: str,
         context: str,
         realtime_context: RealtimeContext,
-    ) -> str:
+        turn_context: str = "",
+    ) -> PromptParts:
         """Monta prompt para raciocinio profundo."""
-        from prompts import AGENT_INSTRUCTION
-        from temporal_context import build_temporal_guardrail
-
-        realtime_block = ""
-        if realtime_context.text:
-            realtime_block = (
-                "\n\n---\n"
-                f"{realtime_context.text}\n"
-                "Use o contexto atualizado para fatos temporais e deixe isso claro na resposta.\n"
-                "FORMATO OBRIGATORIO PARA RESPOSTA TEMPORAL:\n"
-                "- Status: verificado ou nao verificado\n"
-                "- Data da verificacao: YYYY-MM-DD HH:MM:SS +TZ\n"
-                "- Fontes: lista numerada com titulo, data e link\n"
-            )
-
-        return f"""
-{AGENT_INSTRUCTION}
-{build_temporal_guardrail()}
-
-{context}
-{realtime_block}
-
----
-
-# RACIOCINIO PROFUNDO
-
-Problema tÃƒÂ©cnico complexo detectado. Pense estruturadamente:
-
-<thinking>
-1. ENTENDIMENTO: Qual ÃƒÂ© o problema exato?
-2. ANÃƒÂLISE: Causas possÃƒÂ­veis
-3. SOLUÃƒâ€¡ÃƒÆ’O: Melhor abordagem
-4. VALIDAÃƒâ€¡ÃƒÆ’O: Como testar
-</thinking>
-
-<answer>
-[Resposta clara e acionÃƒÂ¡vel]
-
-**PrÃƒÂ³ximos passos:**
-1. [AÃƒÂ§ÃƒÂ£o especÃƒÂ­fica]
-2. [Como validar]
-</answer>
-
-Usuario: {user_input}
-""".strip()
+        return self.prompt_builder.build_parts(
+            user_input, context, realtime_context.text, deep=True, turn_context=turn_context,
+        )
 
 
 class ReasoningAnalytics:
@@ -802,6 +1281,12 @@ def get_reasoning_system() -> GeminiReasoningSystem:
     return _reasoning_system
 
 
+def close_reasoning_system():
+    """Fim do processo: fecha o pool HTTP compartilhado (registrar no atexit)."""
+    if _reasoning_system is not None:
+        _reasoning_system.realtime_search.close()
+
+
 def get_analytics() -> ReasoningAnalytics:
     """Factory para analytics (singleton)."""
     global _analytics
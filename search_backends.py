@@ -0,0 +1,425 @@
+"""
+Backends de busca em tempo real (async, com pool HTTP compartilhado).
+
+Cada backend tem seu circuit breaker; hedged_search dispara os backends
+em paralelo (ou escalonados por hedge_delay) e o primeiro resultado nao
+vazio vence, cancelando os demais. SearchCache guarda os resultados por
+assinatura normalizada da pergunta.
+"""
+
+from abc import ABC, abstractmethod
+import asyncio
+import json
+import logging
+from pathlib import Path
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+import xml.etree.ElementTree as ET
+
+import httpx
+
+from cache_utils import LRUCache
+from query_classifier import normalize_query
+
+logger = logging.getLogger("pulse_agent.search")
+
+SearchItem = Dict[str, str]
+
+DEFAULT_HEADERS = {"User-Agent": "PULSE-Agent/1.0 (realtime-search)"}
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simples por backend.
+
+    fechado -> aberto apos failure_threshold falhas seguidas;
+    aberto -> meio-aberto apos reset_timeout (deixa passar uma sonda);
+    sonda ok fecha de novo, sonda com falha reabre.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Sonda cancelada (perdeu a corrida): libera para a proxima."""
+        self._probe_in_flight = False
+
+
+class SearchBackend(ABC):
+    """Interface de backend: monta a requisicao e interpreta a resposta."""
+
+    name = "backend"
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        timeout: float = 5.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+
+    @abstractmethod
+    def build_params(self, query: str) -> Dict[str, str]:
+        """Query string da requisicao."""
+
+    @abstractmethod
+    def parse(self, content: bytes, max_results: int) -> List[SearchItem]:
+        """Itens (title/url/published_at) da resposta, no maximo max_results."""
+
+    async def search(
+        self,
+        client: httpx.AsyncClient,
+        query: str,
+        max_results: int,
+    ) -> List[SearchItem]:
+        response = await client.get(
+            self.base_url,
+            params=self.build_params(query),
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return self.parse(response.content, max_results)
+
+
+class RSSItemCollector:
+    """
+    Parser incremental de RSS (XMLPullParser).
+
+    Recebe a resposta em pedacos e para assim que junta max_results itens
+    validos, sem montar a arvore do feed inteiro.
+    """
+
+    def __init__(self, max_results: int):
+        self.max_results = max_results
+        self.items: List[SearchItem] = []
+        self._parser = ET.XMLPullParser(events=("end",))
+
+    @property
+    def done(self) -> bool:
+        return len(self.items) >= self.max_results
+
+    def feed(self, chunk: bytes) -> bool:
+        """Alimenta o parser; retorna True quando ja tem itens suficientes."""
+        self._parser.feed(chunk)
+        for _, element in self._parser.read_events():
+            if element.tag != "item":
+                continue
+            title = (element.findtext("title") or "").strip()
+            link = (element.findtext("link") or "").strip()
+            pub_date = (element.findtext("pubDate") or "").strip()
+            element.clear()  # Item ja lido: libera memoria
+            if title and link:
+                self.items.append({"title": title, "url": link, "published_at": pub_date})
+                if self.done:
+                    return True
+        return False
+
+
+class GoogleNewsRSSBackend(SearchBackend):
+    name = "google_news_rss"
+
+    def __init__(self, base_url: str = "https://news.google.com/rss/search", **kwargs):
+        super().__init__(base_url, **kwargs)
+
+    def build_params(self, query: str) -> Dict[str, str]:
+        return {"q": query}
+
+    def parse(self, content: bytes, max_results: int) -> List[SearchItem]:
+        collector = RSSItemCollector(max_results)
+        try:
+            collector.feed(content)
+        except ET.ParseError:
+            pass  # Fica com os itens lidos antes do erro
+        return collector.items
+
+    async def search(
+        self,
+        client: httpx.AsyncClient,
+        query: str,
+        max_results: int,
+    ) -> List[SearchItem]:
+        collector = RSSItemCollector(max_results)
+        async with client.stream(
+            "GET",
+            self.base_url,
+            params=self.build_params(query),
+            timeout=self.timeout,
+        ) as response:
+            response.raise_for_status()
+            try:
+                async for chunk in response.aiter_bytes():
+                    if collector.feed(chunk):
+                        break  # Sair do "async with" fecha o socket sem ler o resto
+            except ET.ParseError:
+                pass
+        return collector.items
+
+
+class DuckDuckGoBackend(SearchBackend):
+    name = "duckduckgo"
+
+    def __init__(self, base_url: str = "https://api.duckduckgo.com/", **kwargs):
+        super().__init__(base_url, **kwargs)
+
+    def build_params(self, query: str) -> Dict[str, str]:
+        return {"q": query, "format": "json", "no_redirect": "1", "no_html": "1"}
+
+    def parse(self, content: bytes, max_results: int) -> List[SearchItem]:
+        try:
+            data = json.loads(content.decode("utf-8", errors="ignore"))
+        except json.JSONDecodeError:
+            return []
+
+        items: List[SearchItem] = []
+
+        abstract_text = str(data.get("AbstractText", "")).strip()
+        abstract_url = str(data.get("AbstractURL", "")).strip()
+        if abstract_text and abstract_url:
+            items.append({"title": abstract_text[:160], "url": abstract_url, "published_at": ""})
+
+        for topic in data.get("RelatedTopics", []) or []:
+            if "Topics" in topic:
+                nested_topics = topic.get("Topics", []) or []
+            else:
+                nested_topics = [topic]
+            for entry in nested_topics:
+                text = str(entry.get("Text", "")).strip()
+                first_url = str(entry.get("FirstURL", "")).strip()
+                if not text or not first_url:
+                    continue
+                items.append({"title": text[:160], "url": first_url, "published_at": ""})
+                if len(items) >= max_results:
+                    return items
+        return items
+
+
+def create_http_client(max_connections: int = 20) -> httpx.AsyncClient:
+    """Cliente HTTP com keep-alive: conexoes TLS reaproveitadas entre buscas."""
+    return httpx.AsyncClient(
+        headers=DEFAULT_HEADERS,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections // 2 or 1,
+        ),
+    )
+
+
+async def _run_backend(
+    backend: SearchBackend,
+    client: httpx.AsyncClient,
+    query: str,
+    max_results: int,
+) -> List[SearchItem]:
+    try:
+        items = await backend.search(client, query, max_results)
+    except asyncio.CancelledError:
+        backend.breaker.release()
+        raise
+    except Exception as exc:
+        backend.breaker.record_failure()
+        logger.debug(
+            "Backend %s falhou (%s): %s", backend.name, backend.breaker.state, exc,
+        )
+        return []
+    backend.breaker.record_success()
+    return items
+
+
+async def hedged_search(
+    backends: Sequence[SearchBackend],
+    client: httpx.AsyncClient,
+    query: str,
+    max_results: int,
+    *,
+    hedge_delay: float = 0.0,
+) -> List[SearchItem]:
+    """
+    Busca nos backends em corrida; o primeiro resultado nao vazio vence.
+
+    Com hedge_delay > 0 o proximo backend so dispara se o anterior nao
+    respondeu nesse prazo (ou respondeu vazio/falhou). Backends com
+    circuito aberto sao pulados.
+    """
+    waiting = list(backends)
+    pending: set = set()
+
+    def launch():
+        # allow() so na hora de disparar: sonda do meio-aberto nao fica presa
+        while waiting:
+            backend = waiting.pop(0)
+            if backend.breaker.allow():
+                pending.add(
+                    asyncio.create_task(_run_backend(backend, client, query, max_results))
+                )
+                return
+
+    launch()
+    try:
+        while pending:
+            done, still_pending = await asyncio.wait(
+                pending,
+                timeout=hedge_delay if waiting else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            pending.clear()
+            pending.update(still_pending)
+            for task in done:
+                items = task.result()
+                if items:
+                    return items
+            if not done or not pending:
+                launch()
+        return []
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# Palavras que nao mudam o resultado da busca ("qual o preco do dolar hoje?"
+# e "preco dolar hoje" sao a mesma consulta)
+# Negacao e relacao (sem, nao, com, contra) ficam de fora: "python com
+# docker" e "python sem docker" nao podem cair na mesma assinatura
+STOPWORDS = frozenset(
+    """
+    a as o os um uma uns umas de da das do dos em na nas no nos por para pra
+    e ou que qual quais quem como quando onde porque se me te voce
+    eu ele ela isso isto esse essa este esta ai sobre ao aos ja tem ter foi
+    the of to in on for and or is are what which who how when where
+    """.split()
+)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def query_signature(query: str) -> str:
+    """Assinatura normalizada: sem acento, sem stopwords, tokens ordenados."""
+    tokens = _TOKEN_RE.findall(normalize_query(query))
+    meaningful = sorted({token for token in tokens if token not in STOPWORDS})
+    return " ".join(meaningful or tokens)
+
+
+class SearchCache:
+    """
+    Cache das buscas em tempo real por assinatura normalizada.
+
+    Memoria: LRU com TTL (resultado vazio usa negative_ttl, mais curto,
+    para tentar de novo logo). Com db_path, cada resultado tambem vai para
+    um SQLite e sobrevive a restart do worker.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 256,
+        ttl_seconds: float = 600.0,
+        negative_ttl_seconds: float = 60.0,
+        db_path: Optional[str] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._memory = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(db_path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " signature TEXT PRIMARY KEY,"
+                " expires_at REAL NOT NULL,"
+                " value TEXT NOT NULL)"
+            )
+            db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+            db.commit()
+            self._db = db
+        except sqlite3.Error as exc:
+            logger.warning("Cache de busca em disco desativado (%s): %s", db_path, exc)
+
+    def stats(self) -> Dict:
+        return self._memory.stats()
+
+    def get(self, query: str) -> Optional[Dict]:
+        signature = query_signature(query)
+        value = self._memory.get(signature)
+        if value is not None or self._db is None:
+            return value
+
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT expires_at, value FROM search_cache WHERE signature = ?",
+                (signature,),
+            ).fetchone()
+        if row is None:
+            return None
+        remaining = row[0] - time.time()
+        if remaining <= 0:
+            return None
+        value = json.loads(row[1])
+        self._memory.set(signature, value, ttl_seconds=remaining)
+        return value
+
+    def set(self, query: str, value: Dict, *, negative: bool = False):
+        signature = query_signature(query)
+        ttl = self.negative_ttl_seconds if negative else self.ttl_seconds
+        self._memory.set(signature, value, ttl_seconds=ttl)
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_cache (signature, expires_at, value)"
+                    " VALUES (?, ?, ?)",
+                    (signature, time.time() + ttl, json.dumps(value, ensure_ascii=False)),
+                )
+                self._db.commit()
+        except sqlite3.Error as exc:
+            logger.debug("Falha ao gravar cache de busca em disco: %s", exc)
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
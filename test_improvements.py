@@ -5,8 +5,11 @@ import asyncio
 import importlib
 import os
 import sys
+import threading
 import time
 from dataclasses import dataclass
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 from dotenv import load_dotenv
 
@@ -72,6 +75,80 @@ def test_static_integrity() -> list[TestResult]:
     except Exception as exc:
         results.append(TestResult("Validacao de prompt", "fail", str(exc)))
 
+    try:
+        from cache_utils import LRUCache
+
+        cache = LRUCache(max_entries=2, max_bytes=100, size_fn=len)
+        cache.set("a", "x" * 10)
+        cache.set("b", "y" * 10)
+        cache.get("a")
+        cache.set("c", "z" * 10)  # remove "b" (menos usado), nao "a"
+        cache.set("d", "w" * 200)  # maior que max_bytes: nao entra
+        if cache.get("a") and cache.get("b") is None and cache.get("d") is None:
+            results.append(TestResult("Cache LRU com limite de bytes", "pass", str(cache.stats())))
+        else:
+            results.append(TestResult("Cache LRU com limite de bytes", "fail", str(cache.stats())))
+    except Exception as exc:
+        results.append(TestResult("Cache LRU com limite de bytes", "fail", str(exc)))
+
+    try:
+        from context_packer import ContextItem, ContextPacker, estimate_tokens
+
+        now = time.time()
+        packer = ContextPacker(token_budget=60, max_item_tokens=20)
+        items = [
+            ContextItem("conversations", "s1", "turno antigo " * 30, timestamp=now - 6 * 86400, order=1),
+            ContextItem("conversations", "s1", "turno sobre deadlock no postgres", timestamp=now - 86400,
+                        similarity=0.9, order=2),
+            ContextItem("facts", "tech_stack", "usa fastapi", timestamp=now - 30 * 86400, mention_count=8),
+            ContextItem("conversations", "s2", "oi tudo bem", timestamp=now - 5 * 86400, order=3),
+        ]
+        selected = packer.select(items, header_tokens=4, now=now)
+        texts = [item.text for item in selected]
+        used = sum(estimate_tokens(text) for text in texts) + 4 * len({(i.section, i.group) for i in selected})
+        if "turno sobre deadlock no postgres" in texts and used <= 60 and all(len(t) <= 80 for t in texts):
+            results.append(TestResult("Context packer respeita orcamento", "pass", f"tokens={used} itens={len(texts)}"))
+        else:
+            results.append(TestResult("Context packer respeita orcamento", "fail", f"tokens={used} itens={texts}"))
+    except Exception as exc:
+        results.append(TestResult("Context packer respeita orcamento", "fail", str(exc)))
+
+    try:
+        from embeddings import EmbeddingMemo
+
+        forwarded: list[str] = []
+
+        def fake_embedding_fn(texts):
+            forwarded.extend(texts)
+            return [[float(len(text))] for text in texts]
+
+        memo = EmbeddingMemo(fake_embedding_fn, max_entries=8)
+        memo.embed_one("pergunta do turno")  # busca na memoria
+        memo.embed(["pergunta do turno", "resposta", "resposta"])  # insert em lote
+        memo.embed_one("pergunta do turno")  # cache semantico
+        if forwarded == ["pergunta do turno", "resposta"]:
+            results.append(TestResult("Memo de embeddings (um forward por texto)", "pass", str(memo.stats())))
+        else:
+            results.append(TestResult("Memo de embeddings (um forward por texto)", "fail", str(forwarded)))
+    except Exception as exc:
+        results.append(TestResult("Memo de embeddings (um forward por texto)", "fail", str(exc)))
+
+    try:
+        from text_signals import analyze_text
+
+        inside_words = analyze_text("pesquisei no google um algoritmo de busca").topics
+        whole_word = analyze_text("uso go no backend").topics
+        # Termo que comeca com pontuacao casa mesmo colado numa palavra
+        dotted = analyze_text("migrei para asp.net").topics
+        if "go" not in inside_words and "go" in whole_word and ".net" in dotted:
+            results.append(TestResult("Topicos so casam palavra inteira", "pass"))
+        else:
+            results.append(
+                TestResult("Topicos so casam palavra inteira", "fail", f"{sorted(inside_words)} {sorted(whole_word)} {sorted(dotted)}")
+            )
+    except Exception as exc:
+        results.append(TestResult("Topicos so casam palavra inteira", "fail", str(exc)))
+
     for res in results:
         print_result(res)
     return results
@@ -259,6 +336,721 @@ async def test_vision_runtime() -> list[TestResult]:
     return results
 
 
+class _FakeSearchHandler(BaseHTTPRequestHandler):
+    """Servidor fake: /rss lento, /rss_big enorme, /ddg rapido, /fail sempre 500."""
+
+    hits: dict[str, int] = {}
+
+    def do_GET(self) -> None:
+        path = self.path.split("?")[0]
+        self.hits[path] = self.hits.get(path, 0) + 1
+        if path == "/rss":
+            time.sleep(1.5)
+            body = (
+                b"<rss><channel><item><title>Noticia lenta</title>"
+                b"<link>http://rss/1</link></item></channel></rss>"
+            )
+            content_type = "application/rss+xml"
+        elif path == "/rss_big":
+            # Feed grande: o parser incremental deve parar nos primeiros itens
+            item = b"<item><title>Item</title><link>http://rss/big</link></item>"
+            body = b"<rss><channel>" + item * 50000 + b"</channel></rss>"
+            content_type = "application/rss+xml"
+        elif path == "/ddg":
+            body = (
+                b'{"AbstractText": "Resposta rapida", "AbstractURL": "http://ddg/1",'
+                b' "RelatedTopics": []}'
+            )
+            content_type = "application/json"
+        else:
+            self.send_response(500)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Cliente cancelou (perdeu a corrida)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+async def test_search_backends() -> list[TestResult]:
+    banner("TESTE 4: BUSCA EM TEMPO REAL (SERVIDOR FAKE)")
+    results: list[TestResult] = []
+
+    try:
+        from search_backends import (
+            CircuitBreaker,
+            DuckDuckGoBackend,
+            GoogleNewsRSSBackend,
+            create_http_client,
+            hedged_search,
+        )
+    except ModuleNotFoundError as exc:
+        results.append(TestResult("Backends de busca", "skip", f"Dependencia ausente: {exc.name}"))
+        for res in results:
+            print_result(res)
+        return results
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeSearchHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        async with create_http_client() as client:
+            backends = [GoogleNewsRSSBackend(f"{base}/rss"), DuckDuckGoBackend(f"{base}/ddg")]
+            start = time.time()
+            items = await hedged_search(backends, client, "python release", 3)
+            elapsed_ms = int((time.time() - start) * 1000)
+            if items and items[0]["url"] == "http://ddg/1" and elapsed_ms < 1000:
+                results.append(TestResult("Hedge: backend rapido vence", "pass", f"tempo={elapsed_ms}ms"))
+            else:
+                results.append(TestResult("Hedge: backend rapido vence", "fail", f"tempo={elapsed_ms}ms itens={items}"))
+
+            big_feed = await GoogleNewsRSSBackend(f"{base}/rss_big").search(client, "python", 3)
+            if len(big_feed) == 3:
+                results.append(TestResult("RSS incremental para no max_results", "pass"))
+            else:
+                results.append(TestResult("RSS incremental para no max_results", "fail", f"itens={len(big_feed)}"))
+
+            broken = DuckDuckGoBackend(
+                f"{base}/fail",
+                breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60),
+            )
+            for _ in range(3):
+                await hedged_search([broken], client, "python release", 3)
+            fail_hits = _FakeSearchHandler.hits.get("/fail", 0)
+            if broken.breaker.state == "open" and fail_hits == 2:
+                results.append(TestResult("Circuit breaker abre apos falhas", "pass", f"requisicoes={fail_hits}"))
+            else:
+                results.append(
+                    TestResult(
+                        "Circuit breaker abre apos falhas",
+                        "fail",
+                        f"estado={broken.breaker.state} requisicoes={fail_hits}",
+                    )
+                )
+    except Exception as exc:
+        results.append(TestResult("Backends de busca", "fail", str(exc)))
+    finally:
+        server.shutdown()
+
+    try:
+        import tempfile
+
+        from search_backends import SearchCache, query_signature
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "search.sqlite3")
+            cache = SearchCache(db_path=db_path)
+            cache.set("Qual o preço do dólar hoje?", {"text": "ok", "sources": []})
+            cache.close()
+            # Outro processo (restart) com frase equivalente
+            reopened = SearchCache(db_path=db_path)
+            hit = reopened.get("preco dolar hoje")
+            reopened.close()
+        negation_kept = query_signature("python com docker") != query_signature("python sem docker")
+        if hit and hit["text"] == "ok" and negation_kept:
+            results.append(TestResult("Cache de busca normalizado e persistente", "pass"))
+        else:
+            results.append(TestResult("Cache de busca normalizado e persistente", "fail", str(hit)))
+    except Exception as exc:
+        results.append(TestResult("Cache de busca normalizado e persistente", "fail", str(exc)))
+
+    for res in results:
+        print_result(res)
+    return results
+
+
+class _FakeAPIError(Exception):
+    """Erro no formato do google.genai.errors.APIError (tem .code)."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class _FakeCaches:
+    """client.aio.caches em memoria (sem rede)."""
+
+    def __init__(self, error: Exception | None = None):
+        self.error = error
+        self.created: list[str] = []
+        self.deleted: list[str] = []
+
+    async def create(self, model, config):
+        await asyncio.sleep(0.01)
+        if self.error:
+            raise self.error
+        name = f"cachedContents/{len(self.created)}"
+        self.created.append(name)
+        return type("CachedContent", (), {"name": name})()
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+def _legacy_complexity_score(user_input: str) -> int:
+    """Score de complexidade como era antes do classify_query (referencia)."""
+    text_lower = user_input.lower()
+    keywords = [
+        "debug", "debugar",
+        "erro critico", "erro crítico", "exception", "traceback",
+        "crash", "nao funciona de jeito nenhum", "não funciona de jeito nenhum",
+        "comparar tecnologias", "qual biblioteca usar",
+        "arquitetura do sistema", "design pattern",
+        "otimizacao de performance", "otimização de performance", "bottleneck",
+        "refatoracao complexa", "refatoração complexa", "algoritmo eficiente",
+    ]
+    score = sum(3 for keyword in keywords if keyword in text_lower)
+    if "```" in user_input:
+        score += 4
+    if len(user_input.split()) > 60:
+        score += 3
+    if user_input.count("?") > 2:
+        score += 3
+    return score
+
+
+def _fake_part(text=None, *, thought=False, code=None, code_output=None):
+    return type("Part", (), {
+        "text": text,
+        "thought": thought,
+        "executable_code": type("Code", (), {"code": code, "language": "PYTHON"})() if code else None,
+        "code_execution_result": type("Result", (), {"output": code_output})() if code_output else None,
+    })()
+
+
+def _fake_response(parts):
+    text = "".join(part.text for part in parts if part.text and not part.thought)
+    return type("Response", (), {"text": text, "parts": parts})()
+
+
+class _FakeModels:
+    """client.aio.models com respostas prontas (sem rede)."""
+
+    FAST_PARTS = ("Resposta rapida. ", "Segunda frase.")
+
+    def __init__(self, deep_delay: float = 0.0):
+        self.deep_delay = deep_delay
+        self.calls: list[str] = []
+
+    def _parts(self, config):
+        # So o modo profundo manda thinking_config
+        if getattr(config, "thinking_config", None) is None:
+            self.calls.append("fast")
+            return [_fake_part(text) for text in self.FAST_PARTS]
+        self.calls.append("deep")
+        return [
+            _fake_part("analisando o traceback", thought=True),
+            _fake_part("Resposta profunda. "),
+            _fake_part(code="print(1 + 1)"),
+            _fake_part(code_output="2"),
+            _fake_part("Conclusao."),
+        ]
+
+    async def generate_content(self, model, contents, config):
+        parts = self._parts(config)
+        if self.calls[-1] == "deep":
+            await asyncio.sleep(self.deep_delay)
+        return _fake_response(parts)
+
+    async def generate_content_stream(self, model, contents, config):
+        parts = self._parts(config)
+
+        async def stream():
+            for part in parts:
+                await asyncio.sleep(0)
+                yield _fake_response([part])
+
+        return stream()
+
+
+def _fake_genai_client(caches: _FakeCaches | None = None, models: _FakeModels | None = None):
+    aio = type("Aio", (), {"caches": caches, "models": models})()
+    return type("Client", (), {"aio": aio})()
+
+
+async def test_context_cache() -> list[TestResult]:
+    banner("TESTE 5: CONTEXT CACHE DO GEMINI (CLIENTE FAKE)")
+    results: list[TestResult] = []
+
+    try:
+        from gemini_cache import ContextCacheManager, is_cache_error
+    except ModuleNotFoundError as exc:
+        results.append(TestResult("Context cache", "skip", f"Dependencia ausente: {exc.name}"))
+        for res in results:
+            print_result(res)
+        return results
+
+    prefix = "instrucao do agente " * 400
+    try:
+        caches = _FakeCaches()
+        manager = ContextCacheManager(_fake_genai_client(caches), min_tokens=100)
+        request = dict(model="gemini", tag="fast-v1", owner="sessao:fast")
+        # Primeira chamada nao espera a criacao: prompt completo ate ficar pronto
+        first = await asyncio.gather(
+            *(manager.get_handle(system_instruction=prefix, **request) for _ in range(5))
+        )
+        await manager.wait_pending()
+        ready = await manager.get_handle(system_instruction=prefix, **request)
+        if first == [None] * 5 and ready and len(caches.created) == 1:
+            results.append(TestResult("Handle criado em background, uma vez so", "pass", ready))
+        else:
+            results.append(
+                TestResult("Handle criado em background, uma vez so", "fail", f"{first} {caches.created}")
+            )
+
+        # Memoria do usuario mudou: novo handle, antigo apagado
+        await manager.get_handle(system_instruction=prefix + "fato novo", **request)
+        await manager.wait_pending()
+        await asyncio.sleep(0)
+        if caches.deleted == [ready] and len(caches.created) == 2:
+            results.append(TestResult("Contexto novo invalida handle antigo", "pass"))
+        else:
+            results.append(TestResult("Contexto novo invalida handle antigo", "fail", f"apagados={caches.deleted}"))
+
+        # Handle rejeitado pela API: sai do cache local e e apagado no servidor
+        current = await manager.get_handle(system_instruction=prefix + "fato novo", **request)
+        manager.discard(current)
+        await asyncio.sleep(0)
+        after = await manager.get_handle(system_instruction=prefix + "fato novo", **request)
+        transient = _FakeAPIError(503, "UNAVAILABLE")
+        if (
+            current in caches.deleted
+            and after is None
+            and is_cache_error(_FakeAPIError(404, "CachedContent not found"))
+            and not is_cache_error(transient)
+        ):
+            results.append(TestResult("Handle rejeitado e apagado (503 nao descarta)", "pass"))
+        else:
+            results.append(
+                TestResult("Handle rejeitado e apagado (503 nao descarta)", "fail", f"apagados={caches.deleted}")
+            )
+
+        # Modelo sem suporte: marcado por modelo, nao por prefixo
+        unsupported = _FakeCaches(_FakeAPIError(400, "Model gemini does not support cached content"))
+        failing = ContextCacheManager(_fake_genai_client(unsupported), min_tokens=100)
+        await failing.get_handle(system_instruction=prefix, **request)
+        await failing.wait_pending()
+        other_user = await failing.get_handle(
+            system_instruction=prefix + "outro usuario", model="gemini", tag="fast-v1", owner="outra:fast"
+        )
+        await failing.wait_pending()
+        small = await manager.get_handle(system_instruction="curto", **request)
+        if (
+            small is None
+            and other_user is None
+            and failing.stats()["failures"] == 1
+            and not failing.supports("gemini")
+        ):
+            results.append(TestResult("Modelo sem suporte: fallback sem novas tentativas", "pass"))
+        else:
+            results.append(
+                TestResult("Modelo sem suporte: fallback sem novas tentativas", "fail", str(failing.stats()))
+            )
+    except Exception as exc:
+        results.append(TestResult("Context cache", "fail", str(exc)))
+
+    for res in results:
+        print_result(res)
+    return results
+
+
+async def test_memory_system() -> list[TestResult]:
+    banner("TESTE 6: MEMORIA (EMBEDDINGS OFFLINE)")
+    results: list[TestResult] = []
+
+    try:
+        from memory_system import ConversationTurn, MemoryWriteQueue
+    except ModuleNotFoundError as exc:
+        results.append(TestResult("Sistema de memoria", "skip", f"Dependencia ausente: {exc.name}"))
+        for res in results:
+            print_result(res)
+        return results
+
+    try:
+        batches: list[int] = []
+
+        def persist_batch(turns):
+            time.sleep(0.01)
+            batches.append(len(turns))
+
+        write_queue = MemoryWriteQueue(persist_batch, max_size=4, batch_size=4, max_delay=0.05)
+        for index in range(10):
+            turn = ConversationTurn(
+                id=str(index), session_id="s", user_id="u", role="user", text=f"turno {index}",
+                timestamp="", metadata={}, topics=set(),
+            )
+            await write_queue.put_async(turn)  # Fila cheia: espera vaga sem travar o loop
+        await write_queue.flush_async()
+        write_queue.close()
+        if sum(batches) == 10 and len(batches) < 10 and write_queue.pending == 0:
+            results.append(TestResult("Fila de escrita em lote + flush_async", "pass", f"lotes={batches}"))
+        else:
+            results.append(TestResult("Fila de escrita em lote + flush_async", "fail", f"lotes={batches}"))
+    except Exception as exc:
+        results.append(TestResult("Fila de escrita em lote + flush_async", "fail", str(exc)))
+
+    try:
+        import tempfile
+
+        from bench_memory import HashingEmbeddingFunction
+        from memory_system import MemorySystem
+
+        class CountingEmbedding(HashingEmbeddingFunction):
+            def __init__(self):
+                super().__init__()
+                self.calls: list[list[str]] = []
+
+            def __call__(self, input):
+                self.calls.append(list(input))
+                return super().__call__(input)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            embedding = CountingEmbedding()
+            memory = MemorySystem(storage_dir=tmp, embedding_fn=embedding, write_max_delay=0.2)
+            session_id = memory.create_session("u1")
+            # Turno do usuario vira conversa + fato com o mesmo texto
+            await memory.add_turn_async(session_id, "user", "eu uso fastapi no backend")
+            await memory.add_turn_async(session_id, "assistant", "para resolver isso aumente o timeout")
+            await memory.flush_async()
+            memory.close()
+        forwarded = [text for call in embedding.calls for text in call]
+        if len(embedding.calls) == 1 and len(forwarded) == len(set(forwarded)) == 2:
+            results.append(TestResult("Insert em lote com um forward", "pass", f"textos={len(forwarded)}"))
+        else:
+            results.append(TestResult("Insert em lote com um forward", "fail", f"chamadas={embedding.calls}"))
+    except Exception as exc:
+        results.append(TestResult("Insert em lote com um forward", "fail", str(exc)))
+
+    try:
+        import json
+        import tempfile
+
+        from bench_memory import HashingEmbeddingFunction
+        from memory_system import MemorySystem
+
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = MemorySystem(storage_dir=tmp, embedding_fn=HashingEmbeddingFunction())
+            session_id = memory.create_session("u1")
+            memory.add_turn(session_id, "user", "primeiro turno")
+            memory._save_active_sessions()  # Snapshot cobre create + primeiro turno
+            memory.add_turn(session_id, "user", "segundo turno")
+            snapshot_seq = json.loads(memory.sessions_file.read_text(encoding="utf-8"))["seq"]
+            # Crash: registro antigo repetido e append cortado no meio
+            stale = {"op": "turn", "sid": session_id, "seq": snapshot_seq,
+                     "turn": {"id": "velho", "role": "user", "text": "duplicado", "timestamp": ""}}
+            with open(memory.journal_file, "a", encoding="utf-8") as journal:
+                journal.write(json.dumps(stale) + "\n")
+                journal.write('{"op":"turn","sid":"' + session_id + '","tu')
+
+            reloaded = MemorySystem(storage_dir=tmp, embedding_fn=HashingEmbeddingFunction())
+            texts = [turn.text for turn in reloaded.active_sessions[session_id]["messages"]]
+            reloaded.close()
+        if texts == ["primeiro turno", "segundo turno"]:
+            results.append(TestResult("Replay do journal (seq antiga + linha truncada)", "pass"))
+        else:
+            results.append(TestResult("Replay do journal (seq antiga + linha truncada)", "fail", str(texts)))
+    except Exception as exc:
+        results.append(TestResult("Replay do journal (seq antiga + linha truncada)", "fail", str(exc)))
+
+    try:
+        import tempfile
+
+        from bench_memory import HashingEmbeddingFunction
+        from memory_system import MemorySystem
+
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = MemorySystem(storage_dir=tmp, embedding_fn=HashingEmbeddingFunction())
+            session_id = memory.create_session("u1")
+            memory.add_turn(session_id, "user", "eu uso fastapi no backend")
+            memory.add_turn(session_id, "user", "eu uso fastapi no backend")
+            facts = memory.get_user_facts("u1")
+            consolidated = len(facts) == 1 and facts[0].mention_count == 2
+
+            # Fato gravado antes do campo ts (so datas ISO), sem mencao ha
+            # 200 dias: some da leitura e a poda apaga
+            stored = memory.user_facts.get(ids=[facts[0].id])
+            old_date = datetime.fromtimestamp(time.time() - 200 * 86400).isoformat()
+            metadata = {**stored["metadatas"][0], "last_mentioned": old_date, "timestamp": old_date}
+            del metadata["ts"]
+            memory.user_facts.update(ids=[facts[0].id], metadatas=[metadata])
+            forgotten = memory.get_user_facts("u1") == []
+            pruned = memory.prune_facts()
+            memory.close()
+        if consolidated and forgotten and pruned == 1:
+            results.append(TestResult("Fatos consolidados (upsert + decaimento)", "pass",
+                                      f"confianca={facts[0].confidence:.2f}"))
+        else:
+            results.append(
+                TestResult("Fatos consolidados (upsert + decaimento)", "fail", f"fatos={facts} podados={pruned}")
+            )
+    except Exception as exc:
+        results.append(TestResult("Fatos consolidados (upsert + decaimento)", "fail", str(exc)))
+
+    try:
+        import tempfile
+
+        from bench_memory import HashingEmbeddingFunction
+        from memory_system import MemorySystem
+
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = MemorySystem(
+                storage_dir=tmp, embedding_fn=HashingEmbeddingFunction(), working_memory_turns=3
+            )
+            session_id = memory.create_session("u1")
+            for index in range(5):
+                memory.add_turn(session_id, "user", f"turno {index}")
+            session = memory.active_sessions[session_id]
+            texts = [turn.text for turn in session["messages"]]
+            total_turns = session["total_turns"]
+            memory.close()
+        if texts == ["turno 2", "turno 3", "turno 4"] and total_turns == 5:
+            results.append(TestResult("Working memory limitada (ring buffer)", "pass"))
+        else:
+            results.append(TestResult("Working memory limitada (ring buffer)", "fail", str(texts)))
+    except Exception as exc:
+        results.append(TestResult("Working memory limitada (ring buffer)", "fail", str(exc)))
+
+    try:
+        import tempfile
+
+        from bench_memory import HashingEmbeddingFunction
+        from memory_system import MemorySystem
+
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = MemorySystem(storage_dir=tmp, embedding_fn=HashingEmbeddingFunction())
+            session_id = memory.create_session("u1")
+            memory.add_turn(session_id, "user", "meu fastapi da timeout no deploy")
+            memory.add_turn(session_id, "assistant", "Para resolver isso, aumente o timeout do uvicorn")
+            context = memory.get_context_for_session("u1", query="timeout no fastapi")
+            memory.close()
+        if "aumente o timeout do uvicorn" in context and "SOLU" in context.upper():
+            results.append(TestResult("Contexto com solucao salva", "pass", f"{len(context)} chars"))
+        else:
+            results.append(TestResult("Contexto com solucao salva", "fail", context[:200]))
+    except Exception as exc:
+        results.append(TestResult("Contexto com solucao salva", "fail", repr(exc)))
+
+    try:
+        import tempfile
+
+        from bench_memory import HashingEmbeddingFunction
+        from memory_system import MemorySystem
+
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = MemorySystem(storage_dir=tmp, embedding_fn=HashingEmbeddingFunction())
+            session_id = memory.create_session("u1")
+            memory.add_turn(session_id, "user", "meu fastapi da timeout no deploy")
+            memory.add_turn(session_id, "user", "qual o melhor teclado mecanico")
+            related = memory.search_similar_context("timeout no deploy do fastapi", "u1")
+            unrelated = memory.search_similar_context("receita de bolo de cenoura", "u1")
+            memory.close()
+        texts = [hit["text"] for hit in related]
+        if texts == ["meu fastapi da timeout no deploy"] and 0.5 <= related[0]["similarity"] <= 1 and not unrelated:
+            results.append(
+                TestResult("Busca semantica por cosseno", "pass", f"similaridade={related[0]['similarity']:.2f}")
+            )
+        else:
+            results.append(TestResult("Busca semantica por cosseno", "fail", f"{related} {unrelated}"))
+    except Exception as exc:
+        results.append(TestResult("Busca semantica por cosseno", "fail", repr(exc)))
+
+    for res in results:
+        print_result(res)
+    return results
+
+
+async def test_reasoning_offline() -> list[TestResult]:
+    banner("TESTE 7: REASONING OFFLINE (CLIENTE FAKE)")
+    results: list[TestResult] = []
+
+    try:
+        import reasoning_system
+        from reasoning_system import CachedReasoning, ReasoningMode, SemanticResponseCache
+    except ModuleNotFoundError as exc:
+        results.append(TestResult("Reasoning offline", "skip", f"Dependencia ausente: {exc.name}"))
+        for res in results:
+            print_result(res)
+        return results
+
+    try:
+        def fake_embed(texts):
+            # Mesmo vetor para perguntas sobre o mesmo assunto
+            return [[1.0, 0.0] if "deploy" in text else [0.0, 1.0] for text in texts]
+
+        semantic = SemanticResponseCache(fake_embed, threshold=0.9, max_size=4, ttl_seconds=60)
+        answer = CachedReasoning(mode=ReasoningMode.VOICE_FAST, text="use docker")
+        semantic.set("como faco deploy?", "memoria do usuario A", answer)
+        hit = semantic.get("me explica o deploy", "memoria do usuario A")
+        other_context = semantic.get("me explica o deploy", "memoria do usuario B")
+        other_topic = semantic.get("o que e um decorator", "memoria do usuario A")
+        stats = semantic.stats()
+        if hit is answer and other_context is None and other_topic is None and stats["hits"] == 1:
+            results.append(TestResult("Cache semantico: hit e miss por fingerprint", "pass", str(stats)))
+        else:
+            results.append(TestResult("Cache semantico: hit e miss por fingerprint", "fail", str(stats)))
+    except Exception as exc:
+        results.append(TestResult("Cache semantico: hit e miss por fingerprint", "fail", str(exc)))
+
+    import tempfile
+
+    original_client_factory = reasoning_system.get_gemini_client
+    original_analytics = reasoning_system._analytics
+    analytics_dir = tempfile.TemporaryDirectory()
+    reasoning_system._analytics = reasoning_system.ReasoningAnalytics(
+        log_file=os.path.join(analytics_dir.name, "reasoning_analytics.jsonl")
+    )
+
+    def offline_system(models: _FakeModels):
+        reasoning_system.get_gemini_client = lambda: _fake_genai_client(models=models)
+        system = reasoning_system.GeminiReasoningSystem()
+        system.context_cache = None
+        system.semantic_cache = None
+        system.realtime_search.enabled = False
+        return system
+
+    try:
+        models = _FakeModels()
+        system = offline_system(models)
+        first = await system.process("como funciona um decorator", "memoria")
+        first.text += " (editado pelo chamador)"
+        first.tools_used = [{"type": "editado"}]
+        second = await system.process("como funciona um decorator", "memoria")
+        if models.calls == ["fast"] and second.text == "Resposta rapida. Segunda frase." and not second.tools_used:
+            results.append(TestResult("Hit do cache nao e mutado pelo chamador", "pass"))
+        else:
+            results.append(
+                TestResult("Hit do cache nao e mutado pelo chamador", "fail", f"{models.calls} {second.text!r}")
+            )
+    except Exception as exc:
+        results.append(TestResult("Hit do cache nao e mutado pelo chamador", "fail", str(exc)))
+
+    try:
+        models = _FakeModels()
+        system = offline_system(models)
+        question = "qual era o erro do meu deploy"
+        await system.process(question, "memoria", turn_context="turno: timeout no nginx")
+        await system.process(question, "memoria", turn_context="turno: timeout no nginx")
+        await system.process(question, "memoria", turn_context="turno: OOM no kubernetes")
+        await system.process(question, "memoria")
+        if models.calls == ["fast", "fast", "fast"]:
+            results.append(TestResult("Cache separa memoria do turno", "pass"))
+        else:
+            results.append(TestResult("Cache separa memoria do turno", "fail", f"chamadas={models.calls}"))
+    except Exception as exc:
+        results.append(TestResult("Cache separa memoria do turno", "fail", str(exc)))
+
+    try:
+        system = offline_system(_FakeModels())
+        chunks = [
+            chunk
+            async for chunk in system.process_stream(
+                "me explica o erro", "memoria", force_mode=ReasoningMode.REASONING_DEEP
+            )
+        ]
+        kinds = [chunk.kind for chunk in chunks]
+        done = chunks[-1].result if chunks else None
+        expected = ["thought", "text", "code", "code_result", "text", "done"]
+        if (
+            kinds == expected
+            and done is not None
+            and done.text == "Resposta profunda. Conclusao."
+            and done.tools_used[0]["result"] == "2"
+        ):
+            results.append(TestResult("Streaming: ordem dos chunks e evento done", "pass"))
+        else:
+            results.append(TestResult("Streaming: ordem dos chunks e evento done", "fail", f"chunks={kinds}"))
+    except Exception as exc:
+        results.append(TestResult("Streaming: ordem dos chunks e evento done", "fail", str(exc)))
+
+    try:
+        models = _FakeModels(deep_delay=0.05)
+        system = offline_system(models)
+        system.hybrid_min_score = 6
+        delivered: list = []
+
+        async def on_followup(result):
+            delivered.append(result)
+
+        hybrid_question = "debug desse traceback"  # score 6: zona do HYBRID
+        quick = await system.process(hybrid_question, "memoria", session_key="s1", on_followup=on_followup)
+        await asyncio.sleep(0.2)
+        fired = (
+            quick.mode == ReasoningMode.HYBRID
+            and len(delivered) == 1
+            and delivered[0].mode == ReasoningMode.REASONING_DEEP
+        )
+
+        # Usuario mudou de assunto antes do profundo terminar
+        await system.process(hybrid_question + " de novo", "memoria", session_key="s2", on_followup=on_followup)
+        await asyncio.sleep(0.01)  # Profundo ja em andamento
+        cancelled = system.cancel_followup("s2")
+        await asyncio.sleep(0.2)
+        if fired and cancelled and len(delivered) == 1 and not system._followups:
+            results.append(TestResult("HYBRID: follow-up entregue e cancelavel", "pass", f"chamadas={models.calls}"))
+        else:
+            results.append(
+                TestResult(
+                    "HYBRID: follow-up entregue e cancelavel",
+                    "fail",
+                    f"modo={quick.mode.value} entregues={len(delivered)} cancelado={cancelled}",
+                )
+            )
+    except Exception as exc:
+        results.append(TestResult("HYBRID: follow-up entregue e cancelavel", "fail", str(exc)))
+
+    try:
+        from query_classifier import classify_query
+
+        system = offline_system(_FakeModels())
+        system.hybrid_min_score = 6
+        samples = [
+            "oi, tudo bem?",
+            "preciso debugar esse crash",
+            "erro crítico com traceback no deploy",
+            "qual biblioteca usar? e o design pattern? e a arquitetura do sistema?",
+            "otimização de performance: onde esta o bottleneck?",
+            "```python\nprint(1)\n```\nnao funciona de jeito nenhum",
+            "explica " + "detalhe " * 70,
+            "refatoração complexa com algoritmo eficiente e exception",
+            "qual a versao do python hoje?",
+        ]
+        mismatches = []
+        for text in samples:
+            legacy = _legacy_complexity_score(text)
+            if legacy >= reasoning_system.DEEP_MIN_SCORE:
+                legacy_mode = ReasoningMode.REASONING_DEEP
+            elif legacy >= system.hybrid_min_score:
+                legacy_mode = ReasoningMode.HYBRID
+            else:
+                legacy_mode = ReasoningMode.VOICE_FAST
+            score = classify_query(text).complexity_score
+            mode = system._select_mode(text)
+            if (score, mode) != (legacy, legacy_mode):
+                mismatches.append(f"{text[:30]!r}: {score}/{mode.value} != {legacy}/{legacy_mode.value}")
+        if not mismatches:
+            results.append(TestResult("classify_query igual ao scorer antigo", "pass", f"amostras={len(samples)}"))
+        else:
+            results.append(TestResult("classify_query igual ao scorer antigo", "fail", "; ".join(mismatches)))
+    except Exception as exc:
+        results.append(TestResult("classify_query igual ao scorer antigo", "fail", str(exc)))
+
+    reasoning_system.get_gemini_client = original_client_factory
+    reasoning_system._analytics = original_analytics
+    analytics_dir.cleanup()
+
+    for res in results:
+        print_result(res)
+    return results
+
+
 async def main() -> None:
     banner("PULSE OTIMIZADO - SUITE DE TESTES")
 
@@ -266,6 +1058,10 @@ async def main() -> None:
     all_results.extend(test_static_integrity())
     all_results.extend(await test_reasoning_runtime())
     all_results.extend(await test_vision_runtime())
+    all_results.extend(await test_search_backends())
+    all_results.extend(await test_context_cache())
+    all_results.extend(await test_memory_system())
+    all_results.extend(await test_reasoning_offline())
 
     total = len(all_results)
     passed = sum(1 for r in all_results if r.status == "pass")
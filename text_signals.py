@@ -0,0 +1,196 @@
+"""
+Extração de sinais de texto em uma passada só
+Tópicos técnicos, categorias de fato e indicador de solução
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+import re
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+TOPIC_KEYWORDS = (
+    # Linguagens
+    "python", "javascript", "typescript", "java", "c#", "go", "rust",
+    "php", "ruby", "swift", "kotlin", "sql",
+
+    # Frameworks/Libs Backend
+    "fastapi", "django", "flask", "express", "nestjs", "spring",
+    "rails", ".net", "laravel",
+
+    # Frontend
+    "react", "vue", "angular", "nextjs", "svelte", "solid",
+
+    # Banco de dados
+    "postgresql", "mysql", "mongodb", "redis", "sqlite",
+    "dynamodb", "cassandra",
+
+    # DevOps/Infra
+    "docker", "kubernetes", "aws", "azure", "gcp", "terraform",
+    "ansible", "jenkins", "github actions", "ci/cd",
+
+    # Conceitos
+    "api", "rest", "graphql", "websocket", "microservices",
+    "monolith", "serverless", "async", "sync", "orm",
+    "cache", "queue", "pub/sub", "event-driven",
+
+    # Problemas comuns
+    "bug", "erro", "exception", "crash", "timeout", "deadlock",
+    "memory leak", "performance", "latency", "bottleneck",
+
+    # Atividades
+    "deploy", "deployment", "migration", "refactor", "debug",
+    "test", "testing", "ci", "cd", "monitoring", "logging",
+)
+
+# Ordem importa: é a ordem em que os fatos são gerados
+FACT_PATTERNS: Dict[str, Tuple[str, ...]] = {
+    "tech_stack": (
+        "uso", "trabalho com", "programo em", "desenvolvo em",
+        "meu stack", "tecnologias que uso",
+    ),
+    "project": (
+        "estou fazendo", "trabalhando em", "projeto", "aplicação",
+        "sistema que", "desenvolvendo",
+    ),
+    "preference": (
+        "prefiro", "gosto de", "não gosto", "melhor usar",
+        "costumo usar", "sempre uso",
+    ),
+    "learning": (
+        "estudando", "aprendendo", "curso de", "tutorial",
+        "quero aprender", "vou estudar",
+    ),
+    "problem": (
+        "sempre dá erro", "problema recorrente", "todo vez",
+        "não consigo", "dificuldade com",
+    ),
+}
+
+SOLUTION_INDICATORS = (
+    "funciona assim", "solução", "correção", "fix",
+    "para resolver", "basta", "você pode",
+    "recomendo", "sugestão", "tente",
+)
+
+Label = Tuple[str, str]  # ("topic", "python"), ("fact", "project"), ("solution", "")
+
+
+@dataclass(frozen=True)
+class TextSignals:
+    """Resultado imutável da análise de um texto"""
+    topics: FrozenSet[str]
+    fact_categories: Tuple[str, ...]
+    is_solution: bool
+
+
+# Fronteira só nas pontas alfanuméricas do termo (\b falharia em "c#",
+# ".net", "ci/cd"): ".net" casa em "asp.net" e "c#" casa em "c#9".
+# O fim só exige fronteira se o último caractere casado for de palavra.
+_START = r"(?<!\w)"
+_END = r"s?(?!(?<=\w)\w)"  # "s?" aceita o plural simples: "bugs", "erros"
+
+
+def _bounded(term: str) -> str:
+    start = _START if term[0].isalnum() else ""
+    return rf"{start}{re.escape(term)}{_END}"
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Alternação fatorada por prefixo comum (regex de trie)"""
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [
+            re.escape(char) + build(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Termo termina aqui mas também continua: sufixo opcional
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Matcher multi-padrão compilado uma vez
+
+    Os termos viram uma trie e a trie vira uma regex de alternação fatorada
+    ("p(?:ython|hp|ostgresql)"), então cada posição do texto testa no máximo
+    um ramo por caractere: uma passada linear, sem o `in` por keyword.
+    Termos que começam com pontuação (".net") ficam numa segunda regex sem
+    fronteira inicial; separá-los mantém a principal tão rápida quanto antes.
+    Termos contidos em outros ("ci" em "ci/cd") são resolvidos na
+    construção, então o match do termo longo já carrega os rótulos dos curtos.
+    """
+
+    def __init__(self, labeled_terms: Iterable[Tuple[str, Label]]):
+        labels: Dict[str, Set[Label]] = {}
+        for term, label in labeled_terms:
+            labels.setdefault(term.lower(), set()).add(label)
+
+        terms = sorted(labels, key=len, reverse=True)
+        for longer in terms:
+            for shorter in terms:
+                if (
+                    shorter != longer
+                    and shorter in longer
+                    and re.search(_bounded(shorter), longer)
+                ):
+                    labels[longer] |= labels[shorter]
+
+        self._labels: Dict[str, FrozenSet[Label]] = {
+            term: frozenset(term_labels) for term, term_labels in labels.items()
+        }
+        word_terms = [term for term in terms if term[0].isalnum()]
+        punct_terms = [term for term in terms if not term[0].isalnum()]
+        self._patterns = [re.compile(rf"{_START}({_trie_pattern(word_terms)}){_END}")]
+        if punct_terms:
+            self._patterns.append(re.compile(rf"({_trie_pattern(punct_terms)}){_END}"))
+
+    def match(self, text_lower: str) -> Set[Label]:
+        found: Set[Label] = set()
+        for pattern in self._patterns:
+            for match in pattern.finditer(text_lower):
+                found |= self._labels[match.group(1)]
+        return found
+
+
+def _labeled_terms() -> List[Tuple[str, Label]]:
+    terms: List[Tuple[str, Label]] = [
+        (keyword, ("topic", keyword)) for keyword in TOPIC_KEYWORDS
+    ]
+    for category, patterns in FACT_PATTERNS.items():
+        terms.extend((pattern, ("fact", category)) for pattern in patterns)
+    terms.extend((indicator, ("solution", "")) for indicator in SOLUTION_INDICATORS)
+    return terms
+
+
+_MATCHER = KeywordMatcher(_labeled_terms())
+
+
+@lru_cache(maxsize=512)
+def analyze_text(text: str) -> TextSignals:
+    """
+    Tópicos, categorias de fato e flag de solução numa passada só
+
+    Cacheado: o mesmo turno é analisado no registro e na persistência.
+    """
+    labels = _MATCHER.match(text.lower())
+
+    topics = frozenset(value for kind, value in labels if kind == "topic")
+    categories = {value for kind, value in labels if kind == "fact"}
+
+    return TextSignals(
+        topics=topics,
+        fact_categories=tuple(c for c in FACT_PATTERNS if c in categories),
+        is_solution=("solution", "") in labels,
+    )
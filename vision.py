@@ -1,14 +1,14 @@
 """Sistema de visão computacional para PULSE usando Gemini Vision."""
 
-import asyncio
 import logging
-import os
 from dataclasses import dataclass
 from typing import Optional, List
 
-from google import genai
 from google.genai import types
 
+from cache_utils import LRUCache
+from gemini_client import gemini_slot, get_gemini_client
+
 logger = logging.getLogger("pulse_agent.vision")
 
 
@@ -25,11 +25,7 @@ class VisionSystem:
     """Sistema de visão computacional usando Gemini Vision."""
     
     def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise RuntimeError("GOOGLE_API_KEY nao encontrada")
-        
-        self.client = genai.Client(api_key=api_key)
+        self.client = get_gemini_client()
         self.model = "gemini-2.0-flash-exp"  # Modelo rápido com visão
         
         self.config = types.GenerateContentConfig(
@@ -93,18 +89,18 @@ ou "Você tá segurando um Arduino Uno".
 """
             
             # Chama API do Gemini Vision
-            response = await asyncio.to_thread(
-                self.client.models.generate_content,
-                model=self.model,
-                contents=[
-                    types.Part.from_text(text=prompt),
-                    types.Part.from_bytes(
-                        data=image_data,
-                        mime_type="image/jpeg"
-                    )
-                ],
-                config=self.config,
-            )
+            async with gemini_slot():
+                response = await self.client.aio.models.generate_content(
+                    model=self.model,
+                    contents=[
+                        types.Part.from_text(text=prompt),
+                        types.Part.from_bytes(
+                            data=image_data,
+                            mime_type="image/jpeg"
+                        )
+                    ],
+                    config=self.config,
+                )
             
             description = response.text or "Não consegui identificar nada específico."
             
@@ -210,10 +206,19 @@ ou "Você tá segurando um Arduino Uno".
 
 
 class VisionCache:
-    """Cache inteligente para frames similares."""
+    """Cache LRU para frames similares (com TTL e limite de bytes)."""
     
-    def __init__(self, cache_size: int = 10):
-        self.cache = {}
+    def __init__(
+        self,
+        cache_size: int = 10,
+        ttl_seconds: Optional[float] = 300.0,
+        max_bytes: Optional[int] = 256_000,
+    ):
+        self.cache = LRUCache(
+            max_entries=cache_size,
+            ttl_seconds=ttl_seconds,
+            max_bytes=max_bytes,
+        )
         self.cache_size = cache_size
     
     def _compute_hash(self, image_data: bytes) -> str:
@@ -228,13 +233,11 @@ class VisionCache:
     
     def set(self, image_data: bytes, result: VisionResult):
         """Salva resultado no cache."""
-        if len(self.cache) >= self.cache_size:
-            # Remove mais antigo
-            oldest = next(iter(self.cache))
-            del self.cache[oldest]
-        
         img_hash = self._compute_hash(image_data)
-        self.cache[img_hash] = result
+        self.cache.set(img_hash, result)
+    
+    def stats(self) -> dict:
+        return self.cache.stats()
 
 
 _vision_system = None